@@ -0,0 +1,228 @@
+"""
+backfill.py
+
+Re-ingest a bucket prefix or a local directory of workout exports.
+
+    python scripts/backfill.py --local exports/ --workers 4
+    python scripts/backfill.py --s3 s3://workout-uploads/exports/ --checkpoint backfill.json
+
+Files are parsed in parallel by the Lambda's own WorkoutProcessor
+pipeline (compressed exports included). Each file's rows are then
+deduplicated against the stored workout IDs and inserted, one file at a
+time, using the same database settings as the Lambda. Once a file has
+committed, it is recorded in the checkpoint. A killed run restarted with
+the same --checkpoint skips completed files, unless a file has changed
+since. Progress and throughput are logged as files finish; a JSON summary
+is printed at the end.
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+
+import os
+import copy
+import json
+import time
+import logging
+import argparse
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger()
+
+EXPORT_SUFFIXES = ('.csv', '.csv.gz', '.csv.bz2', '.csv.zst')
+MB = 1024 * 1024
+
+
+class Checkpoint:
+    """Files a backfill has completed, saved after every file"""
+
+    def __init__(self, path, source):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            state = {'source': source, 'completed': {}}
+        if state['source'] != source:
+            raise ValueError(f"Checkpoint {path} belongs to a backfill of {state['source']}")
+        self.source = source
+        self.completed = state['completed']
+
+    def is_done(self, item):
+        """True if the file was completed and hasn't changed since"""
+        return self.completed.get(item['key'], {}).get('signature') == item['signature']
+
+    def mark_done(self, item, **stats):
+        """Record a completed file, replacing the checkpoint file atomically"""
+        with self._lock:
+            self.completed[item['key']] = {'signature': item['signature'], **stats}
+            tmp_path = f'{self.path}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump({'source': self.source, 'completed': self.completed}, f)
+            os.replace(tmp_path, self.path)
+
+
+def list_local_files(directory):
+    """Export files under a directory, with a size/mtime signature that changes if a file is rewritten"""
+    items = []
+    for dirpath, _, filenames in os.walk(directory):
+        for filename in filenames:
+            if filename.endswith(EXPORT_SUFFIXES):
+                path = os.path.join(dirpath, filename)
+                stat = os.stat(path)
+                items.append({'key': os.path.relpath(path, directory).replace(os.sep, '/'), 'path': path,
+                              'size': stat.st_size, 'signature': f'{stat.st_size}:{stat.st_mtime_ns}'})
+    return sorted(items, key=lambda item: item['key'])
+
+
+def list_s3_files(client, bucket, prefix):
+    """Export objects under a prefix, with their ETag as the signature"""
+    items = []
+    for page in client.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            if obj['Key'].endswith(EXPORT_SUFFIXES):
+                items.append({'key': obj['Key'], 'bucket': bucket, 'size': obj['Size'],
+                              'signature': obj['ETag'].strip('"')})
+    return sorted(items, key=lambda item: item['key'])
+
+
+class Backfill:
+    """Parses files in parallel and inserts their new workouts one file at a time"""
+
+    def __init__(self, processor, checkpoint, workers=4, dry_run=False, progress_every=10):
+        self.processor = processor
+        self.checkpoint = checkpoint
+        self.workers = max(1, workers)
+        self.dry_run = dry_run
+        self.progress_every = progress_every
+
+    def _parse(self, item):
+        """Run the extract pipeline for one file on a processor copy with its own timer and metrics"""
+        from storage import read_frame
+        from stage_timing import StageTimer
+        from structured_logging import InvocationMetrics
+
+        worker = copy.copy(self.processor)
+        worker.timer = StageTimer()
+        worker.metrics = InvocationMetrics()
+        if 'bucket' in item:
+            event = {'Records': [{'s3': {'bucket': {'name': item['bucket']}, 'object': {'key': item['key']}}}]}
+            return worker.extract_s3_data(event)
+        return worker.transform_frame(read_frame(item['path'], 'csv'))
+
+    def _store(self, item, records, existing_ids):
+        """Insert a parsed file's new workouts and checkpoint it; returns the number inserted"""
+        from workout_processor import identify_new_workouts, publish_new_workouts
+
+        new_workouts = identify_new_workouts(records, existing_ids)
+        if new_workouts and not self.dry_run:
+            if not self.processor.insert_new_workouts(new_workouts):
+                raise RuntimeError("Database insert failed")
+            publish_new_workouts(new_workouts)
+        existing_ids.update(w['workout_id'] for w in new_workouts)
+        if not self.dry_run:
+            self.checkpoint.mark_done(item, rows=len(records), new=len(new_workouts))
+        return len(new_workouts)
+
+    def run(self, items):
+        """
+        Backfill every file not already in the checkpoint.
+
+        Returns:
+            Summary dict with file counts, rows, failures and throughput
+        """
+        from workout_processor import fetch_existing_workouts
+
+        pending = [item for item in items if not self.checkpoint.is_done(item)]
+        summary = {'files_total': len(items), 'files_skipped': len(items) - len(pending), 'files_done': 0,
+                   'rows_read': 0, 'new_workouts': 0, 'bytes_read': 0, 'failed': {}}
+        existing_ids = fetch_existing_workouts()
+        start = time.perf_counter()
+
+        # Parsed files wait in memory for the inserting thread, so at most 2x workers are in flight
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='backfill') as executor:
+            queued = iter(pending)
+            in_flight = {}
+            while True:
+                while len(in_flight) < 2 * self.workers:
+                    item = next(queued, None)
+                    if item is None:
+                        break
+                    in_flight[executor.submit(self._parse, item)] = item
+                if not in_flight:
+                    break
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = in_flight.pop(future)
+                    try:
+                        records = future.result()
+                        summary['new_workouts'] += self._store(item, records, existing_ids)
+                    except Exception as e:
+                        logger.error("Failed to backfill %s: %s", item['key'], e)
+                        summary['failed'][item['key']] = str(e)
+                        continue
+                    summary['files_done'] += 1
+                    summary['rows_read'] += len(records)
+                    summary['bytes_read'] += item['size']
+                    finished = summary['files_done'] + len(summary['failed'])
+                    if finished % self.progress_every == 0 or finished == len(pending):
+                        self._log_progress(summary, finished, len(pending), time.perf_counter() - start)
+
+        elapsed = time.perf_counter() - start
+        summary.update(_throughput(summary, elapsed))
+        return summary
+
+    def _log_progress(self, summary, finished, total, elapsed):
+        rates = _throughput(summary, elapsed)
+        logger.info("Backfilled %d/%d files (%d failed): %.2f files/s, %.0f rows/s, %.2f MB/s",
+                    finished, total, len(summary['failed']), rates['files_per_s'],
+                    rates['rows_per_s'], rates['mb_per_s'])
+
+
+def _throughput(summary, elapsed):
+    elapsed = max(elapsed, 1e-9)
+    return {
+        'elapsed_s': round(elapsed, 3),
+        'files_per_s': round(summary['files_done'] / elapsed, 3),
+        'rows_per_s': round(summary['rows_read'] / elapsed, 1),
+        'mb_per_s': round(summary['bytes_read'] / MB / elapsed, 3),
+    }
+
+
+def main(argv=None):
+    """Run a backfill and print its summary as JSON; exits non-zero if any file failed."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--local', metavar='DIRECTORY', help='Directory of export files')
+    target.add_argument('--s3', metavar='S3_URI', help='Bucket prefix, e.g. s3://bucket/exports/')
+    parser.add_argument('--workers', type=int, default=4, help='Files parsed in parallel')
+    parser.add_argument('--checkpoint', default='backfill_checkpoint.json',
+                        help='Progress file; rerun with the same one to resume')
+    parser.add_argument('--progress-every', type=int, default=10, help='Log throughput every N files')
+    parser.add_argument('--dry-run', action='store_true', help='Parse and count new workouts without inserting')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    from workout_processor import WorkoutProcessor
+
+    if args.local:
+        source = os.path.abspath(args.local)
+        items = list_local_files(args.local)
+    else:
+        from storage import get_s3_client
+        bucket, _, prefix = args.s3[len('s3://'):].partition('/') if args.s3.startswith('s3://') else (args.s3, '', '')
+        source = f's3://{bucket}/{prefix}'
+        items = list_s3_files(get_s3_client(), bucket, prefix)
+
+    checkpoint = Checkpoint(args.checkpoint, source)
+    backfill = Backfill(WorkoutProcessor(), checkpoint, args.workers, args.dry_run, args.progress_every)
+    summary = backfill.run(items)
+    print(json.dumps(summary, indent=2))
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
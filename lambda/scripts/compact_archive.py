@@ -0,0 +1,53 @@
+"""
+compact_archive.py
+
+Apply retention to the content-addressed archive and garbage-collect
+chunks that no remaining version references.
+
+    python scripts/compact_archive.py --local local_testing --keep-last 30
+    python scripts/compact_archive.py --s3-bucket workout-data --keep-days 90 --dry-run
+
+The newest version of every file is always kept. Run it while no
+ingestion is in flight; chunks younger than --grace-seconds are never
+deleted.
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+
+import os
+import json
+import argparse
+
+from archive_store import ArchiveStore, LocalBlobStore, S3BlobStore, DEFAULT_GC_GRACE_SECONDS
+
+
+def main(argv=None):
+    """Compact the archive and print what was (or would be) removed as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--local', metavar='BASE_PATH', help='Local storage base path (LOCAL_STORAGE_PATH)')
+    target.add_argument('--s3-bucket', help='Bucket used by S3 storage')
+    parser.add_argument('--keep-last', type=int, help='Keep the newest N versions of each file')
+    parser.add_argument('--keep-days', type=float, help='Keep versions younger than this many days')
+    parser.add_argument('--grace-seconds', type=float, default=DEFAULT_GC_GRACE_SECONDS,
+                        help='Never delete chunks younger than this')
+    parser.add_argument('--dry-run', action='store_true', help='Report without deleting anything')
+    args = parser.parse_args(argv)
+
+    # Imported here so --local runs don't need AWS configuration
+    from storage import CAS_PREFIX
+    if args.local:
+        blobs = LocalBlobStore(os.path.join(args.local, CAS_PREFIX))
+    else:
+        from storage import get_s3_client
+        blobs = S3BlobStore(get_s3_client(), args.s3_bucket, CAS_PREFIX)
+
+    result = ArchiveStore(blobs).compact(args.keep_last, args.keep_days, args.grace_seconds, args.dry_run)
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,46 @@
+"""
+compact_dataset.py
+
+Merge the append-only part files of the partitioned workout dataset into
+one file per month, keeping the newest row of each workout.
+
+    python scripts/compact_dataset.py --local local_testing
+    python scripts/compact_dataset.py --s3-bucket workout-data
+
+Safe to run while ingestion is publishing (parts written meanwhile are
+kept), but run one compaction at a time.
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+
+import json
+import argparse
+
+from queries import KEY_COLUMN, WORKOUT_DATASET
+
+
+def main(argv=None):
+    """Compact the dataset and print the compacted partition keys as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--local', metavar='BASE_PATH', help='Local storage base path (LOCAL_STORAGE_PATH)')
+    target.add_argument('--s3-bucket', help='Bucket used by S3 storage')
+    parser.add_argument('--dataset', default=WORKOUT_DATASET, help='Dataset name under current/')
+    args = parser.parse_args(argv)
+
+    # Imported here so --local runs don't need AWS configuration
+    from storage import LocalStorageHandler, S3StorageHandler
+    if args.local:
+        storage = LocalStorageHandler(args.local)
+    else:
+        storage = S3StorageHandler(args.s3_bucket)
+
+    compacted = storage.compact_partitions(args.dataset, key_columns=[KEY_COLUMN])
+    print(json.dumps({'dataset': args.dataset, 'compacted': compacted}, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
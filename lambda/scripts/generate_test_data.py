@@ -1,48 +1,203 @@
-import pandas as pd
+"""
+generate_test_data.py
+
+Generate synthetic workout exports with the same columns as the real
+MapMyFitness export, for functional and load testing.
+
+Rows are written to disk in chunks, so output size is limited only by disk:
+
+    python scripts/generate_test_data.py -o history.csv --rows 1000000
+    python scripts/generate_test_data.py -o big.csv.gz --target-size 2GB --seed 7
+
+Output is reproducible for a given seed and chunk size.
+"""
+
+import argparse
+import gzip
+import os
+import re
+import sys
 import numpy as np
-from datetime import datetime, timedelta
-import uuid
-
-def generate_workout_data(num_records=100):
-    """Generate realistic-looking workout data for testing."""
-    
-    # Create date range for the past year
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=365)
-    dates = pd.date_range(start=start_date, end=end_date, periods=num_records)
-    
-    # Generate random but realistic workout data
-    data = {
-        'workout_id': [str(uuid.uuid4()) for _ in range(num_records)],
-        'workout_date': dates,
-        'distance_mi': np.random.uniform(2.0, 10.0, num_records),  # Miles
-        'duration_sec': np.random.uniform(1200, 3600, num_records),  # 20-60 minutes
-        'kcal_burned': np.random.uniform(200, 800, num_records),
-    }
-    
-    # Create DataFrame
-    df = pd.DataFrame(data)
-    
-    # Calculate derived metrics
-    df['avg_pace'] = df['distance_mi'] / (df['duration_sec'] / 3600)  # mph
-    df['max_pace'] = df['avg_pace'] * np.random.uniform(1.1, 1.3, num_records)  # Slightly faster than average
-    
-    # Round numeric columns to 2 decimal places
-    numeric_columns = ['distance_mi', 'avg_pace', 'max_pace', 'kcal_burned']
-    df[numeric_columns] = df[numeric_columns].round(2)
-    
-    return df
-
-def main():
-    """Generate test data files."""
-    # Generate three months of data with different file names
-    for month in range(3):
-        df = generate_workout_data(num_records=30)  # 30 records per month
-        
-        # Save as CSV
-        filename = f'workout_data_{datetime.now().strftime("%Y%m")}_{month+1}.csv'
-        df.to_csv(filename, index=False)
-        print(f"Generated {filename} with {len(df)} records")
+import pandas as pd
+
+EXPORT_COLUMNS = [
+    'Date Submitted',
+    'Workout Date',
+    'Activity Type',
+    'Calories Burned (kcal)',
+    'Distance (mi)',
+    'Workout Time (seconds)',
+    'Avg Pace (min/mi)',
+    'Max Pace (min/mi)',
+    'Avg Speed (mi/h)',
+    'Max Speed (mi/h)',
+    'Avg Heart Rate',
+    'Steps',
+    'Notes',
+    'Source',
+    'Link',
+]
+
+# Formats seen in real exports (see data_cleaning.parse_date)
+WORKOUT_DATE_FORMATS = ['%b. %d, %Y', '%d-%b-%y', '%d-%b-%Y', '%B %d, %Y', '%d-%m-%y', '%Y-%m-%d']
+
+# activity: (share of workouts, mean speed mph, kcal per minute)
+ACTIVITIES = {
+    'Run': (0.5, 6.5, 11.0),
+    'Bike Ride': (0.25, 14.0, 9.0),
+    'Walk': (0.2, 3.2, 4.5),
+    'Hike': (0.05, 2.5, 7.0),
+}
+
+FIRST_WORKOUT_ID = 1000000000
+
+# Dates wrap after this many days so very large files stay in datetime range
+MAX_HISTORY_DAYS = 36500
+
+
+def generate_chunk(rng, first_row, rows, start_date, workouts_per_day=1.0, zero_time_rate=0.02,
+                   invalid_date_rate=0.01, invalid_link_rate=0.005):
+    """
+    Generate one chunk of export rows.
+
+    Args:
+        rng: numpy Generator for this chunk
+        first_row: Index of the chunk's first row in the whole file
+        rows: Number of rows in the chunk
+        start_date: Date of the file's first workout
+        workouts_per_day: Average number of workouts logged per day
+        zero_time_rate: Fraction of rows with 'Workout Time (seconds)' of 0
+        invalid_date_rate: Fraction of rows with an unparseable 'Workout Date'
+        invalid_link_rate: Fraction of rows whose 'Link' has no /workout/<id>
+
+    Returns:
+        DataFrame with EXPORT_COLUMNS
+    """
+    row_numbers = np.arange(first_row, first_row + rows)
+    names = list(ACTIVITIES)
+    shares = np.array([ACTIVITIES[n][0] for n in names])
+    activity_idx = rng.choice(len(names), rows, p=shares / shares.sum())
+    speed = np.array([ACTIVITIES[n][1] for n in names])[activity_idx] * rng.uniform(0.8, 1.2, rows)
+    kcal_per_min = np.array([ACTIVITIES[n][2] for n in names])[activity_idx]
+
+    # Dates increase through the file at workouts_per_day
+    day_offsets = (row_numbers / workouts_per_day + rng.uniform(0, 0.5, rows)) % MAX_HISTORY_DAYS
+    workout_dates = pd.Timestamp(start_date) + pd.to_timedelta(np.floor(day_offsets), unit='D')
+    submitted = workout_dates + pd.to_timedelta(rng.integers(0, 3, rows), unit='D')
+
+    seconds = rng.integers(900, 7200, rows).astype(float)
+    seconds[rng.random(rows) < zero_time_rate] = 0
+    distance = np.round(speed * seconds / 3600, 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg_pace = np.where(distance > 0, seconds / 60 / distance, np.nan)
+    max_speed = speed * rng.uniform(1.1, 1.4, rows)
+    steps = np.where(np.isin(activity_idx, [names.index('Run'), names.index('Walk'), names.index('Hike')]),
+                     np.round(distance * rng.uniform(1800, 2400, rows)), np.nan)
+    heart_rate = np.where(rng.random(rows) < 0.6, rng.integers(95, 175, rows), np.nan)
+
+    formats = rng.integers(0, len(WORKOUT_DATE_FORMATS), rows)
+    date_strings = np.empty(rows, dtype=object)
+    for i, fmt in enumerate(WORKOUT_DATE_FORMATS):
+        mask = formats == i
+        date_strings[mask] = workout_dates[mask].strftime(fmt)
+    date_strings[rng.random(rows) < invalid_date_rate] = 'not recorded'
+
+    links = np.char.add('http://www.mapmyfitness.com/workout/',
+                        (FIRST_WORKOUT_ID + row_numbers).astype(str)).astype(object)
+    links[rng.random(rows) < invalid_link_rate] = 'http://www.mapmyfitness.com/routes/view/'
+
+    return pd.DataFrame({
+        'Date Submitted': submitted.strftime('%b. %d, %Y'),
+        'Workout Date': date_strings,
+        'Activity Type': np.array(names, dtype=object)[activity_idx],
+        'Calories Burned (kcal)': np.round(seconds / 60 * kcal_per_min),
+        'Distance (mi)': distance,
+        'Workout Time (seconds)': seconds.astype(int),
+        'Avg Pace (min/mi)': np.round(avg_pace, 2),
+        'Max Pace (min/mi)': np.round(60 / max_speed, 2),
+        'Avg Speed (mi/h)': np.round(speed, 2),
+        'Max Speed (mi/h)': np.round(max_speed, 2),
+        'Avg Heart Rate': heart_rate,
+        'Steps': steps,
+        'Notes': '',
+        'Source': 'Synthetic',
+        'Link': links,
+    }, columns=EXPORT_COLUMNS)
+
+
+def parse_size(size):
+    """Parse sizes like '500MB' or '2GB' into bytes"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMG]?B?)\s*', size.upper())
+    if not match:
+        raise argparse.ArgumentTypeError(f"Invalid size: {size}")
+    number, unit = match.groups()
+    multiplier = {'': 1, 'B': 1, 'K': 1024, 'KB': 1024, 'M': 1024 ** 2, 'MB': 1024 ** 2,
+                  'G': 1024 ** 3, 'GB': 1024 ** 3}[unit]
+    return int(float(number) * multiplier)
+
+
+def write_export(path, rows=None, target_size=None, chunk_size=100000, seed=42,
+                 start_date='2015-01-01', **rates):
+    """
+    Stream a synthetic export to `path`, one chunk at a time.
+
+    Stops after `rows` rows, or once the file reaches `target_size` bytes
+    (compressed size for .gz). Paths ending in .gz are gzip-compressed.
+
+    Returns:
+        int: Number of rows written
+    """
+    if rows is None and target_size is None:
+        raise ValueError("Either rows or target_size is required")
+
+    opener = gzip.open if path.endswith('.gz') else open
+    written = 0
+    chunk_index = 0
+    with opener(path, 'wt', newline='') as f:
+        while rows is None or written < rows:
+            n = chunk_size if rows is None else min(chunk_size, rows - written)
+            rng = np.random.default_rng([seed, chunk_index])
+            chunk = generate_chunk(rng, written, n, start_date, **rates)
+            chunk.to_csv(f, header=(written == 0), index=False)
+            written += n
+            chunk_index += 1
+            if target_size is not None:
+                f.flush()
+                if os.path.getsize(path) >= target_size:
+                    break
+    return written
+
+
+def main(argv=None):
+    """Parse arguments and generate the export."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-o', '--output', required=True, help='Output path (.csv or .csv.gz)')
+    size = parser.add_mutually_exclusive_group(required=True)
+    size.add_argument('--rows', type=int, help='Number of rows to write')
+    size.add_argument('--target-size', type=parse_size, help='Approximate file size, e.g. 500MB or 2GB')
+    parser.add_argument('--chunk-size', type=int, default=100000, help='Rows generated per chunk')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    parser.add_argument('--start-date', default='2015-01-01', help='Date of the first workout')
+    parser.add_argument('--workouts-per-day', type=float, default=1.0, help='Average workouts logged per day')
+    parser.add_argument('--zero-time-rate', type=float, default=0.02, help='Fraction of rows with zero workout time')
+    parser.add_argument('--invalid-date-rate', type=float, default=0.01, help='Fraction of rows with an invalid Workout Date')
+    parser.add_argument('--invalid-link-rate', type=float, default=0.005, help='Fraction of rows without a workout link')
+    args = parser.parse_args(argv)
+
+    written = write_export(
+        args.output,
+        rows=args.rows,
+        target_size=args.target_size,
+        chunk_size=args.chunk_size,
+        seed=args.seed,
+        start_date=args.start_date,
+        workouts_per_day=args.workouts_per_day,
+        zero_time_rate=args.zero_time_rate,
+        invalid_date_rate=args.invalid_date_rate,
+        invalid_link_rate=args.invalid_link_rate,
+    )
+    print(f"Generated {args.output} with {written} records ({os.path.getsize(args.output)} bytes)")
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
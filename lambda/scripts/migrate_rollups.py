@@ -0,0 +1,50 @@
+"""
+migrate_rollups.py
+
+Create the workout_rollup table, and optionally fill it from the
+workouts already in workout_summary.
+
+    python scripts/migrate_rollups.py
+    python scripts/migrate_rollups.py --rebuild
+
+Run it with a database user that has DDL privilege, using the same
+DB_HOST/DB_USERNAME/DB_PASSWORD/DB_NAME settings as the Lambda, before
+setting ROLLUP_STORE=db. The Lambda itself only upserts into the table.
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+
+import json
+import argparse
+
+from rollups import SQLRollupStore
+
+
+def main(argv=None):
+    """Create the rollup table (and rebuild its rows if asked); print what was done as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rebuild', action='store_true',
+                        help='Recompute all rollups from workout_summary after creating the table')
+    args = parser.parse_args(argv)
+
+    from workout_processor import get_db_connection
+    connection = get_db_connection()
+    if not connection:
+        print("Could not connect to the database", file=sys.stderr)
+        return 1
+    try:
+        store = SQLRollupStore()
+        store.create_table(connection)
+        result = {'table': 'workout_rollup', 'created': True}
+        if args.rebuild:
+            result['rollup_rows'] = store.rebuild(connection)
+    finally:
+        connection.close()
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
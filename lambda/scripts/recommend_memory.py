@@ -0,0 +1,144 @@
+"""
+recommend_memory.py
+
+Run the ingestion pipeline stages over sample export files with memory
+profiling on, and recommend the smallest Lambda memory size that holds
+the peak with headroom.
+
+    python scripts/recommend_memory.py exports/*.csv
+    python scripts/recommend_memory.py sample.csv --headroom 1.5 --target-input-size 200MB
+
+Each file is profiled in a fresh subprocess, so the process's RSS
+high-water mark belongs to that file alone. The S3 download and database
+stages are not run; their buffers are small next to the parsed frame.
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+
+import os
+import json
+import argparse
+import subprocess
+
+# Lambda memory sizes worth stopping at; CPU share scales linearly, with one full vCPU at 1769 MB
+MEMORY_TIERS_MB = [128, 256, 512, 768, 1024, 1536, 1769, 2048, 3008, 3538, 4096, 5307, 6144, 7076, 8192, 8845, 10240]
+MB_PER_VCPU = 1769
+MB = 1024 * 1024
+
+
+def profile_file(path):
+    """Run the pipeline stages over one file and return its memory profile"""
+    import pandas as pd
+    from memory_profiling import MemoryProfiler, current_rss_bytes, peak_rss_bytes
+    from stage_timing import StageTimer
+    from data_cleaning import clean_data_parallel
+    from workout_processor import WorkoutDataValidator, WorkoutProcessor
+
+    baseline_rss = current_rss_bytes()
+    profiler = MemoryProfiler()
+    timer = StageTimer(detailed=True, memory=profiler)
+    profiler.start()
+    with timer.stage('extract'):
+        with timer.stage('read_csv'):
+            df = pd.read_csv(path)
+        with timer.stage('validate'):
+            WorkoutDataValidator.validate_dataframe(df)
+        with timer.stage('clean'):
+            df = clean_data_parallel(df, workers=int(os.getenv('CLEAN_WORKERS', 1)))
+        with timer.stage('extract_ids'):
+            df['workout_id'] = df['Link'].apply(WorkoutProcessor.extract_workout_id)
+        with timer.stage('to_records'):
+            records = df.to_dict('records')
+    profiler.stop()
+
+    input_bytes = os.path.getsize(path)
+    return {
+        'file': str(path),
+        'input_bytes': input_bytes,
+        'rows': len(records),
+        'baseline_rss_bytes': baseline_rss,
+        'peak_rss_bytes': peak_rss_bytes(),
+        'stages': profiler.summary(input_bytes),
+    }
+
+
+def recommend_tier(required_mb):
+    """Smallest tier in MEMORY_TIERS_MB holding `required_mb`, or None if nothing does"""
+    for tier in MEMORY_TIERS_MB:
+        if tier >= required_mb:
+            return tier
+    return None
+
+
+def recommend(profiles, headroom=1.5, target_input_bytes=None):
+    """
+    Turn per-file profiles into a memory recommendation.
+
+    The requirement is the worst file's RSS high-water mark times `headroom`.
+    With `target_input_bytes`, the worst allocation-per-input-byte ratio is
+    also extrapolated to an input of that size on top of the baseline RSS.
+    """
+    worst = max(profiles, key=lambda p: p['peak_rss_bytes'])
+    required_bytes = worst['peak_rss_bytes'] * headroom
+    result = {
+        'worst_file': worst['file'],
+        'observed_peak_rss_mb': round(worst['peak_rss_bytes'] / MB, 1),
+        'headroom': headroom,
+    }
+    if target_input_bytes:
+        per_byte = max(s['alloc_per_input_byte'] for p in profiles for s in p['stages'].values())
+        baseline = max(p['baseline_rss_bytes'] for p in profiles)
+        projected = baseline + per_byte * target_input_bytes
+        result['projected_peak_mb'] = round(projected / MB, 1)
+        required_bytes = max(required_bytes, projected * headroom)
+
+    required_mb = required_bytes / MB
+    tier = recommend_tier(required_mb)
+    result['required_mb'] = round(required_mb, 1)
+    result['recommended_memory_mb'] = tier
+    result['vcpu_share'] = round(tier / MB_PER_VCPU, 2) if tier else None
+    return result
+
+
+def _parse_size(size):
+    units = {'KB': 1024, 'MB': MB, 'GB': 1024 * MB, 'B': 1}
+    for unit, multiplier in units.items():
+        if size.upper().endswith(unit):
+            return int(float(size[:-len(unit)]) * multiplier)
+    return int(size)
+
+
+def main(argv=None):
+    """Profile each file in its own subprocess and print the recommendation."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='+', help='Sample export CSV files')
+    parser.add_argument('--headroom', type=float, default=1.5, help='Multiplier applied to the observed peak')
+    parser.add_argument('--target-input-size', type=_parse_size,
+                        help='Also size for an input this large, e.g. 200MB')
+    parser.add_argument('--profile-one', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.profile_one:
+        print(json.dumps(profile_file(args.profile_one)))
+        return 0
+
+    profiles = []
+    for path in args.files:
+        output = subprocess.run(
+            [sys.executable, __file__, '--profile-one', path, path],
+            check=True, capture_output=True, text=True
+        ).stdout
+        profile = json.loads(output.strip().splitlines()[-1])
+        profiles.append(profile)
+        print(f"{path}: {profile['rows']} rows, {profile['input_bytes'] / MB:.1f} MB in, "
+              f"peak RSS {profile['peak_rss_bytes'] / MB:.1f} MB", file=sys.stderr)
+
+    result = recommend(profiles, args.headroom, args.target_input_size)
+    print(json.dumps({'profiles': profiles, 'recommendation': result}, indent=2))
+    return 0 if result['recommended_memory_mb'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
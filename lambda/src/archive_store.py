@@ -0,0 +1,307 @@
+"""
+archive_store.py
+
+Content-addressed, deduplicated archive for file versions.
+
+Each archived version is split into content-defined chunks that are
+stored once, zlib-compressed, under chunks/<sha256>. A JSON manifest per
+version lists its chunks in order. Chunk boundaries fall on lines whose
+hash matches a mask, so they depend on content, not offsets: when rows are
+appended to a history, every chunk but the last few is unchanged and is
+not written again. Archive storage and write I/O scale with new data
+rather than with the length of the history.
+
+compact() applies retention to manifests and garbage-collects chunks no
+manifest references; scripts/compact_archive.py runs it from the command
+line.
+"""
+
+import os
+import io
+import json
+import zlib
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 1024 * 1024
+# A line ends a chunk when the low bits of its CRC are zero: 1 in 2048 lines,
+# about 300 KB of a typical export
+BOUNDARY_MASK = (1 << 11) - 1
+# Unreferenced chunks younger than this are kept, since a concurrent
+# put_version writes its chunks before its manifest
+DEFAULT_GC_GRACE_SECONDS = 3600
+
+
+def _iter_lines(stream: BinaryIO, block_size: int = 1024 * 1024) -> Iterator[bytes]:
+    """Lines of a binary stream, keeping line endings; works on anything with read()"""
+    pending = b''
+    for block in iter(lambda: stream.read(block_size), b''):
+        lines = (pending + block).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + b'\n'
+    if pending:
+        yield pending
+
+
+def iter_chunks(stream: BinaryIO, min_size: int = MIN_CHUNK_SIZE, max_size: int = MAX_CHUNK_SIZE,
+                mask: int = BOUNDARY_MASK) -> Iterator[bytes]:
+    """
+    Split a binary stream into line-aligned, content-defined chunks.
+
+    A chunk ends after a line once it holds at least `min_size` bytes and
+    the line's CRC32 has all `mask` bits clear, or once it reaches
+    `max_size`. Lines longer than `max_size` (binary data) are cut.
+    """
+    parts: List[bytes] = []
+    size = 0
+    for line in _iter_lines(stream):
+        while len(line) > max_size - size:
+            cut = max_size - size
+            parts.append(line[:cut])
+            yield b''.join(parts)
+            parts, size, line = [], 0, line[cut:]
+        parts.append(line)
+        size += len(line)
+        if size >= min_size and (zlib.crc32(line) & mask) == 0:
+            yield b''.join(parts)
+            parts, size = [], 0
+    if parts:
+        yield b''.join(parts)
+
+
+class LocalBlobStore:
+    """Blob backend over a local directory"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def put(self, name: str, data: bytes) -> None:
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.tmp-{os.getpid()}-{threading.get_ident()}'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, name: str) -> bytes:
+        with open(self._path(name), 'rb') as f:
+            return f.read()
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(self._path(name))
+
+    def delete(self, name: str) -> None:
+        try:
+            os.remove(self._path(name))
+        except FileNotFoundError:
+            pass
+
+    def list(self, prefix: str) -> Iterator[Tuple[str, float, int]]:
+        """Yield (name, modified epoch seconds, size) for blobs under `prefix`"""
+        top = self._path(prefix)
+        for dirpath, _, filenames in os.walk(top):
+            for filename in filenames:
+                if '.tmp-' in filename:
+                    continue
+                path = os.path.join(dirpath, filename)
+                stat = os.stat(path)
+                yield os.path.relpath(path, self.root).replace(os.sep, '/'), stat.st_mtime, stat.st_size
+
+
+class S3BlobStore:
+    """Blob backend over an S3 prefix"""
+
+    def __init__(self, client, bucket: str, prefix: str):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+
+    def _key(self, name: str) -> str:
+        return f'{self.prefix}/{name}'
+
+    def put(self, name: str, data: bytes) -> None:
+        self.client.put_object(Bucket=self.bucket, Key=self._key(name), Body=data)
+
+    def get(self, name: str) -> bytes:
+        return self.client.get_object(Bucket=self.bucket, Key=self._key(name))['Body'].read()
+
+    def exists(self, name: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(name))
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def delete(self, name: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(name))
+
+    def list(self, prefix: str) -> Iterator[Tuple[str, float, int]]:
+        """Yield (name, modified epoch seconds, size) for blobs under `prefix`"""
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix)):
+            for obj in page.get('Contents', []):
+                yield obj['Key'][len(self.prefix) + 1:], obj['LastModified'].timestamp(), obj['Size']
+
+
+class ArchiveStore:
+    """Deduplicating version archive on top of a blob backend"""
+
+    def __init__(self, blobs, min_chunk_size: int = MIN_CHUNK_SIZE, max_chunk_size: int = MAX_CHUNK_SIZE):
+        """
+        Args:
+            blobs: LocalBlobStore or S3BlobStore holding chunks/ and manifests/
+            min_chunk_size: Smallest chunk cut at a content boundary
+            max_chunk_size: Largest chunk before a forced cut
+        """
+        self.blobs = blobs
+        self.min_chunk_size = min_chunk_size
+        self.max_chunk_size = max_chunk_size
+
+    @staticmethod
+    def _chunk_name(digest: str) -> str:
+        return f'chunks/{digest[:2]}/{digest[2:]}'
+
+    @staticmethod
+    def _key_dir(key: str) -> str:
+        # Hash of the full key, so keys sharing a basename keep separate histories
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def put_version(self, key: str, stream: BinaryIO) -> Dict[str, Any]:
+        """
+        Archive one version of `key` read from a binary stream.
+
+        Only chunks the store doesn't already hold are written.
+
+        Returns:
+            The version's manifest, with 'id', 'new_chunks' and 'new_bytes'
+        """
+        file_digest = hashlib.sha256()
+        chunks = []
+        new_chunks = new_bytes = size = 0
+        for chunk in iter_chunks(stream, self.min_chunk_size, self.max_chunk_size):
+            digest = hashlib.sha256(chunk).hexdigest()
+            file_digest.update(chunk)
+            size += len(chunk)
+            chunks.append([digest, len(chunk)])
+            name = self._chunk_name(digest)
+            if not self.blobs.exists(name):
+                compressed = zlib.compress(chunk, 6)
+                self.blobs.put(name, compressed)
+                new_chunks += 1
+                new_bytes += len(compressed)
+
+        created = datetime.now()
+        manifest = {
+            'id': f"{self._key_dir(key)}/{created.strftime('%Y%m%d_%H%M%S_%f')}",
+            'key': key,
+            'created': created.isoformat(),
+            'size': size,
+            'sha256': file_digest.hexdigest(),
+            'chunks': chunks,
+        }
+        self.blobs.put(f"manifests/{manifest['id']}.json", json.dumps(manifest).encode())
+        return {**manifest, 'new_chunks': new_chunks, 'new_bytes': new_bytes}
+
+    def list_versions(self, key: Optional[str] = None) -> List[str]:
+        """Manifest ids, oldest first, for one key or for the whole archive"""
+        prefix = f'manifests/{self._key_dir(key)}/' if key else 'manifests/'
+        names = [name for name, _, _ in self.blobs.list(prefix) if name.endswith('.json')]
+        return sorted(name[len('manifests/'):-len('.json')] for name in names)
+
+    def get_manifest(self, version_id: str) -> Dict[str, Any]:
+        """Load the manifest of one version"""
+        return json.loads(self.blobs.get(f'manifests/{version_id}.json'))
+
+    def read_version(self, version_id: str, output: BinaryIO) -> None:
+        """
+        Write the full contents of a version to a binary file object.
+
+        Raises:
+            ValueError: If the reassembled contents don't match the manifest's hash
+        """
+        manifest = self.get_manifest(version_id)
+        digest = hashlib.sha256()
+        for chunk_digest, _ in manifest['chunks']:
+            chunk = zlib.decompress(self.blobs.get(self._chunk_name(chunk_digest)))
+            digest.update(chunk)
+            output.write(chunk)
+        if digest.hexdigest() != manifest['sha256']:
+            raise ValueError(f"Archive version {version_id} is corrupt")
+
+    def read_version_bytes(self, version_id: str) -> bytes:
+        """Contents of a version as bytes"""
+        buffer = io.BytesIO()
+        self.read_version(version_id, buffer)
+        return buffer.getvalue()
+
+    def compact(self, keep_last: Optional[int] = None, keep_days: Optional[float] = None,
+                gc_grace_seconds: float = DEFAULT_GC_GRACE_SECONDS, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Apply retention to manifests, then delete chunks no manifest references.
+
+        A version is kept if it is among the newest `keep_last` of its key or
+        younger than `keep_days`; with neither set, every version is kept and
+        only orphaned chunks are collected. The newest version of each key is
+        always kept. Run it while no versions are being archived: the grace
+        period protects newly written chunks, not existing chunks a new
+        version is about to reference.
+
+        Returns:
+            dict with pruned manifest ids and deleted chunk count and bytes
+        """
+        now = datetime.now()
+        manifests = {version_id: self.get_manifest(version_id) for version_id in self.list_versions()}
+        by_key: Dict[str, List[str]] = {}
+        for version_id, manifest in manifests.items():
+            by_key.setdefault(manifest['key'], []).append(version_id)
+
+        pruned = []
+        if keep_last is not None or keep_days is not None:
+            cutoff = now - timedelta(days=keep_days) if keep_days is not None else None
+            for versions in by_key.values():
+                newest = set(versions[-max(keep_last or 0, 1):])
+                for version_id in versions:
+                    if version_id in newest:
+                        continue
+                    created = datetime.strptime(version_id.split('/')[1], '%Y%m%d_%H%M%S_%f')
+                    if cutoff is not None and created >= cutoff:
+                        continue
+                    pruned.append(version_id)
+
+        pruned_set = set(pruned)
+        referenced = set()
+        for version_id, manifest in manifests.items():
+            if version_id not in pruned_set:
+                referenced.update(self._chunk_name(d) for d, _ in manifest['chunks'])
+
+        if not dry_run:
+            for version_id in pruned:
+                self.blobs.delete(f'manifests/{version_id}.json')
+
+        deleted_chunks = deleted_bytes = 0
+        grace_cutoff = now.timestamp() - gc_grace_seconds
+        for name, modified, size in list(self.blobs.list('chunks/')):
+            if name in referenced or modified > grace_cutoff:
+                continue
+            deleted_chunks += 1
+            deleted_bytes += size
+            if not dry_run:
+                self.blobs.delete(name)
+
+        return {
+            'pruned_versions': pruned,
+            'deleted_chunks': deleted_chunks,
+            'deleted_bytes': deleted_bytes,
+            'dry_run': dry_run,
+        }
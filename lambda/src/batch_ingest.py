@@ -0,0 +1,200 @@
+"""
+batch_ingest.py
+
+Micro-batched ingestion of many small export files.
+
+batch_handler takes an SQS batch whose messages carry S3 event
+notifications (or, as a local stand-in, a plain list of S3 records, e.g.
+from drain_queue). It parses the files concurrently, merges their new
+rows deduplicated across the whole batch, and writes them with one
+connection, one ID fetch and one commit instead of one of each per file.
+
+Each file gets its own outcome in the response. Messages whose files
+failed are returned as batchItemFailures, so with ReportBatchItemFailures
+enabled SQS redelivers only those.
+"""
+
+import copy
+import json
+import os
+import queue
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from structured_logging import InvocationMetrics, LazyJson, configure_invocation_logging
+from stage_timing import StageTimer, stage_timing_enabled
+from spool import get_spool
+from workout_processor import (WorkoutProcessor, fetch_existing_workouts, flush_spool,
+                               notification_dispatcher, publish_new_workouts)
+
+logger = logging.getLogger()
+
+
+def batch_items(event: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Flatten a batch event into one item per S3 object.
+
+    Returns:
+        (items, outcomes): items with 'id' (SQS message ID, or the key for
+        plain S3 records), 'bucket' and 'key'; and failed outcomes for
+        messages that couldn't be parsed
+    """
+    items, failed = [], []
+    for record in event.get('Records') or []:
+        if 's3' in record:
+            s3_records = [record]
+            item_id = record.get('messageId') or record['s3']['object']['key']
+        else:
+            item_id = record.get('messageId')
+            try:
+                # s3:TestEvent notifications have no Records
+                s3_records = json.loads(record['body']).get('Records', [])
+            except (KeyError, TypeError, ValueError) as e:
+                failed.append({'id': item_id, 'file': None, 'status': 'failed',
+                               'error': f"Unreadable message: {e}"})
+                continue
+        for s3_record in s3_records:
+            items.append({'id': item_id, 'bucket': s3_record['s3']['bucket']['name'],
+                          'key': s3_record['s3']['object']['key']})
+    return items, failed
+
+
+def drain_queue(source: "queue.Queue", max_records: int = 100, timeout: float = 0.0) -> Dict[str, Any]:
+    """
+    Build a batch event from S3 records waiting on a local queue, a stand-in for SQS.
+
+    Args:
+        source: Queue of S3 event records
+        max_records: Most records to take
+        timeout: Seconds to wait for the first record
+    """
+    records = []
+    try:
+        records.append(source.get(timeout=timeout) if timeout else source.get_nowait())
+        while len(records) < max_records:
+            records.append(source.get_nowait())
+    except queue.Empty:
+        pass
+    return {'Records': records}
+
+
+def _extract(processor: WorkoutProcessor, item: Dict[str, Any]) -> Tuple[Optional[List[Dict]], Optional[Exception]]:
+    """Parse one file on a copy of the processor with its own (not thread-safe) timer and metrics"""
+    worker = copy.copy(processor)
+    worker.timer = StageTimer()
+    worker.metrics = InvocationMetrics()
+    event = {'Records': [{'s3': {'bucket': {'name': item['bucket']}, 'object': {'key': item['key']}}}]}
+    try:
+        return worker.extract_s3_data(event), None
+    except Exception as e:
+        return None, e
+
+
+def process_batch(event: Dict[str, Any], metrics: InvocationMetrics,
+                  timer: StageTimer) -> Tuple[int, Dict[str, Any]]:
+    """Ingest every file in a batch event with a single insert; return (status code, response body)"""
+    items, outcomes = batch_items(event)
+    if not items and not outcomes:
+        return 400, {"error": "Event does not contain valid 'Records'"}
+    metrics.put_metric("FilesInBatch", len(items))
+
+    with timer.stage("init"):
+        processor = WorkoutProcessor(metrics, timer)
+
+    spool = get_spool()
+    if spool:
+        with timer.stage("spool_flush"):
+            flush_spool(processor, spool)
+
+    with timer.stage("fetch_ids"):
+        seen_ids = fetch_existing_workouts()
+
+    with timer.stage("extract"):
+        workers = max(1, min(len(items), int(os.getenv("BATCH_PARSE_WORKERS", 4))))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch-parse') as executor:
+            extracted = list(executor.map(lambda item: _extract(processor, item), items))
+
+    # Files are merged in batch order, so a workout in several files counts as new for the first one only
+    with timer.stage("dedup"):
+        file_outcomes, new_by_file, batch_new = [], [], []
+        for item, (records, error) in zip(items, extracted):
+            outcome = {'id': item['id'], 'file': item['key']}
+            new_workouts = []
+            if error is not None:
+                outcome.update(status='failed', error=str(error))
+            else:
+                for record in records:
+                    if record['workout_id'] not in seen_ids:
+                        seen_ids.add(record['workout_id'])
+                        new_workouts.append(record)
+                outcome.update(status='inserted' if new_workouts else 'no_new',
+                               rows=len(records), new=len(new_workouts))
+            file_outcomes.append(outcome)
+            new_by_file.append(new_workouts)
+            batch_new.extend(new_workouts)
+    metrics.put_metric("RowsNew", len(batch_new))
+
+    if batch_new:
+        with timer.stage("insert"):
+            success = processor.insert_new_workouts(batch_new)
+        if success:
+            with timer.stage("publish"):
+                publish_new_workouts(batch_new, metrics)
+            for outcome, new_workouts in zip(file_outcomes, new_by_file):
+                if new_workouts:
+                    notification_dispatcher.submit(os.getenv("SNS_TOPIC_ARN"), len(new_workouts), outcome['file'])
+        else:
+            # Spooled files are acknowledged rather than redelivered; the next invocation's flush writes them
+            for outcome, new_workouts in zip(file_outcomes, new_by_file):
+                if not new_workouts:
+                    continue
+                if spool:
+                    spool.append(new_workouts, outcome['file'])
+                    outcome['status'] = 'spooled'
+                else:
+                    outcome.update(status='failed', error="Database insert failed")
+
+    outcomes = file_outcomes + outcomes
+    failed_ids = list(dict.fromkeys(o['id'] for o in outcomes if o['status'] == 'failed'))
+    metrics.put_metric("FilesFailed", sum(o['status'] == 'failed' for o in outcomes))
+    return (207 if failed_ids else 200), {
+        "message": f"Processed {len(items)} files: {len(batch_new)} new workouts",
+        "files": outcomes,
+        "failed_message_ids": failed_ids,
+    }
+
+
+def batch_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """Lambda handler for SQS batches of S3 upload notifications"""
+    configure_invocation_logging(logger)
+    logger.debug("Received batch event: %s", LazyJson(event))
+
+    timer = StageTimer(detailed=stage_timing_enabled())
+    metrics = InvocationMetrics({"FunctionName": getattr(context, 'function_name', 'workout-batch-processor')})
+    metrics.set_property("requestId", getattr(context, 'aws_request_id', None))
+
+    try:
+        status_code, body = process_batch(event, metrics, timer)
+        failed_ids = body["failed_message_ids"] if status_code in (200, 207) else []
+    except Exception as e:
+        error_msg = f"Unexpected error: {str(e)}"
+        logger.error(error_msg)
+        status_code, body = 500, {"error": error_msg}
+        # Redeliver everything; rows that did get stored are deduplicated on the retry
+        failed_ids = list(dict.fromkeys(r.get('messageId') for r in event.get('Records') or []
+                                        if r.get('messageId')))
+
+    with timer.stage("notify"):
+        notification_dispatcher.flush(float(os.getenv("SNS_FLUSH_TIMEOUT", 2)))
+
+    for stage, ms in timer.durations().items():
+        metrics.put_metric(f"{stage.title().replace('_', '')}Duration", ms, "Milliseconds")
+    metrics.set_property("statusCode", status_code)
+    metrics.emit()
+
+    return {
+        "statusCode": status_code,
+        "body": json.dumps(body, ensure_ascii=False),
+        "batchItemFailures": [{"itemIdentifier": item_id} for item_id in failed_ids],
+    }
@@ -0,0 +1,131 @@
+"""
+compression.py
+
+Streaming decompression for compressed CSV uploads.
+
+Exports may be uploaded gzip-, bzip2- or zstd-compressed to cut transfer
+time into the Lambda. decompressed() identifies the codec from the first
+bytes of the stream (with S3 Content-Encoding/Content-Type as a hint) and
+wraps the source in a decompressing reader, so the parser pulls
+decompressed chunks as it goes and neither the compressed nor the inflated
+object is ever held in memory whole. Plain input passes through unchanged.
+
+zstd needs the optional zstandard package.
+"""
+
+import io
+import bz2
+import gzip
+import logging
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+try:
+    import zstandard
+except ImportError:  # zstd input is optional
+    zstandard = None
+
+logger = logging.getLogger()
+
+CODECS = ('gzip', 'bz2', 'zstd')
+
+_MAGIC = (
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bz2'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+)
+_SNIFF_BYTES = 4
+
+# Content-Encoding and Content-Type values naming each codec
+_METADATA_CODECS = {
+    'gzip': 'gzip', 'x-gzip': 'gzip', 'application/gzip': 'gzip', 'application/x-gzip': 'gzip',
+    'bzip2': 'bz2', 'x-bzip2': 'bz2', 'application/x-bzip2': 'bz2',
+    'zstd': 'zstd', 'application/zstd': 'zstd',
+}
+
+_READ_BUFFER = 1024 * 1024
+
+
+def codec_from_metadata(content_encoding: Optional[str] = None,
+                        content_type: Optional[str] = None) -> Optional[str]:
+    """Codec named by an object's Content-Encoding or Content-Type, if any"""
+    for value in (content_encoding, content_type):
+        if value:
+            codec = _METADATA_CODECS.get(value.split(';')[0].strip().lower())
+            if codec:
+                return codec
+    return None
+
+
+def sniff_codec(head: bytes) -> Optional[str]:
+    """Codec whose magic number starts `head`, or None for uncompressed data"""
+    for magic, codec in _MAGIC:
+        if head.startswith(magic):
+            return codec
+    return None
+
+
+class _PrefixedStream(io.RawIOBase):
+    """Replays bytes already read from a stream before reading on from it"""
+
+    def __init__(self, prefix: bytes, stream):
+        self._prefix = prefix
+        self._stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._prefix:
+            n = min(len(buffer), len(self._prefix))
+            buffer[:n] = self._prefix[:n]
+            self._prefix = self._prefix[n:]
+            return n
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+@contextmanager
+def decompressed(source, hint: Optional[str] = None) -> Iterator[io.BufferedIOBase]:
+    """
+    Open a path or binary stream as a stream of decompressed bytes.
+
+    The magic bytes decide the codec. `hint` (e.g. from codec_from_metadata)
+    is only checked against them: an object labelled gzip whose bytes are
+    plain CSV is read as plain CSV, with a warning.
+
+    Args:
+        source: File path or binary file object, e.g. an S3 response body
+        hint: Codec the source's metadata claims
+
+    Yields:
+        Binary file object of decompressed bytes
+
+    Raises:
+        ValueError: If the source is zstd-compressed and zstandard isn't installed
+    """
+    owned = isinstance(source, (str, bytes)) or hasattr(source, '__fspath__')
+    raw = open(source, 'rb') if owned else source
+    try:
+        head = raw.read(_SNIFF_BYTES)
+        codec = sniff_codec(head)
+        if hint and hint != codec:
+            logger.warning("Input is labelled %s but its content is %s", hint, codec or 'uncompressed')
+        buffered = io.BufferedReader(_PrefixedStream(head, raw), buffer_size=_READ_BUFFER)
+        if codec is None:
+            yield buffered
+        elif codec == 'gzip':
+            with gzip.GzipFile(fileobj=buffered, mode='rb') as stream:
+                yield stream
+        elif codec == 'bz2':
+            with bz2.BZ2File(buffered, mode='rb') as stream:
+                yield stream
+        else:
+            if zstandard is None:
+                raise ValueError("zstd-compressed input requires the zstandard package")
+            with zstandard.ZstdDecompressor().stream_reader(buffered, read_across_frames=True) as stream:
+                yield stream
+    finally:
+        if owned:
+            raw.close()
@@ -0,0 +1,139 @@
+"""
+cpu_profiling.py
+
+Opt-in cProfile capture around the Lambda handler.
+
+With CPU_PROFILE set, a CPU_PROFILE_SAMPLE_RATE fraction of invocations
+(default: all of them) run under cProfile. Each profile is written as a
+pstats file (<request id>.prof) plus a collapsed-stack file
+(<request id>.folded) that flamegraph.pl or speedscope can render. Files go
+to CPU_PROFILE_OUTPUT, a local directory (default /tmp/profiles) or an
+s3://bucket/prefix.
+"""
+
+import os
+import time
+import marshal
+import random
+import pstats
+import logging
+import cProfile
+import functools
+from typing import Any, Callable, Dict, List, Optional
+
+import boto3
+
+logger = logging.getLogger()
+
+DEFAULT_OUTPUT = "/tmp/profiles"
+MAX_STACK_DEPTH = 64
+MIN_PATH_SHARE = 1e-4
+
+
+def should_profile() -> bool:
+    """Decide whether this invocation is profiled"""
+    if os.getenv("CPU_PROFILE", "").lower() not in ("1", "true", "yes", "on"):
+        return False
+    return random.random() < float(os.getenv("CPU_PROFILE_SAMPLE_RATE", 1))
+
+
+def _label(func) -> str:
+    filename, line, name = func
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def collapsed_stacks(stats: pstats.Stats) -> List[str]:
+    """
+    Convert pstats call-graph data to collapsed-stack lines ('a;b;c <microseconds>').
+
+    cProfile keeps caller/callee edges rather than full stacks, so time is
+    attributed down each path in proportion to the time spent on each edge.
+    This is the usual approximation for flame graphs built from profile data.
+    """
+    raw = stats.stats
+    callees: Dict[Any, Dict[Any, float]] = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, {})[func] = edge[3]
+
+    lines: Dict[str, int] = {}
+    # Paths carrying less than this share of the total are dropped, which bounds the walk
+    min_budget = getattr(stats, "total_tt", 0) * MIN_PATH_SHARE
+
+    def visit(func, path, budget):
+        total = raw[func][3]
+        if total <= 0 or budget <= min_budget:
+            return
+        ratio = min(budget / total, 1.0)
+        stack = path + [_label(func)]
+        own = int(raw[func][2] * ratio * 1e6)
+        if own:
+            key = ';'.join(stack)
+            lines[key] = lines.get(key, 0) + own
+        if len(stack) >= MAX_STACK_DEPTH:
+            return
+        for callee, edge_time in callees.get(func, {}).items():
+            if callee in raw and _label(callee) not in stack:
+                visit(callee, stack, edge_time * ratio)
+
+    roots = [func for func, value in raw.items() if not value[4]]
+    for root in roots:
+        visit(root, [], raw[root][3])
+    return [f"{stack} {weight}" for stack, weight in lines.items()]
+
+
+def write_profile(profiler: cProfile.Profile, request_id: str, output: Optional[str] = None) -> List[str]:
+    """
+    Store a finished profile as <request_id>.prof and <request_id>.folded.
+
+    Returns:
+        List[str]: Paths or s3:// URIs written
+    """
+    output = output or os.getenv("CPU_PROFILE_OUTPUT", DEFAULT_OUTPUT)
+    stats = pstats.Stats(profiler)
+
+    # Same bytes pstats.Stats.dump_stats writes, without a temp file
+    prof = marshal.dumps(stats.stats)
+    folded = ("\n".join(collapsed_stacks(stats)) + "\n").encode()
+
+    files = {f"{request_id}.prof": prof, f"{request_id}.folded": folded}
+    written = []
+    if output.startswith("s3://"):
+        bucket, _, prefix = output[len("s3://"):].partition("/")
+        s3_client = boto3.client("s3")
+        day = time.strftime("%Y/%m/%d")
+        for name, body in files.items():
+            key = "/".join(part for part in (prefix.strip("/"), day, name) if part)
+            s3_client.put_object(Bucket=bucket, Key=key, Body=body)
+            written.append(f"s3://{bucket}/{key}")
+    else:
+        os.makedirs(output, exist_ok=True)
+        for name, body in files.items():
+            path = os.path.join(output, name)
+            with open(path, "wb") as f:
+                f.write(body)
+            written.append(path)
+    return written
+
+
+def profile_invocation(handler: Callable) -> Callable:
+    """Decorator running sampled invocations of a Lambda handler under cProfile"""
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        if not should_profile():
+            return handler(event, context)
+
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(handler, event, context)
+        finally:
+            request_id = getattr(context, "aws_request_id", None) or f"local-{int(time.time() * 1000)}"
+            try:
+                written = write_profile(profiler, request_id)
+                logger.info("CPU profile written: %s", written)
+            except Exception as e:
+                # Profiling must never fail the invocation
+                logger.error("Failed to write CPU profile: %s", e)
+
+    return wrapper
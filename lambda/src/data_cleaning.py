@@ -1,6 +1,8 @@
+import os
 import pandas as pd
 import numpy as np
 import re
+import multiprocessing
 from datetime import datetime
 
 # Custom date parsing function
@@ -23,7 +25,7 @@ def parse_date(date_string):
 
 
 # Function to clean data
-def clean_data(df):
+def clean_data(df, report=None):
     """
     Function to clean data including:
         - drop unnecessary columns, 
@@ -31,6 +33,9 @@ def clean_data(df):
         - replace NaN values with None, 
         - date parsing for "Workout Date", and
         - rename columns to be more descriptive of units
+
+    If a `report` dict is passed it is filled with the row counts and the
+    date formats seen, so callers can log what was dropped and why.
     """
 
     initial_row_count = len(df)
@@ -53,11 +58,12 @@ def clean_data(df):
 
     # Custom date parsing
     date_formats, invalid_dates  = {}, []   
-    df['Workout Date'] = df['Workout Date'].apply(lambda x: parse_date(str(x)))
+    # Coerce so a column with no valid dates is still datetime64 (of NaT), not object (of None)
+    df['Workout Date'] = pd.to_datetime(df['Workout Date'].apply(lambda x: parse_date(str(x))), errors='coerce')
     
     for index, row in df.iterrows():
         date_string = str(row['Workout Date'])
-        if isinstance(row['Workout Date'], pd._libs.tslibs.nattype.NaTType):
+        if pd.isna(row['Workout Date']):
             invalid_dates.append((index, date_string))
         else:
             date_format = re.sub(r'\d+', '%', date_string)
@@ -81,4 +87,111 @@ def clean_data(df):
     # Reset the index after dropping rows
     df = df.reset_index(drop=True)
 
+    if report is not None:
+        report.update({
+            'initial_rows': initial_row_count,
+            'rows_dropped_zero_time': rows_dropped,
+            'rows_dropped_invalid_date': rows_dropped_invalid_date,
+            'final_rows': len(df),
+            'date_formats': date_formats,
+        })
+
+    return df
+
+
+def merge_cleaning_reports(reports):
+    """Combine per-partition cleaning reports into one, in partition order"""
+    merged = {
+        'initial_rows': 0,
+        'rows_dropped_zero_time': 0,
+        'rows_dropped_invalid_date': 0,
+        'final_rows': 0,
+        'date_formats': {},
+    }
+    for report in reports:
+        for field in ('initial_rows', 'rows_dropped_zero_time',
+                      'rows_dropped_invalid_date', 'final_rows'):
+            merged[field] += report[field]
+        for date_format, count in report['date_formats'].items():
+            merged['date_formats'][date_format] = merged['date_formats'].get(date_format, 0) + count
+    return merged
+
+
+def _clean_partition_worker(conn, df, start, stop):
+    """Clean rows [start, stop) of df in a child process and send the result back"""
+    try:
+        report = {}
+        cleaned = clean_data(df.iloc[start:stop], report=report)
+        conn.send((cleaned, report, None))
+    except Exception as e:
+        conn.send((None, None, f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+def clean_data_parallel(df, workers=None, min_rows_per_partition=50000, report=None):
+    """
+    Clean a large DataFrame by splitting it into contiguous row ranges and
+    cleaning each range in its own process.
+
+    Partitions are concatenated in their original order, so the result, the
+    rows dropped and the report counts are the same as for `clean_data`.
+    Small inputs (fewer than two partitions' worth of rows) or `workers <= 1`
+    fall back to the serial path.
+
+    Workers are started with `fork` where available, so each child inherits
+    the parsed frame copy-on-write and only its cleaned partition is sent
+    back over the pipe. Pipes are used rather than `multiprocessing.Pool`
+    because Lambda has no /dev/shm for the semaphores a pool needs.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(df) // max(min_rows_per_partition, 1))
+    if workers <= 1:
+        return clean_data(df, report=report)
+
+    methods = multiprocessing.get_all_start_methods()
+    ctx = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    inherits_parent = ctx.get_start_method() == 'fork'
+
+    bounds = np.linspace(0, len(df), workers + 1, dtype=int)
+    processes, pipes = [], []
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        parent_conn, child_conn = ctx.Pipe(duplex=False)
+        if inherits_parent:
+            args = (child_conn, df, start, stop)
+        else:
+            # Without fork the arguments are pickled, so only ship the slice
+            args = (child_conn, df.iloc[start:stop], 0, stop - start)
+        process = ctx.Process(target=_clean_partition_worker, args=args, daemon=True)
+        process.start()
+        child_conn.close()
+        processes.append(process)
+        pipes.append(parent_conn)
+
+    partitions, reports, errors = [], [], []
+    try:
+        # Receive before joining so a large partition can't block the pipe
+        for parent_conn in pipes:
+            try:
+                cleaned, partition_report, error = parent_conn.recv()
+            except EOFError:
+                cleaned, partition_report, error = None, None, "worker exited without a result"
+            if error:
+                errors.append(error)
+            else:
+                partitions.append(cleaned)
+                reports.append(partition_report)
+    finally:
+        for parent_conn in pipes:
+            parent_conn.close()
+        for process in processes:
+            process.join()
+
+    if errors:
+        raise RuntimeError(f"Parallel cleaning failed: {'; '.join(errors)}")
+
+    df = pd.concat(partitions, ignore_index=True)
+    if report is not None:
+        report.update(merge_cleaning_reports(reports))
     return df
\ No newline at end of file
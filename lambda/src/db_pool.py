@@ -0,0 +1,292 @@
+"""
+db_pool.py
+
+Process-wide MySQL connection pooling and credential caching.
+
+Lambda keeps the process alive between warm invocations, so connections
+and credentials held at module level are reused: a warm invocation costs
+neither a Secrets Manager call nor a TCP/TLS/auth handshake. Idle
+connections are pinged before reuse, replaced once they pass their
+maximum lifetime, and reopened when the server dropped them. An
+authentication failure refreshes the cached credentials once, which
+covers secret rotation.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+import boto3
+import pymysql
+
+logger = logging.getLogger()
+
+# MySQL error codes meaning the credentials were rejected
+AUTH_ERROR_CODES = {1044, 1045}
+# pymysql.constants.SERVER_STATUS.SERVER_STATUS_IN_TRANS
+_SERVER_STATUS_IN_TRANS = 1
+
+
+class CredentialsCache:
+    """Caches credentials from a loader for `ttl` seconds"""
+
+    def __init__(self, loader: Callable[[], Optional[Dict[str, Any]]], ttl: Optional[float] = None):
+        """
+        Args:
+            loader: Returns a dict with host, username, password, database and port
+            ttl: Seconds before credentials are reloaded (default DB_CREDENTIALS_TTL or 900)
+        """
+        self.loader = loader
+        self.ttl = ttl if ttl is not None else float(os.getenv("DB_CREDENTIALS_TTL", 900))
+        self._credentials = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, refresh: bool = False) -> Optional[Dict[str, Any]]:
+        """Cached credentials, reloading them if expired or if `refresh` is set"""
+        with self._lock:
+            expired = time.monotonic() - self._loaded_at >= self.ttl
+            if refresh or self._credentials is None or expired:
+                self._credentials = self.loader()
+                self._loaded_at = time.monotonic()
+            return self._credentials
+
+    def invalidate(self) -> None:
+        """Drop the cached credentials so the next get() reloads them"""
+        with self._lock:
+            self._credentials = None
+
+
+def secrets_manager_credentials(secret_name: str, region: str) -> Callable[[], Optional[Dict[str, Any]]]:
+    """Build a loader reading credentials from a Secrets Manager secret"""
+
+    def load():
+        client = boto3.client("secretsmanager", region_name=region)
+        response = client.get_secret_value(SecretId=secret_name)
+        secret = json.loads(response["SecretString"])
+        return {
+            "host": secret["host"],
+            "username": secret["username"],
+            "password": secret["password"],
+            "database": secret["dbname"],
+            "port": int(secret.get("port", 3306)),
+        }
+
+    return load
+
+
+class PooledConnection:
+    """
+    A pooled pymysql connection. close() hands it back to the pool instead
+    of closing it; everything else is delegated to the real connection.
+    """
+
+    def __init__(self, pool: "ConnectionPool", raw):
+        self._pool = pool
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.in_use = True
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def close(self) -> None:
+        """Return the connection to the pool"""
+        self._pool.release(self)
+
+    def discard(self) -> None:
+        """Close the underlying connection instead of returning it"""
+        self._pool.discard(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if isinstance(exc, pymysql.err.OperationalError):
+            self.discard()
+        else:
+            self.close()
+        return False
+
+
+class ConnectionPool:
+    """Bounded pool of MySQL connections shared by every invocation in the process"""
+
+    def __init__(self, credentials: CredentialsCache, size: Optional[int] = None,
+                 max_lifetime: Optional[float] = None, ping_interval: Optional[float] = None,
+                 connect_timeout: int = 10, connect: Optional[Callable] = None):
+        """
+        Args:
+            credentials: Cache supplying connection credentials
+            size: Maximum open connections (default DB_POOL_SIZE or 4)
+            max_lifetime: Seconds before a connection is replaced (default DB_POOL_MAX_LIFETIME or 3600)
+            ping_interval: Connections idle longer than this are pinged before reuse
+                (default DB_POOL_PING_INTERVAL or 30; 0 pings every time)
+            connect_timeout: Seconds allowed for a new connection
+            connect: Connection factory, pymysql.connect by default
+        """
+        self.credentials = credentials
+        self.size = size or int(os.getenv("DB_POOL_SIZE", 4))
+        self.max_lifetime = max_lifetime if max_lifetime is not None else float(os.getenv("DB_POOL_MAX_LIFETIME", 3600))
+        self.ping_interval = ping_interval if ping_interval is not None else float(os.getenv("DB_POOL_PING_INTERVAL", 30))
+        self.connect_timeout = connect_timeout
+        self._connect = connect
+        self._idle = []
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self.stats = {"connects": 0, "reuses": 0, "pings": 0, "discards": 0}
+
+    def _open(self) -> PooledConnection:
+        """Open a new connection, refreshing the credentials once if they're rejected"""
+        for attempt in range(2):
+            credentials = self.credentials.get(refresh=attempt > 0)
+            if not credentials or not credentials.get("host"):
+                raise pymysql.err.OperationalError(2003, "No database credentials available")
+            try:
+                raw = (self._connect or pymysql.connect)(
+                    host=credentials["host"],
+                    user=credentials["username"],
+                    password=credentials["password"],
+                    database=credentials["database"],
+                    port=credentials["port"],
+                    connect_timeout=self.connect_timeout,
+                )
+                self.stats["connects"] += 1
+                return PooledConnection(self, raw)
+            except pymysql.err.OperationalError as e:
+                if attempt == 0 and e.args and e.args[0] in AUTH_ERROR_CODES:
+                    logger.warning("Database rejected cached credentials; refreshing them")
+                    continue
+                raise
+
+    def _usable(self, conn: PooledConnection) -> bool:
+        now = time.monotonic()
+        if now - conn.created_at >= self.max_lifetime:
+            return False
+        if now - conn.last_used >= self.ping_interval:
+            self.stats["pings"] += 1
+            try:
+                conn.raw.ping(reconnect=False)
+            except Exception:
+                return False
+        return True
+
+    def acquire(self, timeout: Optional[float] = None) -> PooledConnection:
+        """
+        Check out a connection, reusing a healthy idle one when possible.
+
+        Raises:
+            TimeoutError: If all `size` connections stay checked out for `timeout` seconds
+            pymysql.err.OperationalError: If a new connection can't be opened
+        """
+        if not self._slots.acquire(timeout=timeout if timeout is not None else float(os.getenv("DB_POOL_TIMEOUT", 30))):
+            raise TimeoutError("Timed out waiting for a database connection")
+        try:
+            while True:
+                with self._lock:
+                    conn = self._idle.pop() if self._idle else None
+                if conn is None:
+                    return self._open()
+                if self._usable(conn):
+                    self.stats["reuses"] += 1
+                    conn.in_use = True
+                    return conn
+                self._close_raw(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn: PooledConnection) -> None:
+        """Return a checked-out connection; any open transaction is rolled back"""
+        if not conn.in_use:
+            return
+        # Skip the round trip when the server says no transaction is open
+        if getattr(conn.raw, "server_status", _SERVER_STATUS_IN_TRANS) & _SERVER_STATUS_IN_TRANS:
+            try:
+                conn.raw.rollback()
+            except Exception:
+                self.discard(conn)
+                return
+        conn.in_use = False
+        conn.last_used = time.monotonic()
+        with self._lock:
+            self._idle.append(conn)
+        self._slots.release()
+
+    def discard(self, conn: PooledConnection) -> None:
+        """Close a checked-out connection that is broken or must not be reused"""
+        if not conn.in_use:
+            return
+        conn.in_use = False
+        self._close_raw(conn)
+        self._slots.release()
+
+    def _close_raw(self, conn: PooledConnection) -> None:
+        self.stats["discards"] += 1
+        try:
+            conn.raw.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for a with-block; it is discarded if the server dropped it"""
+        conn = self.acquire()
+        with conn:
+            yield conn
+
+    def run(self, operation: Callable[[Any], Any], retries: int = 1):
+        """
+        Run operation(connection), retrying on a fresh connection after an OperationalError.
+
+        Only use for operations that are safe to repeat, such as reads or
+        single-transaction writes that commit at the end.
+        """
+        for attempt in range(retries + 1):
+            try:
+                with self.connection() as conn:
+                    return operation(conn)
+            except pymysql.err.OperationalError as e:
+                if attempt == retries:
+                    raise
+                logger.warning("Database operation failed (%s); retrying on a new connection", e)
+
+    def close_all(self) -> None:
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._close_raw(conn)
+
+
+_pools: Dict[Any, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(name: Any, loader: Callable[[], Optional[Dict[str, Any]]], **kwargs) -> ConnectionPool:
+    """
+    The process-wide pool registered under `name`, created on first use.
+
+    Args:
+        name: Pool identity, e.g. a secret name
+        loader: Credential loader for the pool's CredentialsCache
+        kwargs: Passed to ConnectionPool when the pool is created
+    """
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = _pools[name] = ConnectionPool(CredentialsCache(loader), **kwargs)
+        return pool
+
+
+def reset_pools() -> None:
+    """Close and forget every pool (for tests and local scripts)"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close_all()
+        _pools.clear()
@@ -0,0 +1,102 @@
+"""
+memory_profiling.py
+
+Opt-in peak-memory profiling for pipeline stages.
+
+Each stage records the peak Python allocation above its starting level
+(via tracemalloc, which numpy and pandas buffers report to) and the
+process RSS when it ends. tracemalloc slows allocation-heavy code
+noticeably, so this only runs when MEMORY_PROFILE is set.
+"""
+
+import os
+import resource
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def memory_profiling_enabled() -> bool:
+    """Return True if the MEMORY_PROFILE environment variable enables profiling"""
+    return os.getenv("MEMORY_PROFILE", "").lower() in ("1", "true", "yes", "on")
+
+
+def current_rss_bytes() -> int:
+    """Resident set size of this process now, falling back to its high-water mark"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    """Highest resident set size this process has reached"""
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class MemoryProfiler:
+    """Tracks peak allocation per stage, including stages nested inside others"""
+
+    def __init__(self):
+        self._started_tracing = False
+        self._frames: List[Dict[str, Any]] = []
+        self.stages: List[Dict[str, Any]] = []
+
+    def start(self) -> None:
+        """Begin tracing allocations if nothing else already is"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self) -> None:
+        """Stop tracing if this profiler started it"""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def enter(self, node: Dict[str, Any]) -> None:
+        """Start measuring a stage; `node` receives the results on exit"""
+        if self._frames:
+            # Fold the parent's peak so far in before resetting it for the child
+            parent = self._frames[-1]
+            parent['max_peak'] = max(parent['max_peak'], tracemalloc.get_traced_memory()[1])
+        frame = {'node': node, 'start': 0, 'max_peak': 0}
+        self._frames.append(frame)
+        # Take the baseline after this bookkeeping so it isn't counted against the stage
+        tracemalloc.reset_peak()
+        frame['start'] = frame['max_peak'] = tracemalloc.get_traced_memory()[0]
+
+    def exit(self, node: Dict[str, Any]) -> None:
+        """Finish measuring the innermost stage and store its results on `node`"""
+        _, peak = tracemalloc.get_traced_memory()
+        frame = self._frames.pop()
+        absolute_peak = max(frame['max_peak'], peak)
+        if self._frames:
+            parent = self._frames[-1]
+            parent['max_peak'] = max(parent['max_peak'], absolute_peak)
+        node['peak_alloc_bytes'] = absolute_peak - frame['start']
+        node['rss_bytes'] = current_rss_bytes()
+        self.stages.append(node)
+
+    def summary(self, input_bytes: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Largest peak allocation per stage name.
+
+        Args:
+            input_bytes: Size of the input file; adds allocation per input byte
+
+        Returns:
+            {stage: {'peak_alloc_bytes', 'rss_bytes'[, 'alloc_per_input_byte']}}
+        """
+        result: Dict[str, Dict[str, Any]] = {}
+        for node in self.stages:
+            entry = result.setdefault(node['name'], {'peak_alloc_bytes': 0, 'rss_bytes': 0})
+            entry['peak_alloc_bytes'] = max(entry['peak_alloc_bytes'], node['peak_alloc_bytes'])
+            entry['rss_bytes'] = max(entry['rss_bytes'], node['rss_bytes'])
+        if input_bytes:
+            for entry in result.values():
+                entry['alloc_per_input_byte'] = round(entry['peak_alloc_bytes'] / input_bytes, 3)
+        return result
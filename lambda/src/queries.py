@@ -0,0 +1,168 @@
+"""
+queries.py
+
+Read-side queries over the workout dataset kept by a StorageHandler.
+
+The handler mirrors every successful insert into the month-partitioned
+'workouts' dataset, as append-only part files, and bumps the storage's
+ingestion version. Queries drop rows repeated across parts by workout_id. Query
+results are cached under (query, parameters, ingestion version), so a
+repeated query is answered from memory until new data actually arrives.
+The only storage read on a cache hit is the version itself, and
+QUERY_VERSION_CHECK_INTERVAL can make even that periodic.
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from itertools import groupby
+from typing import Any, Callable, Hashable, Optional
+
+import pandas as pd
+
+WORKOUT_DATASET = 'workouts'
+# Identifies a workout across the dataset's part files
+KEY_COLUMN = 'workout_id'
+
+MEASURE_COLUMNS = {
+    'kcal_burned': 'Calories Burned (kcal)',
+    'distance_mi': 'Distance (mi)',
+    'duration_sec': 'Workout Time (seconds)',
+}
+
+
+class QueryCache:
+    """Thread-safe LRU cache of query results"""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        """
+        Args:
+            max_entries: Results kept before the least recently used is evicted (default QUERY_CACHE_SIZE or 128)
+        """
+        self.max_entries = max_entries or int(os.getenv("QUERY_CACHE_SIZE", 128))
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Cached value for `key`, computing and storing it on a miss"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        """Drop every cached result"""
+        with self._lock:
+            self._entries.clear()
+
+
+def _storage_identity(storage) -> tuple:
+    """Identify the storage location, so handler instances over the same data share cache entries"""
+    location = getattr(storage, 'base_path', None) or getattr(storage, 'bucket', None) or id(storage)
+    return type(storage).__name__, location
+
+
+# Shared by every WorkoutQueries in the process unless one is given a cache
+_default_cache = QueryCache()
+
+
+class WorkoutQueries:
+    """Cached queries over the workouts dataset of a StorageHandler"""
+
+    def __init__(self, storage, dataset: str = WORKOUT_DATASET, cache: Optional[QueryCache] = None,
+                 version_check_interval: Optional[float] = None):
+        """
+        Args:
+            storage: StorageHandler holding the dataset and its ingestion version
+                (local or S3; RDS tables aren't partitioned datasets)
+            dataset: Partitioned dataset name under current/
+            cache: Result cache (the process-wide one by default)
+            version_check_interval: Seconds to reuse a read ingestion version
+                (default QUERY_VERSION_CHECK_INTERVAL or 0, i.e. check on every query)
+        """
+        if not getattr(storage, 'supports_datasets', False):
+            raise ValueError(f"{type(storage).__name__} can't hold the workout dataset")
+        self.storage = storage
+        self.dataset = dataset
+        self.cache = cache or _default_cache
+        self.version_check_interval = (version_check_interval if version_check_interval is not None
+                                       else float(os.getenv("QUERY_VERSION_CHECK_INTERVAL", 0)))
+        self._version = None
+        self._version_read_at = 0.0
+
+    def ingestion_version(self) -> str:
+        """The storage's ingestion version, re-read at most every version_check_interval seconds"""
+        now = time.monotonic()
+        if self._version is None or now - self._version_read_at >= self.version_check_interval:
+            self._version = self.storage.get_ingestion_version()
+            self._version_read_at = now
+        return self._version
+
+    def _cached(self, name: str, params: tuple, compute: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        # The version is read before the data, so a result is never older than the version it's cached under
+        key = (_storage_identity(self.storage), self.dataset, name, params, self.ingestion_version())
+        # Callers get a copy so they can't modify the cached frame
+        return self.cache.get_or_compute(key, compute).copy()
+
+    def totals_by_activity(self, start=None, end=None) -> pd.DataFrame:
+        """
+        Workout count, calories, distance and duration per activity for [start, end).
+
+        Returns:
+            DataFrame with columns activity_type, workouts, kcal_burned, distance_mi, duration_sec
+        """
+        def compute():
+            df = self.storage.read_partitions(
+                self.dataset, start, end, columns=['Activity Type'] + list(MEASURE_COLUMNS.values()),
+                key_columns=[KEY_COLUMN])
+            if df.empty:
+                return pd.DataFrame(columns=['activity_type', 'workouts'] + list(MEASURE_COLUMNS))
+            grouped = df.groupby('Activity Type', sort=True)
+            totals = grouped[list(MEASURE_COLUMNS.values())].sum().rename(
+                columns={v: k for k, v in MEASURE_COLUMNS.items()})
+            totals.insert(0, 'workouts', grouped.size())
+            return totals.rename_axis('activity_type').reset_index()
+
+        params = (str(pd.Timestamp(start)) if start is not None else None,
+                  str(pd.Timestamp(end)) if end is not None else None)
+        return self._cached('totals_by_activity', params, compute)
+
+    def last_workouts(self, n: int = 10) -> pd.DataFrame:
+        """
+        The `n` most recent workouts, newest first.
+
+        Months are read newest first, every part file of a month at a time,
+        stopping after the month in which `n` workouts have been found. Parts
+        within a month aren't in date order, so no month is cut short.
+        """
+        def compute():
+            frames = []
+            found = set()
+            partitions = [k for k in self.storage.list_partitions(self.dataset) if 'year=unknown' not in k]
+            for _, month_keys in groupby(reversed(partitions), key=lambda k: k.rsplit('/', 1)[0]):
+                for key in month_keys:
+                    frame = self.storage.read_file(key)
+                    frames.append(frame)
+                    found.update(frame[KEY_COLUMN])
+                if len(found) >= n:
+                    break
+            if not frames:
+                return pd.DataFrame()
+            # Files were read newest first, so the first copy of a workout is its latest write
+            df = pd.concat(frames, ignore_index=True).drop_duplicates(subset=[KEY_COLUMN], keep='first')
+            df['Workout Date'] = pd.to_datetime(df['Workout Date'], errors='coerce')
+            return df.sort_values('Workout Date', ascending=False, kind='stable').head(n).reset_index(drop=True)
+
+        return self._cached('last_workouts', (n,), compute)
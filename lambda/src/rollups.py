@@ -0,0 +1,248 @@
+"""
+rollups.py
+
+Incrementally maintained workout rollups.
+
+Each successful insert adds the new workouts' totals (count, calories,
+distance, duration) to per-activity rows at daily, weekly and monthly
+granularity. Dashboards read those rows directly instead of running
+GROUP BY over all of workout_summary.
+
+ROLLUP_STORE selects where rollups live:
+- off (default): no rollups
+- db: a workout_rollup table, updated in the same transaction as the insert
+- local: a JSON file at ROLLUP_PATH, for local runs without a database
+
+The insert path only upserts into workout_rollup, so the Lambda's
+database user needs no DDL privilege. Create the table once, before
+setting ROLLUP_STORE=db, with scripts/migrate_rollups.py.
+"""
+
+import os
+import json
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+logger = logging.getLogger()
+
+GRANULARITIES = ('day', 'week', 'month')
+MEASURES = ('workout_count', 'kcal_burned', 'distance_mi', 'duration_sec')
+ROLLUP_COLUMNS = ('granularity', 'period_start', 'activity_type') + MEASURES
+
+ROLLUP_DDL = {
+    'mysql': """
+        CREATE TABLE IF NOT EXISTS workout_rollup (
+            granularity VARCHAR(8) NOT NULL,
+            period_start DATE NOT NULL,
+            activity_type VARCHAR(64) NOT NULL,
+            workout_count INT NOT NULL,
+            kcal_burned DOUBLE NOT NULL,
+            distance_mi DOUBLE NOT NULL,
+            duration_sec DOUBLE NOT NULL,
+            PRIMARY KEY (granularity, period_start, activity_type)
+        )
+    """,
+    'sqlite': """
+        CREATE TABLE IF NOT EXISTS workout_rollup (
+            granularity TEXT NOT NULL,
+            period_start TEXT NOT NULL,
+            activity_type TEXT NOT NULL,
+            workout_count INTEGER NOT NULL,
+            kcal_burned REAL NOT NULL,
+            distance_mi REAL NOT NULL,
+            duration_sec REAL NOT NULL,
+            PRIMARY KEY (granularity, period_start, activity_type)
+        )
+    """,
+}
+
+_INSERT = "INSERT INTO workout_rollup ({}) VALUES ({})".format(
+    ', '.join(ROLLUP_COLUMNS), ', '.join(['%s'] * len(ROLLUP_COLUMNS)))
+
+# Adds each delta to the existing row instead of replacing it
+ROLLUP_UPSERT_SQL = {
+    'mysql': _INSERT + " ON DUPLICATE KEY UPDATE " + ', '.join(
+        f"{m} = {m} + VALUES({m})" for m in MEASURES),
+    'sqlite': _INSERT + " ON CONFLICT (granularity, period_start, activity_type) DO UPDATE SET " + ', '.join(
+        f"{m} = {m} + excluded.{m}" for m in MEASURES),
+}
+
+
+def period_start(dates: pd.Series, granularity: str) -> pd.Series:
+    """First day of the day, ISO week (Monday) or month each date falls in"""
+    days = dates.dt.normalize()
+    if granularity == 'day':
+        return days
+    if granularity == 'week':
+        return days - pd.to_timedelta(days.dt.weekday, unit='D')
+    if granularity == 'month':
+        return days - pd.to_timedelta(days.dt.day - 1, unit='D')
+    raise ValueError(f"Unsupported granularity: {granularity}")
+
+
+def compute_rollup_deltas(workouts: List[Dict]) -> List[tuple]:
+    """
+    Aggregate new workout records into rollup deltas.
+
+    Args:
+        workouts: Cleaned workout records, as passed to insert_new_workouts
+
+    Returns:
+        List of tuples in ROLLUP_COLUMNS order
+    """
+    if not workouts:
+        return []
+    df = pd.DataFrame(workouts, columns=['Workout Date', 'Activity Type', 'Calories Burned (kcal)',
+                                         'Distance (mi)', 'Workout Time (seconds)'])
+    frame = pd.DataFrame({
+        'date': pd.to_datetime(df['Workout Date'], errors='coerce'),
+        'activity_type': df['Activity Type'].fillna('Unknown').astype(str),
+        'workout_count': 1,
+        'kcal_burned': pd.to_numeric(df['Calories Burned (kcal)'], errors='coerce'),
+        'distance_mi': pd.to_numeric(df['Distance (mi)'], errors='coerce'),
+        'duration_sec': pd.to_numeric(df['Workout Time (seconds)'], errors='coerce'),
+    }).dropna(subset=['date'])
+
+    deltas = []
+    for granularity in GRANULARITIES:
+        frame['period_start'] = period_start(frame['date'], granularity).dt.strftime('%Y-%m-%d')
+        grouped = frame.groupby(['period_start', 'activity_type'], sort=True)[list(MEASURES)].sum()
+        for (start, activity), row in grouped.iterrows():
+            deltas.append((granularity, start, activity, int(row['workout_count']),
+                           float(row['kcal_burned']), float(row['distance_mi']), float(row['duration_sec'])))
+    return deltas
+
+
+def _dialect(connection) -> str:
+    dialect = getattr(connection, 'dialect', 'mysql')
+    return dialect if dialect in ROLLUP_DDL else 'mysql'
+
+
+def _matches(row: Dict[str, Any], granularity: str, start, end, activity_type) -> bool:
+    return (row['granularity'] == granularity
+            and (start is None or row['period_start'] >= str(pd.Timestamp(start).date()))
+            and (end is None or row['period_start'] < str(pd.Timestamp(end).date()))
+            and (activity_type is None or row['activity_type'] == activity_type))
+
+
+class SQLRollupStore:
+    """Rollups in the workout_rollup table, updated inside the insert transaction"""
+
+    transactional = True
+
+    def create_table(self, connection) -> None:
+        """Create workout_rollup if it doesn't exist; a migration step, never run on insert"""
+        with connection.cursor() as cursor:
+            cursor.execute(ROLLUP_DDL[_dialect(connection)])
+        connection.commit()
+
+    def apply(self, deltas: List[tuple], connection=None, cursor=None) -> None:
+        """Add deltas to the rollup rows using the caller's cursor; the caller commits"""
+        if deltas:
+            cursor.executemany(ROLLUP_UPSERT_SQL[_dialect(connection)], deltas)
+
+    def query(self, connection, granularity: str, start=None, end=None,
+              activity_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Pre-aggregated rows for one granularity, optionally limited to [start, end) and an activity.
+
+        Served from the primary key, so the cost depends on the rows
+        returned, not on the size of workout_summary.
+        """
+        sql = "SELECT {} FROM workout_rollup WHERE granularity = %s".format(', '.join(ROLLUP_COLUMNS))
+        params: List[Any] = [granularity]
+        if start is not None:
+            sql += " AND period_start >= %s"
+            params.append(str(pd.Timestamp(start).date()))
+        if end is not None:
+            sql += " AND period_start < %s"
+            params.append(str(pd.Timestamp(end).date()))
+        if activity_type is not None:
+            sql += " AND activity_type = %s"
+            params.append(activity_type)
+        sql += " ORDER BY period_start, activity_type"
+        with connection.cursor() as cursor:
+            cursor.execute(sql, tuple(params))
+            return [dict(zip(ROLLUP_COLUMNS, (str(v) if i == 1 else v for i, v in enumerate(row))))
+                    for row in cursor.fetchall()]
+
+    def rebuild(self, connection) -> int:
+        """
+        Recompute all rollups from workout_summary, e.g. to backfill existing data.
+
+        Returns:
+            int: Number of rollup rows written
+        """
+        self.create_table(connection)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT workout_date, activity_type, kcal_burned, distance_mi, duration_sec "
+                           "FROM workout_summary")
+            workouts = [dict(zip(['Workout Date', 'Activity Type', 'Calories Burned (kcal)', 'Distance (mi)',
+                                  'Workout Time (seconds)'], row)) for row in cursor.fetchall()]
+            deltas = compute_rollup_deltas(workouts)
+            cursor.execute("DELETE FROM workout_rollup")
+            self.apply(deltas, connection, cursor)
+        connection.commit()
+        return len(deltas)
+
+
+class LocalRollupStore:
+    """Rollups in a JSON file, for local runs without a database"""
+
+    transactional = False
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def apply(self, deltas: List[tuple], connection=None, cursor=None) -> None:
+        """Add deltas to the stored rows; called after the insert has committed"""
+        if not deltas:
+            return
+        with self._lock:
+            rows = self._load()
+            for delta in deltas:
+                key = '|'.join(delta[:3])
+                row = rows.setdefault(key, dict(zip(ROLLUP_COLUMNS[:3], delta[:3]), **{m: 0 for m in MEASURES}))
+                for measure, value in zip(MEASURES, delta[3:]):
+                    row[measure] += value
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f'{self.path}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(rows, f)
+            os.replace(tmp_path, self.path)
+
+    def query(self, connection, granularity: str, start=None, end=None,
+              activity_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Stored rows for one granularity, optionally limited to [start, end) and an activity"""
+        rows = [row for row in self._load().values() if _matches(row, granularity, start, end, activity_type)]
+        return sorted(rows, key=lambda row: (row['period_start'], row['activity_type']))
+
+
+_stores: Dict[str, Any] = {}
+
+
+def get_rollup_store():
+    """The rollup store selected by ROLLUP_STORE, or None when rollups are off"""
+    kind = os.getenv('ROLLUP_STORE', 'off').lower()
+    if kind == 'off':
+        return None
+    if kind == 'db':
+        key = kind
+    elif kind == 'local':
+        key = f"local:{os.getenv('ROLLUP_PATH', 'local_testing/rollups.json')}"
+    else:
+        raise ValueError(f"Unsupported rollup store: {kind}")
+    if key not in _stores:
+        _stores[key] = SQLRollupStore() if kind == 'db' else LocalRollupStore(key[len('local:'):])
+    return _stores[key]
@@ -0,0 +1,218 @@
+"""
+spool.py
+
+Write-ahead spool for cleaned workouts that couldn't be inserted.
+
+When RDS is slow or unreachable, the processor stores the cleaned,
+deduplicated batch here instead of dropping it. Later invocations flush
+spooled batches into the database before doing anything else, and a
+retried event for a spooled file is answered from the spool without
+downloading or parsing the file again.
+
+Batches live in a SQLite file (SPOOL_PATH, default /tmp/workout_spool.db)
+as zlib-compressed JSON, one row per batch. /tmp survives only while the
+Lambda container stays warm; point SPOOL_PATH at an EFS mount to keep
+batches across cold starts. WRITE_SPOOL turns spooling on.
+"""
+
+import os
+import json
+import time
+import zlib
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+logger = logging.getLogger()
+
+SPOOL_DDL = """
+    CREATE TABLE IF NOT EXISTS spool_batch (
+        batch_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        source TEXT,
+        created_at REAL NOT NULL,
+        row_count INTEGER NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        payload BLOB NOT NULL
+    )
+"""
+
+
+class DatabaseUnavailable(Exception):
+    """Raised by a flush's write callback when no database connection could be made"""
+
+
+def spool_enabled() -> bool:
+    """Return True if the WRITE_SPOOL environment variable enables spooling"""
+    return os.getenv("WRITE_SPOOL", "").lower() in ("1", "true", "yes", "on")
+
+
+def _json_default(value: Any) -> Any:
+    if value is pd.NaT:
+        return None
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, 'item'):  # numpy scalars
+        return value.item()
+    return str(value)
+
+
+def encode_batch(workouts: List[Dict]) -> bytes:
+    """Serialize workout records compactly, remembering which fields held timestamps"""
+    datetime_fields = sorted({k for w in workouts for k, v in w.items()
+                              if isinstance(v, (datetime, date)) and not pd.isna(v)})
+    body = json.dumps({'datetime_fields': datetime_fields, 'records': workouts}, default=_json_default)
+    return zlib.compress(body.encode('utf-8'))
+
+
+def decode_batch(payload: bytes) -> List[Dict]:
+    """Inverse of encode_batch; timestamp fields come back as pandas Timestamps"""
+    body = json.loads(zlib.decompress(payload).decode('utf-8'))
+    records = body['records']
+    for field in body['datetime_fields']:
+        for record in records:
+            if record.get(field) is not None:
+                record[field] = pd.Timestamp(record[field])
+    return records
+
+
+class WorkoutSpool:
+    """Spooled workout batches in a local SQLite file, flushed oldest first"""
+
+    def __init__(self, path: str, max_attempts: Optional[int] = None):
+        """
+        Args:
+            path: SQLite file holding the spool
+            max_attempts: Failed flushes after which a batch is set aside
+                (default SPOOL_MAX_ATTEMPTS or 5), so one bad batch can't block the rest
+        """
+        self.path = path
+        self.max_attempts = max_attempts or int(os.getenv("SPOOL_MAX_ATTEMPTS", 5))
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(SPOOL_DDL)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """A connection whose work commits on exit"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def append(self, workouts: List[Dict], source: Optional[str] = None) -> int:
+        """
+        Spool a batch of cleaned workouts.
+
+        Args:
+            workouts: Records as passed to insert_new_workouts
+            source: File key the batch came from
+
+        Returns:
+            int: The batch's id
+        """
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO spool_batch (source, created_at, row_count, payload) VALUES (?, ?, ?, ?)",
+                (source, time.time(), len(workouts), encode_batch(workouts)))
+            return cursor.lastrowid
+
+    def _batches(self, condition: str, source: Optional[str]) -> List[Dict[str, Any]]:
+        sql = ("SELECT batch_id, source, created_at, row_count, attempts FROM spool_batch "
+               f"WHERE attempts {condition} ?")
+        params: List[Any] = [self.max_attempts]
+        if source is not None:
+            sql += " AND source = ?"
+            params.append(source)
+        with self._connect() as conn:
+            rows = conn.execute(sql + " ORDER BY batch_id", params).fetchall()
+        return [dict(zip(('batch_id', 'source', 'created_at', 'row_count', 'attempts'), row)) for row in rows]
+
+    def pending(self, source: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Batches still to flush, oldest first, optionally only those from one file"""
+        return self._batches('<', source)
+
+    def set_aside(self, source: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Batches no longer flushed after SPOOL_MAX_ATTEMPTS failed writes; kept for inspection"""
+        return self._batches('>=', source)
+
+    def load(self, batch_id: int) -> List[Dict]:
+        """The workout records of one batch"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT payload FROM spool_batch WHERE batch_id = ?", (batch_id,)).fetchone()
+        if row is None:
+            raise KeyError(batch_id)
+        return decode_batch(row[0])
+
+    def remove(self, batch_id: int) -> None:
+        """Drop a batch once it has been written"""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM spool_batch WHERE batch_id = ?", (batch_id,))
+
+    def _record_failure(self, batch_id: int) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE spool_batch SET attempts = attempts + 1 WHERE batch_id = ?", (batch_id,))
+
+    def flush(self, write: Callable[[Dict[str, Any], List[Dict]], bool],
+              max_batches: Optional[int] = None) -> Dict[str, int]:
+        """
+        Write pending batches oldest first, removing each one `write` accepts.
+
+        Stops at the first failure. If `write` raises DatabaseUnavailable,
+        nothing counts against the batch: an outage says nothing about its
+        rows. Any other failure happened with a connection in hand, so the
+        batch's attempt count goes up.
+
+        Args:
+            write: Called with (batch info, records); returns True once the records are stored
+            max_batches: Flush at most this many batches
+
+        Returns:
+            Dict with the number of 'batches' and 'rows' flushed, 'remaining'
+            batches and batches 'set_aside' after too many failed writes
+        """
+        flushed = {'batches': 0, 'rows': 0}
+        for batch in self.pending()[:max_batches]:
+            try:
+                ok = write(batch, self.load(batch['batch_id']))
+            except DatabaseUnavailable as e:
+                logger.warning("Stopping spool flush, database unavailable: %s", e)
+                break
+            except Exception as e:
+                logger.error("Error flushing spooled batch %s: %s", batch['batch_id'], e)
+                ok = False
+            if not ok:
+                self._record_failure(batch['batch_id'])
+                if batch['attempts'] + 1 >= self.max_attempts:
+                    logger.error("Setting aside spooled batch %s from %s after %d failed flushes",
+                                 batch['batch_id'], batch['source'], batch['attempts'] + 1)
+                break
+            self.remove(batch['batch_id'])
+            flushed['batches'] += 1
+            flushed['rows'] += batch['row_count']
+        flushed['remaining'] = len(self.pending())
+        flushed['set_aside'] = len(self.set_aside())
+        if flushed['batches']:
+            logger.info("Flushed %d spooled batches (%d workouts), %d remaining",
+                        flushed['batches'], flushed['rows'], flushed['remaining'])
+        return flushed
+
+
+_spools: Dict[str, WorkoutSpool] = {}
+
+
+def get_spool() -> Optional[WorkoutSpool]:
+    """The spool at SPOOL_PATH, or None when WRITE_SPOOL is off"""
+    if not spool_enabled():
+        return None
+    path = os.getenv("SPOOL_PATH", "/tmp/workout_spool.db")
+    if path not in _spools:
+        _spools[path] = WorkoutSpool(path)
+    return _spools[path]
@@ -0,0 +1,88 @@
+"""
+stage_timing.py
+
+Per-invocation stage timing for the Lambda handler.
+
+Top-level stages are always timed (they feed the EMF duration metrics).
+The nested timing tree is only collected when STAGE_TIMING is enabled or
+a memory profiler is attached; otherwise nested stages return a shared
+no-op context manager and never touch the clock.
+"""
+
+import os
+import time
+from contextlib import nullcontext
+from typing import Any, Dict, List
+
+_NULL_STAGE = nullcontext()
+
+
+def stage_timing_enabled() -> bool:
+    """Return True if the STAGE_TIMING environment variable asks for the full timing tree"""
+    return os.getenv("STAGE_TIMING", "").lower() in ("1", "true", "yes", "on")
+
+
+class _Span:
+    """Context manager recording one timed stage into its parent's children"""
+
+    __slots__ = ("timer", "node", "start")
+
+    def __init__(self, timer: "StageTimer", name: str, attrs: Dict[str, Any]):
+        self.timer = timer
+        self.node = {"name": name, **attrs}
+        self.start = 0.0
+
+    def __enter__(self):
+        stack = self.timer._stack
+        siblings = stack[-1].setdefault("children", []) if stack else self.timer.stages
+        siblings.append(self.node)
+        stack.append(self.node)
+        if self.timer.memory is not None:
+            self.timer.memory.enter(self.node)
+        self.start = time.perf_counter()
+        return self.node
+
+    def __exit__(self, exc_type, exc, tb):
+        self.node["ms"] = round((time.perf_counter() - self.start) * 1000, 3)
+        if self.timer.memory is not None:
+            self.timer.memory.exit(self.node)
+        self.timer._stack.pop()
+        return False
+
+
+class StageTimer:
+    """Collects a tree of stage durations for one invocation"""
+
+    def __init__(self, detailed: bool = False, memory=None):
+        """
+        Args:
+            detailed: Record nested stages, not just top-level ones
+            memory: Optional MemoryProfiler measuring every recorded stage
+        """
+        self.detailed = detailed
+        self.memory = memory
+        self.stages: List[Dict[str, Any]] = []
+        self._stack: List[Dict[str, Any]] = []
+
+    def stage(self, name: str, **attrs):
+        """
+        Time a stage, nested under whichever stage is currently open.
+
+        Args:
+            name: Stage name, e.g. 's3_get' or 'insert_batch'
+            attrs: Extra fields stored on the node, e.g. rows=500
+        """
+        if self._stack and not self.detailed and self.memory is None:
+            return _NULL_STAGE
+        return _Span(self, name, attrs)
+
+    def durations(self) -> Dict[str, float]:
+        """Total milliseconds per top-level stage"""
+        totals: Dict[str, float] = {}
+        for node in self.stages:
+            totals[node["name"]] = round(totals.get(node["name"], 0.0) + node.get("ms", 0.0), 3)
+        return totals
+
+    def to_dict(self) -> List[Dict[str, Any]]:
+        """The timing tree as JSON-serializable nodes"""
+        return self.stages
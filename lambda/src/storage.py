@@ -2,26 +2,385 @@
 storage.py
 
 Abstraction layer for file storage operations.
-Supports both local filesystem and S3 storage.
+Supports both local filesystem and S3 storage, with files stored as CSV
+or as Parquet (STORAGE_FORMAT=parquet, requires pyarrow). Datasets can
+also be kept month-partitioned (current/<dataset>/year=YYYY/month=MM/) so
+writes only rewrite the months that changed.
 """
 
 import os
+import io
+import csv
+import json
+import mmap
 import shutil
+import hashlib
+import re
+import time
+import uuid
+import threading
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from abc import ABC, abstractmethod
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
 import pandas as pd
-from typing import Optional
-import pymysql
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from archive_store import ArchiveStore, LocalBlobStore, S3BlobStore
+from compression import codec_from_metadata, decompressed, sniff_codec
+from db_pool import get_pool, secrets_manager_credentials
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet support is optional
+    pa = pa_csv = pq = None
+
+# (column, op, value) predicates, the same form pyarrow uses for pushdown
+Filters = Sequence[Tuple[str, str, Any]]
+
+FILE_FORMATS = ('csv', 'parquet')
+ARCHIVE_MODES = ('full', 'delta', 'cas')
+# 'buffered' reads through Python file I/O; 'mmap' memory-maps the file and parses it on all cores
+READ_MODES = ('buffered', 'mmap')
+# Archive keys of versions kept in the content-addressed store look like archive/cas/manifests/<id>.json
+CAS_PREFIX = 'archive/cas'
+# Changes on every successful ingestion; read-side caches key on it
+INGESTION_VERSION_KEY = 'current/_ingestion_version'
+_IDENTIFIER_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]{0,63}$')
+_PARTITION_RE = re.compile(r'year=(?P<year>\d{4}|unknown)/month=(?P<month>\d{2}|unknown)/')
+
+# Linux FICLONE ioctl: share the source's extents copy-on-write (btrfs, XFS, ...)
+_FICLONE = 0x40049409
+_COPY_CHUNK = 1024 * 1024
 
 
 class StorageError(Exception):
     """Base class for storage-related errors"""
     pass
 
+
+class BatchResult:
+    """Outcome of one key in a read_many/write_many/version_many call"""
+
+    __slots__ = ('key', 'value', 'error')
+
+    def __init__(self, key: str, value: Any = None, error: Optional[Exception] = None):
+        self.key = key
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self) -> str:
+        outcome = f"error={self.error!r}" if self.error else "ok"
+        return f"BatchResult({self.key!r}, {outcome})"
+
+def date_range_filter(start=None, end=None, column: str = 'Workout Date') -> List[Tuple[str, str, Any]]:
+    """
+    Build read_file filters selecting rows with start <= column < end.
+
+    Example: date_range_filter('2024-08-01', '2024-09-01') loads August 2024.
+    """
+    filters = []
+    if start is not None:
+        filters.append((column, '>=', pd.Timestamp(start)))
+    if end is not None:
+        filters.append((column, '<', pd.Timestamp(end)))
+    return filters
+
+
+def _apply_filters(df: pd.DataFrame, filters: Optional[Filters]) -> pd.DataFrame:
+    """Apply (column, op, value) filters in memory, for formats without pushdown"""
+    if not filters:
+        return df
+    mask = pd.Series(True, index=df.index)
+    for column, op, value in filters:
+        series = df[column]
+        if isinstance(value, pd.Timestamp) and not pd.api.types.is_datetime64_any_dtype(series):
+            series = pd.to_datetime(series, errors='coerce')
+        if op in ('==', '='):
+            mask &= series == value
+        elif op == '!=':
+            mask &= series != value
+        elif op == '<':
+            mask &= series < value
+        elif op == '<=':
+            mask &= series <= value
+        elif op == '>':
+            mask &= series > value
+        elif op == '>=':
+            mask &= series >= value
+        elif op == 'in':
+            mask &= series.isin(value)
+        elif op == 'not in':
+            mask &= ~series.isin(value)
+        else:
+            raise StorageError(f"Unsupported filter operator: {op}")
+    return df[mask].reset_index(drop=True)
+
+
+def _filter_then_project(columns: Optional[List[str]], filters: Optional[Filters]) -> Optional[List[str]]:
+    """Columns to parse so in-memory filters can run before projecting to `columns`"""
+    if columns is None or not filters:
+        return columns
+    return list(dict.fromkeys(list(columns) + [column for column, _, _ in filters]))
+
+
+def _require_parquet() -> None:
+    if pq is None:
+        raise StorageError("Parquet storage requires pyarrow; install it or use STORAGE_FORMAT=csv")
+
+
+def read_frame(source, file_format: str, columns: Optional[List[str]] = None,
+               filters: Optional[Filters] = None, compression: Optional[str] = None) -> pd.DataFrame:
+    """
+    Parse a CSV or Parquet source (path or file object) into a DataFrame.
+
+    For Parquet, `columns` and `filters` are pushed down: only the projected
+    columns are decoded, and row groups whose min/max statistics can't match
+    the filters are skipped without being read.
+
+    gzip, bzip2 or zstd compressed CSV is detected from its first bytes and
+    decompressed as it is parsed; `compression` is the codec the source's
+    metadata claims, if known.
+    """
+    if file_format == 'parquet':
+        _require_parquet()
+        table = pq.read_table(source, columns=columns, filters=list(filters) if filters else None)
+        return table.to_pandas()
+    with decompressed(source, compression) as stream:
+        df = pd.read_csv(stream, usecols=_filter_then_project(columns, filters))
+    df = _apply_filters(df, filters)
+    return df if columns is None else df[list(columns)]
+
+
+def _row_start(view, pos: int) -> int:
+    """Offset of the first line starting at or after `pos`"""
+    if pos <= 0:
+        return 0
+    if pos >= len(view) or view[pos - 1] == ord('\n'):
+        return min(pos, len(view))
+    newline = view.find(b'\n', pos)
+    return len(view) if newline == -1 else newline + 1
+
+
+# Bytes of a mapped CSV parsed up front to find the columns pyarrow would infer as dates or times
+_TYPE_SAMPLE_BYTES = 1024 * 1024
+
+
+def _parse_csv_buffer(view: memoryview, names: List[str], columns: Optional[List[str]]) -> pd.DataFrame:
+    """
+    Parse headerless CSV bytes in place with pyarrow's multithreaded reader.
+
+    The result follows pd.read_csv: pyarrow would infer dates, times and
+    timestamps, so those columns are kept as strings, blank cells are
+    missing, and all-blank columns are float NaN.
+    """
+    def parse(data, column_types):
+        return pa_csv.read_csv(
+            pa.py_buffer(data),
+            read_options=pa_csv.ReadOptions(column_names=names, use_threads=True),
+            convert_options=pa_csv.ConvertOptions(include_columns=columns, column_types=column_types,
+                                                  strings_can_be_null=True, quoted_strings_can_be_null=True))
+
+    def temporal(table):
+        return {field.name: pa.string() for field in table.schema if pa.types.is_temporal(field.type)}
+
+    column_types = {}
+    if len(view) > _TYPE_SAMPLE_BYTES:
+        sample = view[:_TYPE_SAMPLE_BYTES].tobytes()
+        sample_end = sample.rfind(b'\n') + 1
+        if sample_end:
+            column_types = temporal(parse(sample[:sample_end], {}))
+    table = parse(view, column_types)
+    # Columns the sample didn't type as dates (or small files with no sample) are re-parsed
+    late = temporal(table)
+    if late:
+        table = parse(view, {**column_types, **late})
+    table = table.cast(pa.schema([pa.field(f.name, pa.float64()) if pa.types.is_null(f.type) else f
+                                  for f in table.schema]))
+    return table.to_pandas()
+
+
+def read_mapped(path: str, file_format: str, columns: Optional[List[str]] = None,
+                filters: Optional[Filters] = None,
+                byte_range: Optional[Tuple[int, int]] = None) -> pd.DataFrame:
+    """
+    Memory-map a local CSV or Parquet file and parse it with pyarrow's multithreaded readers.
+
+    The page cache backs the mapping, so the raw bytes are never copied into
+    Python buffers and only the parsed columns take memory. `columns` are
+    projected at parse time.
+
+    For CSV, `byte_range` (start, end) limits the read to the rows whose
+    first byte lies in [start, end), so ranges from csv_byte_ranges can be
+    read by separate workers without overlap. Row boundaries are found by
+    newline, so quoted fields must not contain line breaks (true of the
+    workout exports). Without pyarrow, the range is parsed by pandas.
+    Compressed CSV can't be parsed in place and is streamed by read_frame.
+    """
+    if file_format == 'parquet':
+        if byte_range is not None:
+            raise StorageError("byte_range is only supported for CSV files")
+        _require_parquet()
+        table = pq.read_table(path, columns=columns, filters=list(filters) if filters else None,
+                              memory_map=True, use_threads=True)
+        return table.to_pandas()
+
+    parse_columns = _filter_then_project(columns, filters)
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return pd.DataFrame(columns=columns or [])
+        compressed = sniff_codec(f.read(4)) is not None
+        if not compressed:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if compressed:
+        if byte_range is not None:
+            raise StorageError("byte_range is not supported for compressed files")
+        return read_frame(path, file_format, columns, filters)
+    try:
+        header_end = mapped.find(b'\n') + 1 or len(mapped)
+        names = next(csv.reader([mapped[:header_end].decode('utf-8-sig').rstrip('\r\n')]))
+        start, end = byte_range if byte_range is not None else (0, len(mapped))
+        begin = max(_row_start(mapped, start), header_end)
+        stop = max(_row_start(mapped, end), begin)
+        if stop == begin:
+            return pd.DataFrame(columns=columns or names)
+        view = memoryview(mapped)[begin:stop]
+        if pa_csv is not None:
+            df = _parse_csv_buffer(view, names, parse_columns)
+        else:
+            df = pd.read_csv(io.BytesIO(view), header=None, names=names, usecols=parse_columns)
+        # The mapping can't be closed while a view still exports it
+        view.release()
+    finally:
+        try:
+            mapped.close()
+        except BufferError:
+            # A parse error's traceback still holds the view; the mapping is freed along with it
+            pass
+    df = _apply_filters(df, filters)
+    return df if columns is None else df[list(columns)]
+
+
+def csv_byte_ranges(path: str, parts: int) -> List[Tuple[int, int]]:
+    """Split a file into `parts` contiguous byte ranges for read_mapped"""
+    size = os.path.getsize(path)
+    parts = max(1, min(parts, size or 1))
+    bounds = [size * i // parts for i in range(parts + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def write_frame(data: pd.DataFrame, sink, file_format: str) -> None:
+    """
+    Serialize a DataFrame as CSV or Parquet to a path or file object.
+
+    Parquet files are compressed (PARQUET_COMPRESSION, default zstd) and
+    dictionary-encoded, with PARQUET_ROW_GROUP_SIZE rows per row group so
+    date filters can skip most of the file. Frames with a datetime
+    'Workout Date' are sorted on it first, which keeps each row group's
+    date range narrow.
+    """
+    if file_format == 'parquet':
+        _require_parquet()
+        if 'Workout Date' in data.columns and pd.api.types.is_datetime64_any_dtype(data['Workout Date']):
+            data = data.sort_values('Workout Date', kind='stable')
+        table = pa.Table.from_pandas(data, preserve_index=False)
+        pq.write_table(
+            table,
+            sink,
+            compression=os.getenv('PARQUET_COMPRESSION', 'zstd'),
+            use_dictionary=True,
+            row_group_size=int(os.getenv('PARQUET_ROW_GROUP_SIZE', 65536))
+        )
+    else:
+        data.to_csv(sink, index=False)
+
+
+def _clone_file(source: str, destination: str) -> str:
+    """
+    Create `destination` with the contents of `source` without copying data where possible.
+
+    Tries a reflink, then a hard link, then falls back to a full copy. A
+    hard link shares the inode with `source`, which is only safe because
+    LocalStorageHandler.write_file replaces files instead of rewriting them.
+
+    Returns:
+        str: 'reflink', 'hardlink' or 'copy'
+    """
+    if fcntl is not None:
+        try:
+            with open(source, 'rb') as src, open(destination, 'xb') as dst:
+                fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+            shutil.copystat(source, destination)
+            return 'reflink'
+        except OSError:
+            if os.path.exists(destination):
+                os.remove(destination)
+    try:
+        os.link(source, destination)
+        return 'hardlink'
+    except OSError:
+        shutil.copy2(source, destination)
+        return 'copy'
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_COPY_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _is_cas_key(archive_key: str) -> bool:
+    return archive_key.startswith(f'{CAS_PREFIX}/manifests/')
+
+
+def _cas_version_id(archive_key: str) -> str:
+    return archive_key[len(f'{CAS_PREFIX}/manifests/'):-len('.json')]
+
+
+def _align_dtypes(df: pd.DataFrame, like: pd.DataFrame) -> pd.DataFrame:
+    """Cast df's columns to like's dtypes where possible, so re-read CSV rows compare equal to new ones"""
+    df = df.copy()
+    for column, dtype in like.dtypes.items():
+        if column not in df.columns or df[column].dtype == dtype:
+            continue
+        try:
+            if pd.api.types.is_datetime64_any_dtype(dtype):
+                df[column] = pd.to_datetime(df[column], errors='coerce')
+            else:
+                df[column] = df[column].astype(dtype)
+        except (TypeError, ValueError):
+            pass
+    return df
+
+
+def _default_format() -> str:
+    file_format = os.getenv('STORAGE_FORMAT', 'csv').lower()
+    if file_format not in FILE_FORMATS:
+        raise ValueError(f"Unsupported storage format: {file_format}")
+    return file_format
+
+
 class StorageHandler(ABC):
     """Abstract base class for storage operations"""
+
+    # Whether the handler implements list_keys and the ingestion version, which datasets and queries need
+    supports_datasets = False
     
     @abstractmethod
     def version_existing_file(self, key: str) -> Optional[str]:
@@ -30,7 +389,7 @@ class StorageHandler(ABC):
     
     @abstractmethod
     def read_file(self, key: str) -> pd.DataFrame:
-        """Read file content"""
+        """Read file content (handlers may accept columns= and filters= for projection and pushdown)"""
         pass
     
     @abstractmethod
@@ -38,12 +397,252 @@ class StorageHandler(ABC):
         """Write file content"""
         pass
 
+    def _batch_workers(self, max_workers: Optional[int]) -> int:
+        return max_workers or int(os.getenv('STORAGE_BATCH_WORKERS', 8))
+
+    def _run_batch(self, operation, items: Sequence, keys: Sequence[str],
+                   max_workers: Optional[int]) -> List[BatchResult]:
+        """Apply operation to each item on a bounded thread pool, keeping input order and per-key errors"""
+        def run(item_and_key):
+            item, key = item_and_key
+            try:
+                return BatchResult(key, operation(item))
+            except Exception as e:
+                return BatchResult(key, error=e)
+
+        if not items:
+            return []
+        workers = min(self._batch_workers(max_workers), len(items))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(run, zip(items, keys)))
+
+    def read_many(self, keys: Sequence[str], max_workers: Optional[int] = None, **read_kwargs) -> List[BatchResult]:
+        """
+        Read several keys concurrently.
+
+        Args:
+            keys: Keys to read
+            max_workers: Concurrent reads (default STORAGE_BATCH_WORKERS or 8)
+            read_kwargs: Passed to read_file, e.g. columns= or filters=
+
+        Returns:
+            One BatchResult per key, in input order, holding the DataFrame or the error
+        """
+        return self._run_batch(lambda key: self.read_file(key, **read_kwargs), list(keys), list(keys), max_workers)
+
+    def write_many(self, items: Sequence[Tuple[str, pd.DataFrame]],
+                   max_workers: Optional[int] = None) -> List[BatchResult]:
+        """
+        Write several (key, DataFrame) pairs concurrently.
+
+        Returns:
+            One BatchResult per pair, in input order; failed writes carry their error
+        """
+        items = list(items)
+        return self._run_batch(lambda item: self.write_file(*item), items, [key for key, _ in items], max_workers)
+
+    def version_many(self, keys: Sequence[str], max_workers: Optional[int] = None) -> List[BatchResult]:
+        """
+        Version several keys concurrently.
+
+        Returns:
+            One BatchResult per key, in input order, holding the archive key (None if nothing to version)
+        """
+        return self._run_batch(self.version_existing_file, list(keys), list(keys), max_workers)
+
+    def list_keys(self, prefix: str) -> List[str]:
+        """Keys under a prefix, sorted; needed by the partitioned-dataset methods"""
+        raise NotImplementedError(f"{type(self).__name__} does not support listing keys")
+
+    def delete_file(self, key: str) -> None:
+        """Remove a file if it exists; needed by compact_partitions"""
+        raise NotImplementedError(f"{type(self).__name__} does not support deleting keys")
+
+    def get_ingestion_version(self) -> str:
+        """Token that changes whenever new workouts are ingested; '0' before the first ingestion"""
+        raise NotImplementedError(f"{type(self).__name__} does not track an ingestion version")
+
+    def bump_ingestion_version(self) -> str:
+        """Record that new workouts were ingested and return the new version"""
+        raise NotImplementedError(f"{type(self).__name__} does not track an ingestion version")
+
+    def _partition_prefix(self, dataset: str) -> str:
+        return f"current/{dataset.strip('/')}/" if dataset else 'current/'
+
+    def partition_key(self, dataset: str, year, month, part: Optional[str] = None) -> str:
+        """
+        Key of a file in one month's partition.
+
+        Without `part` this is the compacted file, e.g.
+        current/workouts/year=2024/month=08/data.csv; with it, an appended
+        part such as .../month=08/part-<part>.csv. Both sort by name in the
+        order they were written.
+        """
+        month = f'{month:02d}' if isinstance(month, int) else month
+        name = f'part-{part}' if part else 'data'
+        return f"{self._partition_prefix(dataset)}year={year}/month={month}/{name}.{self.file_format}"
+
+    def list_partitions(self, dataset: str, start=None, end=None) -> List[str]:
+        """
+        Partition file keys of a dataset, optionally limited to months overlapping [start, end).
+
+        Partitions are pruned by their year=/month= path, without reading any
+        data. Keys are sorted, so each month's compacted file comes before
+        its parts and the parts follow in write order.
+        """
+        keys = []
+        first = pd.Timestamp(start).to_period('M') if start is not None else None
+        last = (pd.Timestamp(end) - pd.Timedelta(1)).to_period('M') if end is not None else None
+        for key in self.list_keys(self._partition_prefix(dataset)):
+            match = _PARTITION_RE.search(key)
+            if not match or not key.endswith(f'.{self.file_format}'):
+                continue
+            if first is not None or last is not None:
+                if match['year'] == 'unknown':
+                    continue
+                period = pd.Period(year=int(match['year']), month=int(match['month']), freq='M')
+                if (first is not None and period < first) or (last is not None and period > last):
+                    continue
+            keys.append(key)
+        return keys
+
+    def read_partitions(self, dataset: str, start=None, end=None, columns: Optional[List[str]] = None,
+                        date_column: str = 'Workout Date', key_columns: Optional[List[str]] = None,
+                        max_workers: Optional[int] = None) -> pd.DataFrame:
+        """
+        Load the partitions overlapping [start, end) in parallel and concatenate them.
+
+        Partitions outside the range are never opened; rows inside the
+        boundary months are filtered on `date_column`.
+
+        Args:
+            dataset: Dataset name under current/
+            start: Inclusive start date, or None for no lower bound
+            end: Exclusive end date, or None for no upper bound
+            columns: Only load these columns
+            date_column: Column the dataset is partitioned on
+            key_columns: Drop rows duplicated on these columns, keeping the newest write
+            max_workers: Parallel partition reads (default PARTITION_READ_WORKERS or 8)
+        """
+        keys = self.list_partitions(dataset, start, end)
+        filters = date_range_filter(start, end, date_column) or None
+        load_columns = columns
+        if columns is not None:
+            extra = ([date_column] if filters else []) + list(key_columns or [])
+            load_columns = list(dict.fromkeys(list(columns) + extra))
+
+        max_workers = max_workers or int(os.getenv('PARTITION_READ_WORKERS', 8))
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            frames = list(pool.map(lambda key: self.read_file(key, columns=load_columns, filters=filters), keys))
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        result = pd.concat(frames, ignore_index=True)
+        if key_columns:
+            result = result.drop_duplicates(subset=key_columns, keep='last', ignore_index=True)
+        return result[columns] if columns is not None else result
+
+    def write_partitioned(self, dataset: str, data: pd.DataFrame, date_column: str = 'Workout Date',
+                          key_columns: Optional[List[str]] = None,
+                          max_workers: Optional[int] = None) -> List[str]:
+        """
+        Append rows to a month-partitioned dataset as one new part file per month they fall in.
+
+        Existing files are never read or rewritten, so concurrent writers
+        can't overwrite each other's rows. Duplicates on `key_columns` (all
+        columns if None) within `data` keep the last row; duplicates across
+        parts are resolved by read_partitions(key_columns=...) and removed
+        by compact_partitions. Rows whose date can't be parsed go to
+        year=unknown/month=unknown.
+
+        Returns:
+            List[str]: Keys of the part files that were written
+        """
+        if data.empty:
+            return []
+        data = data.drop_duplicates(subset=key_columns, keep='last')
+        dates = pd.to_datetime(data[date_column], errors='coerce')
+        years = dates.dt.year.astype('Int64').astype(str).replace('<NA>', 'unknown')
+        months = dates.dt.month.map(lambda m: f'{int(m):02d}', na_action='ignore').fillna('unknown')
+        # Time first so parts sort in write order; the random suffix keeps concurrent writers apart
+        part = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+
+        def append(item):
+            (year, month), rows = item
+            key = self.partition_key(dataset, year, month, part)
+            self.write_file(key, rows.reset_index(drop=True))
+            return key
+
+        groups = list(data.groupby([years, months], sort=True))
+        max_workers = max_workers or int(os.getenv('PARTITION_READ_WORKERS', 8))
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(append, groups))
+
+    def compact_partitions(self, dataset: str, key_columns: Optional[List[str]] = None) -> List[str]:
+        """
+        Merge each month's parts into its compacted file, keeping the newest row per key.
+
+        The merged file is written before its parts are deleted, and parts
+        appended meanwhile are left alone, so nothing is lost to concurrent
+        ingestion; readers passing key_columns see no duplicates in between.
+        Run one compaction at a time.
+
+        Returns:
+            List[str]: Keys of the compacted files that were written
+        """
+        months: Dict[str, List[str]] = {}
+        for key in self.list_partitions(dataset):
+            months.setdefault(key.rsplit('/', 1)[0], []).append(key)
+
+        written = []
+        for keys in months.values():
+            if len(keys) < 2:
+                continue
+            match = _PARTITION_RE.search(keys[0])
+            target = self.partition_key(dataset, match['year'], match['month'])
+            frames = [self.read_file(key) for key in keys]
+            merged = frames[0]
+            for frame in frames[1:]:
+                merged = pd.concat([_align_dtypes(merged, frame), frame], ignore_index=True)
+            self.write_file(target, merged.drop_duplicates(subset=key_columns, keep='last', ignore_index=True))
+            for key in keys:
+                if key != target:
+                    self.delete_file(key)
+            written.append(target)
+        return written
+
 class LocalStorageHandler(StorageHandler):
-    """Handles local file storage operations"""
+    """
+    Handles local file storage operations.
+
+    Archived versions are reflinks or hard links of the current file where
+    the filesystem allows, so versioning costs no data I/O. With
+    archive_mode='delta' (or LOCAL_ARCHIVE_MODE=delta), a CSV that only
+    grew since the previous version is archived as just its appended bytes.
+    archive_mode='cas' keeps versions in a deduplicated ArchiveStore under
+    archive/cas/ instead. rebuild_version and read_version reassemble any
+    version.
+
+    read_mode='mmap' (or LOCAL_READ_MODE=mmap) memory-maps files on read
+    and parses them on all cores, for multi-GB backfill exports.
+    """
+
+    supports_datasets = True
     
-    def __init__(self, base_path: str):
+    def __init__(self, base_path: str, file_format: Optional[str] = None,
+                 archive_mode: Optional[str] = None, read_mode: Optional[str] = None):
         self.base_path = base_path
+        self.file_format = file_format or _default_format()
+        self.archive_mode = (archive_mode or os.getenv('LOCAL_ARCHIVE_MODE', 'full')).lower()
+        if self.archive_mode not in ARCHIVE_MODES:
+            raise ValueError(f"Unsupported archive mode: {self.archive_mode}")
+        self.read_mode = (read_mode or os.getenv('LOCAL_READ_MODE', 'buffered')).lower()
+        if self.read_mode not in READ_MODES:
+            raise ValueError(f"Unsupported read mode: {self.read_mode}")
+        # Every this many deltas a full version is stored, bounding rebuild cost
+        self.max_delta_chain = int(os.getenv('ARCHIVE_MAX_DELTA_CHAIN', 20))
         self._ensure_directories()
+        self.archive_store = ArchiveStore(LocalBlobStore(self._get_full_path(CAS_PREFIX)))
+        self._version_lock = threading.Lock()
     
     def _ensure_directories(self):
         """Create necessary directories if they don't exist"""
@@ -53,10 +652,123 @@ class LocalStorageHandler(StorageHandler):
     def _get_full_path(self, key: str) -> str:
         """Convert key to full file path"""
         return os.path.join(self.base_path, key)
+
+    def list_keys(self, prefix: str) -> List[str]:
+        """Keys of the files under a prefix, sorted"""
+        keys = []
+        for dirpath, _, filenames in os.walk(self._get_full_path(prefix)):
+            for filename in filenames:
+                if '.tmp-' not in filename:
+                    path = os.path.relpath(os.path.join(dirpath, filename), self.base_path)
+                    keys.append(path.replace(os.sep, '/'))
+        return sorted(keys)
+
+    def delete_file(self, key: str) -> None:
+        """Remove a file; a missing one is ignored"""
+        try:
+            os.remove(self._get_full_path(key))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            raise StorageError(f"Failed to delete file {key}: {str(e)}")
+
+    def get_ingestion_version(self) -> str:
+        """Current value of the ingestion counter"""
+        try:
+            with open(self._get_full_path(INGESTION_VERSION_KEY)) as f:
+                return f.read().strip() or '0'
+        except FileNotFoundError:
+            return '0'
+
+    def bump_ingestion_version(self) -> str:
+        """Increment the ingestion counter under a file lock"""
+        path = self._get_full_path(INGESTION_VERSION_KEY)
+        with open(path, 'a+') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            version = str(int(f.read().strip() or 0) + 1)
+            f.seek(0)
+            f.truncate()
+            f.write(version)
+        return version
+
+    def _index_path(self, key: str) -> str:
+        stem = os.path.splitext(os.path.basename(key))[0]
+        return self._get_full_path(f'archive/{stem}.versions.json')
+
+    def list_versions(self, key: str) -> List[dict]:
+        """
+        Archived versions of a file, oldest first.
+
+        Each entry has 'archive_key', 'type' ('full' or 'delta'), 'size' of
+        the full version in bytes, 'method' used to store it, and for deltas
+        the 'base' archive key it extends.
+        """
+        try:
+            with open(self._index_path(key)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    def _save_versions(self, key: str, versions: List[dict]) -> None:
+        path = self._index_path(key)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(versions, f, indent=1)
+        os.replace(tmp_path, path)
+
+    def _archive_key(self, key: str, extension: str) -> str:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        stem = os.path.splitext(os.path.basename(key))[0]
+        archive_key = f'archive/{stem}_{timestamp}.{extension}'
+        suffix = 1
+        while os.path.exists(self._get_full_path(archive_key)):
+            archive_key = f'archive/{stem}_{timestamp}_{suffix}.{extension}'
+            suffix += 1
+        return archive_key
+
+    def _delta_base(self, versions: List[dict]) -> Optional[dict]:
+        """The previous version if the next one may be stored as a delta on top of it"""
+        if self.archive_mode != 'delta' or self.file_format != 'csv' or not versions:
+            return None
+        previous = versions[-1]
+        if 'sha256' not in previous or previous.get('chain', 0) >= self.max_delta_chain:
+            return None
+        return previous
+
+    def _write_delta(self, key: str, current_path: str, previous: dict, entry: dict) -> Optional[str]:
+        """
+        Archive only the bytes appended since `previous`, if the file just grew.
+
+        Reads the current file once: the prefix is hashed and compared with
+        the previous version, and the rest is written to the delta file.
+        Returns the delta's archive key, or None if the file was rewritten.
+        """
+        digest = hashlib.sha256()
+        with open(current_path, 'rb') as f:
+            remaining = previous['size']
+            while remaining > 0:
+                chunk = f.read(min(_COPY_CHUNK, remaining))
+                if not chunk:
+                    return None
+                digest.update(chunk)
+                remaining -= len(chunk)
+            if digest.hexdigest() != previous['sha256']:
+                return None
+
+            archive_key = self._archive_key(key, 'delta')
+            with open(self._get_full_path(archive_key), 'xb') as out:
+                for chunk in iter(lambda: f.read(_COPY_CHUNK), b''):
+                    digest.update(chunk)
+                    out.write(chunk)
+        entry.update(type='delta', base=previous['archive_key'], method='delta',
+                     sha256=digest.hexdigest(), chain=previous.get('chain', 0) + 1)
+        return archive_key
     
     def version_existing_file(self, key: str) -> Optional[str]:
         """
-        Version existing file by moving it to archive directory with timestamp.
+        Version existing file into the archive directory with a timestamp.
         
         Args:
             key: Original file path relative to base_path
@@ -67,21 +779,90 @@ class LocalStorageHandler(StorageHandler):
         current_path = self._get_full_path(os.path.join('current', key))
         if not os.path.exists(current_path):
             return None
-            
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = os.path.basename(key)
-        archive_key = f'archive/{os.path.splitext(filename)[0]}_{timestamp}.csv'
-        archive_path = self._get_full_path(archive_key)
-        
-        shutil.copy2(current_path, archive_path)
+
+        if self.archive_mode == 'cas':
+            with open(current_path, 'rb') as f:
+                manifest = self.archive_store.put_version(key, f)
+            return f"{CAS_PREFIX}/manifests/{manifest['id']}.json"
+
+        # Serializes archive naming and index updates when versioning runs on a thread pool
+        with self._version_lock:
+            versions = self.list_versions(key)
+            entry = {'size': os.path.getsize(current_path), 'created': datetime.now().isoformat()}
+            previous = self._delta_base(versions)
+            archive_key = self._write_delta(key, current_path, previous, entry) if previous else None
+
+            if archive_key is None:
+                archive_key = self._archive_key(key, self.file_format)
+                method = _clone_file(current_path, self._get_full_path(archive_key))
+                entry.update(type='full', method=method, chain=0)
+                if self.archive_mode == 'delta':
+                    entry['sha256'] = _file_sha256(current_path)
+
+            entry['archive_key'] = archive_key
+            versions.append(entry)
+            self._save_versions(key, versions)
         return archive_key
+
+    def rebuild_version(self, key: str, archive_key: str, output) -> None:
+        """
+        Write the full contents of an archived version to a binary file object.
+
+        Args:
+            key: Original file path relative to base_path
+            archive_key: Archive key returned by version_existing_file
+            output: Writable binary file object
+
+        Raises:
+            StorageError: If the version or part of its delta chain is missing
+        """
+        if _is_cas_key(archive_key):
+            try:
+                self.archive_store.read_version(_cas_version_id(archive_key), output)
+                return
+            except (OSError, ValueError) as e:
+                raise StorageError(f"Failed to rebuild version {archive_key}: {str(e)}")
+        by_key = {v['archive_key']: v for v in self.list_versions(key)}
+        chain = []
+        current = archive_key
+        while current is not None:
+            chain.append(current)
+            entry = by_key.get(current)
+            current = entry.get('base') if entry else None
+        try:
+            for part in reversed(chain):
+                with open(self._get_full_path(part), 'rb') as f:
+                    shutil.copyfileobj(f, output, _COPY_CHUNK)
+        except OSError as e:
+            raise StorageError(f"Failed to rebuild version {archive_key}: {str(e)}")
+
+    def read_version(self, key: str, archive_key: str) -> pd.DataFrame:
+        """
+        Read an archived version of a file, rebuilding it from deltas if needed.
+
+        Args:
+            key: Original file path relative to base_path
+            archive_key: Archive key returned by version_existing_file
+
+        Returns:
+            DataFrame containing the version's contents
+        """
+        buffer = io.BytesIO()
+        self.rebuild_version(key, archive_key, buffer)
+        buffer.seek(0)
+        return read_frame(buffer, self.file_format)
     
-    def read_file(self, key: str) -> pd.DataFrame:
+    def read_file(self, key: str, columns: Optional[List[str]] = None,
+                  filters: Optional[Filters] = None,
+                  byte_range: Optional[Tuple[int, int]] = None) -> pd.DataFrame:
         """
-        Read CSV file from local storage.
+        Read file from local storage in the handler's format.
         
         Args:
             key: File path relative to base_path
+            columns: Only load these columns
+            filters: (column, op, value) predicates, e.g. from date_range_filter
+            byte_range: (start, end) of a CSV to read, e.g. from byte_ranges; implies mmap mode
             
         Returns:
             DataFrame containing file contents
@@ -91,13 +872,24 @@ class LocalStorageHandler(StorageHandler):
         """
         try:
             full_path = self._get_full_path(key)
-            return pd.read_csv(full_path)
+            if self.read_mode == 'mmap' or byte_range is not None:
+                return read_mapped(full_path, self.file_format, columns, filters, byte_range)
+            return read_frame(full_path, self.file_format, columns, filters)
         except Exception as e:
             raise StorageError(f"Failed to read file {key}: {str(e)}")
+
+    def byte_ranges(self, key: str, parts: int) -> List[Tuple[int, int]]:
+        """
+        Split a CSV file into `parts` byte ranges to read_file separately, e.g. one per worker.
+
+        Every row belongs to exactly one range, so concatenating the range
+        reads in order gives the whole file.
+        """
+        return csv_byte_ranges(self._get_full_path(key), parts)
     
     def write_file(self, key: str, data: pd.DataFrame) -> None:
         """
-        Write DataFrame to CSV file in local storage.
+        Write DataFrame to local storage in the handler's format.
         
         Args:
             key: File path relative to base_path
@@ -106,88 +898,406 @@ class LocalStorageHandler(StorageHandler):
         Raises:
             StorageError: If file writing fails
         """
+        full_path = self._get_full_path(key)
+        # Write to a temp file and rename over the target, so the file is never
+        # rewritten in place; archived hard links keep the old contents
+        tmp_path = f'{full_path}.tmp-{os.getpid()}-{threading.get_ident()}'
         try:
-            full_path = self._get_full_path(key)
-            data.to_csv(full_path, index=False)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            write_frame(data, tmp_path, self.file_format)
+            os.replace(tmp_path, full_path)
         except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
             raise StorageError(f"Failed to write file {key}: {str(e)}")
 
 
+_s3_client = None
+
+def get_s3_client():
+    """
+    Return the S3 client shared by all S3StorageHandler instances.
+
+    The connection pool is sized for the transfer manager's concurrent part
+    uploads (S3_MAX_POOL_CONNECTIONS, default 32), and the client is reused
+    across warm invocations so TLS sessions to the endpoint stay open.
+    """
+    global _s3_client
+    if _s3_client is None:
+        _s3_client = boto3.client('s3', config=Config(
+            max_pool_connections=int(os.getenv('S3_MAX_POOL_CONNECTIONS', 32)),
+            retries={'mode': 'adaptive', 'max_attempts': 5},
+            tcp_keepalive=True
+        ))
+    return _s3_client
+
+
+class _S3RangeReader(io.RawIOBase):
+    """
+    Seekable read-only view of an S3 object that fetches bytes with ranged GETs.
+
+    Lets the Parquet reader fetch the footer and only the row groups it
+    needs, instead of downloading the whole object.
+    """
+
+    def __init__(self, client, bucket: str, key: str):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.size = client.head_object(Bucket=bucket, Key=key)['ContentLength']
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        else:
+            self.position = self.size + offset
+        return self.position
+
+    def readinto(self, buffer) -> int:
+        if self.position >= self.size:
+            return 0
+        end = min(self.position + len(buffer), self.size) - 1
+        body = self.client.get_object(
+            Bucket=self.bucket, Key=self.key, Range=f'bytes={self.position}-{end}'
+        )['Body'].read()
+        buffer[:len(body)] = body
+        self.position += len(body)
+        return len(body)
+
+
+class S3StorageHandler(StorageHandler):
+    """
+    Handles S3 storage operations, using the same current/ and archive/ layout as local storage.
+
+    Versions are server-side copies by default. With archive_mode='cas'
+    (or S3_ARCHIVE_MODE=cas) they go to a deduplicated ArchiveStore under
+    archive/cas/, which reads the object once but only uploads new chunks.
+    """
+
+    supports_datasets = True
+
+    def __init__(self, bucket: str, client=None, transfer_config: Optional[TransferConfig] = None,
+                 file_format: Optional[str] = None, archive_mode: Optional[str] = None):
+        self.bucket = bucket
+        self.file_format = file_format or _default_format()
+        self.archive_mode = (archive_mode or os.getenv('S3_ARCHIVE_MODE', 'copy')).lower()
+        if self.archive_mode not in ('copy', 'cas'):
+            raise ValueError(f"Unsupported archive mode: {self.archive_mode}")
+        self.client = client or get_s3_client()
+        self.archive_store = ArchiveStore(S3BlobStore(self.client, bucket, CAS_PREFIX))
+        # Multipart kicks in above the threshold; parts upload in parallel over the pooled connections
+        self.transfer_config = transfer_config or TransferConfig(
+            multipart_threshold=int(os.getenv('S3_MULTIPART_THRESHOLD', 16 * 1024 * 1024)),
+            multipart_chunksize=int(os.getenv('S3_MULTIPART_CHUNKSIZE', 16 * 1024 * 1024)),
+            max_concurrency=int(os.getenv('S3_MAX_CONCURRENCY', 8))
+        )
+
+    def _exists(self, key: str) -> bool:
+        """Return True if the object exists"""
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise StorageError(f"Failed to check {key}: {str(e)}")
+
+    def list_keys(self, prefix: str) -> List[str]:
+        """Keys of the objects under a prefix, sorted"""
+        keys = []
+        try:
+            for page in self.client.get_paginator('list_objects_v2').paginate(Bucket=self.bucket, Prefix=prefix):
+                keys.extend(obj['Key'] for obj in page.get('Contents', []))
+        except ClientError as e:
+            raise StorageError(f"Failed to list {prefix}: {str(e)}")
+        return sorted(keys)
+
+    def delete_file(self, key: str) -> None:
+        """Remove an object; deleting a missing key succeeds"""
+        try:
+            self.client.delete_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            raise StorageError(f"Failed to delete {key}: {str(e)}")
+
+    def get_ingestion_version(self) -> str:
+        """Current ingestion version token"""
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=INGESTION_VERSION_KEY)['Body'].read().decode()
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return '0'
+            raise StorageError(f"Failed to read ingestion version: {str(e)}")
+
+    def bump_ingestion_version(self) -> str:
+        """
+        Replace the ingestion version with a new unique token.
+
+        S3 can't increment atomically, so the version is a unique token
+        rather than a counter; concurrent bumps can't produce the same value.
+        """
+        version = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+        try:
+            self.client.put_object(Bucket=self.bucket, Key=INGESTION_VERSION_KEY, Body=version.encode())
+        except ClientError as e:
+            raise StorageError(f"Failed to bump ingestion version: {str(e)}")
+        return version
+
+    def version_existing_file(self, key: str) -> Optional[str]:
+        """
+        Version existing object by copying it to the archive prefix with a timestamp.
+
+        The archive key keeps the object's path under current/ and ends in
+        a random suffix, e.g. archive/a/x_20240801_120000_1a2b3c4d.csv for
+        current/a/x.csv. The copy happens server-side (multipart
+        UploadPartCopy for large objects), so no object data passes through
+        the Lambda.
+
+        Args:
+            key: Original object key relative to current/
+
+        Returns:
+            Optional[str]: Archive key if the original exists, None otherwise
+        """
+        current_key = f'current/{key}'
+        if not self._exists(current_key):
+            return None
+
+        if self.archive_mode == 'cas':
+            try:
+                body = self.client.get_object(Bucket=self.bucket, Key=current_key)['Body']
+                manifest = self.archive_store.put_version(key, body)
+            except ClientError as e:
+                raise StorageError(f"Failed to version file {key}: {str(e)}")
+            return f"{CAS_PREFIX}/manifests/{manifest['id']}.json"
+
+        # S3 has no exclusive create, so a random suffix rather than probing keeps concurrent
+        # versions (of the same key, or of same-named keys in other folders) from colliding
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        archive_key = f'archive/{os.path.splitext(key)[0]}_{timestamp}_{uuid.uuid4().hex[:8]}.{self.file_format}'
+        try:
+            self.client.copy(
+                {'Bucket': self.bucket, 'Key': current_key},
+                self.bucket,
+                archive_key,
+                Config=self.transfer_config
+            )
+        except ClientError as e:
+            raise StorageError(f"Failed to version file {key}: {str(e)}")
+        return archive_key
+
+    def read_file(self, key: str, columns: Optional[List[str]] = None,
+                  filters: Optional[Filters] = None) -> pd.DataFrame:
+        """
+        Read object from S3 in the handler's format.
+
+        CSV is parsed straight from the response stream, decompressing
+        gzip/bzip2/zstd objects on the fly. Parquet is read
+        through ranged GETs, so projected columns and filtered-out row
+        groups are never downloaded.
+
+        Args:
+            key: Object key
+            columns: Only load these columns
+            filters: (column, op, value) predicates, e.g. from date_range_filter
+
+        Returns:
+            DataFrame containing object contents
+
+        Raises:
+            StorageError: If reading fails
+        """
+        try:
+            if self.file_format == 'parquet':
+                source = io.BufferedReader(_S3RangeReader(self.client, self.bucket, key), buffer_size=1024 * 1024)
+            else:
+                response = self.client.get_object(Bucket=self.bucket, Key=key)
+                return read_frame(response['Body'], self.file_format, columns, filters,
+                                  codec_from_metadata(response.get('ContentEncoding'),
+                                                      response.get('ContentType')))
+            return read_frame(source, self.file_format, columns, filters)
+        except Exception as e:
+            raise StorageError(f"Failed to read file {key}: {str(e)}")
+
+    def write_file(self, key: str, data: pd.DataFrame) -> None:
+        """
+        Write DataFrame to an object in S3 in the handler's format.
+
+        Objects larger than the multipart threshold are uploaded as parallel
+        multipart parts.
+
+        Args:
+            key: Object key
+            data: DataFrame to write
+
+        Raises:
+            StorageError: If writing fails
+        """
+        try:
+            buffer = io.BytesIO()
+            write_frame(data, buffer, self.file_format)
+            buffer.seek(0)
+            self.client.upload_fileobj(buffer, self.bucket, key, Config=self.transfer_config)
+        except Exception as e:
+            raise StorageError(f"Failed to write file {key}: {str(e)}")
+
+    def read_version(self, key: str, archive_key: str) -> pd.DataFrame:
+        """
+        Read an archived version, reassembling it if it lives in the archive store.
+
+        Args:
+            key: Original object key relative to current/
+            archive_key: Archive key returned by version_existing_file
+
+        Returns:
+            DataFrame containing the version's contents
+        """
+        if not _is_cas_key(archive_key):
+            return self.read_file(archive_key)
+        try:
+            data = self.archive_store.read_version_bytes(_cas_version_id(archive_key))
+            return read_frame(io.BytesIO(data), self.file_format)
+        except Exception as e:
+            raise StorageError(f"Failed to read version {archive_key}: {str(e)}")
+
+
 class RDSStorageHandler(StorageHandler):
-    """Handles all data storage interactions, including RDS database connections."""
+    """Handles all data storage interactions, including RDS database connections. Keys are table names."""
 
     def __init__(self, secret_name="my-rds-secret", region="us-west-2"):
-        """Initialize storage handler and retrieve database credentials."""
+        """
+        Attach to the process-wide connection pool for this secret.
+
+        Nothing is fetched or connected here: credentials are loaded from
+        Secrets Manager on first use and cached (DB_CREDENTIALS_TTL), and
+        connections are reused across instances and warm invocations.
+        """
         self.secret_name = secret_name
         self.region = region
-        self.db_credentials = self.get_db_credentials()
-        self.connection = self.get_db_connection()
+        self.pool = get_pool((secret_name, region), secrets_manager_credentials(secret_name, region))
 
     def get_db_credentials(self):
-        """Retrieve RDS credentials from AWS Secrets Manager."""
-        client = boto3.client("secretsmanager", region_name=self.region)
-        try:
-            response = client.get_secret_value(SecretId=self.secret_name)
-            secret_dict = json.loads(response["SecretString"])
-            return {
-                "host": secret_dict["host"],
-                "username": secret_dict["username"],
-                "password": secret_dict["password"],
-                "database": secret_dict["dbname"],
-                "port": secret_dict.get("port", 3306)  # Default to MySQL
-            }
+        """Return the cached RDS credentials, loading them from Secrets Manager if needed."""
+        try:
+            return self.pool.credentials.get()
         except Exception as e:
             print(f"❌ Error retrieving DB credentials: {e}")
             return None
 
     def get_db_connection(self):
-        """Establish a database connection."""
-        if not self.db_credentials:
-            print("❌ No database credentials found.")
-            return None
-
+        """Check out a pooled database connection; close() returns it to the pool."""
         try:
-            conn = pymysql.connect(
-                host=self.db_credentials["host"],
-                user=self.db_credentials["username"],
-                password=self.db_credentials["password"],
-                database=self.db_credentials["database"],
-                port=self.db_credentials["port"],
-                connect_timeout=10
-            )
-            print("✅ Database connection successful.")
-            return conn
+            return self.pool.acquire()
         except Exception as e:
             print(f"❌ Database connection failed: {e}")
             return None
 
+    def _batch_workers(self, max_workers: Optional[int]) -> int:
+        # More threads than pooled connections would only queue for a connection
+        return min(super()._batch_workers(max_workers), self.pool.size)
+
+    @staticmethod
+    def _table(key: str) -> str:
+        """Validate a key as a table name, since identifiers can't be bound as parameters"""
+        if not _IDENTIFIER_RE.match(key):
+            raise StorageError(f"Invalid table name: {key}")
+        return key
+
+    def version_existing_file(self, key: str) -> Optional[str]:
+        """
+        Tables aren't versioned per write, so there is nothing to archive.
+
+        Returns:
+            None
+        """
+        self._table(key)
+        return None
+
+    def read_file(self, key: str) -> pd.DataFrame:
+        """
+        Read every row of a table.
+
+        Args:
+            key: Table name
+
+        Returns:
+            DataFrame with the table's columns
+
+        Raises:
+            StorageError: If the query fails
+        """
+        table = self._table(key)
+
+        def read(connection):
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT * FROM {table}")
+                columns = [column[0] for column in cursor.description]
+                return pd.DataFrame(list(cursor.fetchall()), columns=columns)
+
+        try:
+            return self.pool.run(read)
+        except Exception as e:
+            raise StorageError(f"Failed to read table {key}: {str(e)}")
+
+    def write_file(self, key: str, data: pd.DataFrame) -> None:
+        """
+        Insert a DataFrame's rows into a table in one transaction.
+
+        Args:
+            key: Table name
+            data: Rows to insert; column names must match the table's
+
+        Raises:
+            StorageError: If the insert fails (nothing is committed)
+        """
+        table = self._table(key)
+        columns = [self._table(str(column)) for column in data.columns]
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+        rows = [tuple(None if pd.isna(v) else v for v in row) for row in data.itertuples(index=False)]
+        try:
+            with self.pool.connection() as connection:
+                with connection.cursor() as cursor:
+                    cursor.executemany(sql, rows)
+                connection.commit()
+        except Exception as e:
+            raise StorageError(f"Failed to write table {key}: {str(e)}")
+
     def fetch_existing_workouts(self):
         """Retrieve existing workout IDs from the database."""
-        if not self.connection:
-            return set()
+        def fetch(connection):
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT workout_id FROM workouts;")
+                return {row[0] for row in cursor.fetchall()}  # Convert to a set
 
         try:
-            with self.connection.cursor() as cursor:
-                cursor.execute("SELECT workout_id FROM workouts;")
-                existing_ids = {row[0] for row in cursor.fetchall()}  # Convert to a set
-            return existing_ids
+            # A read is safe to retry on a fresh connection if the pooled one was dropped
+            return self.pool.run(fetch)
         except Exception as e:
             print(f"❌ Error fetching workouts: {e}")
             return set()
 
     def insert_new_workouts(self, new_workouts):
         """Insert new workout records into the database."""
-        if not self.connection:
-            return False
-
         try:
-            with self.connection.cursor() as cursor:
-                insert_query = """
-                    INSERT INTO workouts (workout_id, user_id, activity_type, duration_minutes, calories_burned)
-                    VALUES (%s, %s, %s, %s, %s)
-                """
-                cursor.executemany(insert_query, new_workouts)
-            self.connection.commit()
+            with self.pool.connection() as connection:
+                with connection.cursor() as cursor:
+                    insert_query = """
+                        INSERT INTO workouts (workout_id, user_id, activity_type, duration_minutes, calories_burned)
+                        VALUES (%s, %s, %s, %s, %s)
+                    """
+                    cursor.executemany(insert_query, new_workouts)
+                connection.commit()
             print("✅ Successfully inserted new workouts.")
             return True
         except Exception as e:
@@ -204,17 +1314,30 @@ def get_storage_handler() -> StorageHandler:
         StorageHandler implementation
     """
     storage_type = os.getenv('STORAGE_TYPE', 'local').lower()
-    
-    storage_type = 'rds'
 
     if storage_type == 'local':
         base_path = os.getenv('LOCAL_STORAGE_PATH', 'local_testing')
         return LocalStorageHandler(base_path)
+    elif storage_type == 's3':
+        bucket = os.getenv('S3_BUCKET')
+        if not bucket:
+            raise ValueError("S3_BUCKET environment variable must be set when using S3 storage")
+        return S3StorageHandler(bucket)
     elif storage_type == 'rds':
         return RDSStorageHandler()
     else:
         raise ValueError(f"Unsupported storage type: {storage_type}")
-    #     bucket = os.getenv('S3_BUCKET')
-    #     if not bucket:
-    #         raise ValueError("S3_BUCKET environment variable must be set when using S3 storage")
-    #     return S3StorageHandler(bucket)
+
+
+def get_dataset_storage_handler() -> StorageHandler:
+    """
+    Storage handler for the partitioned workout dataset and its ingestion version.
+
+    Raises:
+        ValueError: If STORAGE_TYPE picks a handler that can't hold a dataset (rds)
+    """
+    handler = get_storage_handler()
+    if not handler.supports_datasets:
+        raise ValueError(f"STORAGE_TYPE={os.getenv('STORAGE_TYPE')} can't hold the workout dataset; "
+                         "use local or s3")
+    return handler
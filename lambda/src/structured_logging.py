@@ -0,0 +1,96 @@
+"""
+structured_logging.py
+
+Level-gated logging helpers for the Lambda handler:
+- Lazy formatting, so expensive log arguments cost nothing when filtered out
+- Sampled debug mode for a fraction of invocations
+- One compact CloudWatch Embedded Metric Format (EMF) record per invocation
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+from typing import Any, Dict, Optional
+
+METRICS_NAMESPACE = os.getenv("METRICS_NAMESPACE", "WorkoutPipeline")
+
+
+class LazyJson:
+    """Defers json.dumps until a log record is actually formatted"""
+
+    def __init__(self, obj: Any):
+        self.obj = obj
+
+    def __str__(self) -> str:
+        return json.dumps(self.obj, default=str)
+
+
+def configure_invocation_logging(logger: logging.Logger) -> bool:
+    """
+    Set the logger level for one invocation.
+
+    LOG_LEVEL picks the base level (default INFO). DEBUG_SAMPLE_RATE, between
+    0 and 1, runs that fraction of invocations at DEBUG so detailed logs are
+    available without paying for them on every request.
+
+    Returns:
+        bool: True if this invocation was sampled into debug mode
+    """
+    sample_rate = float(os.getenv("DEBUG_SAMPLE_RATE", 0))
+    sampled = sample_rate > 0 and random.random() < sample_rate
+    if sampled:
+        logger.setLevel(logging.DEBUG)
+    else:
+        logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    return sampled
+
+
+class InvocationMetrics:
+    """Collects counters and stage durations for one invocation and emits them as EMF"""
+
+    def __init__(self, dimensions: Optional[Dict[str, str]] = None, namespace: str = METRICS_NAMESPACE):
+        self.namespace = namespace
+        self.dimensions = dimensions or {}
+        self.metrics: Dict[str, Any] = {}
+        self.units: Dict[str, str] = {}
+        self.properties: Dict[str, Any] = {}
+
+    def put_metric(self, name: str, value: float, unit: str = "Count") -> None:
+        """Record a metric value, replacing any earlier value"""
+        self.metrics[name] = value
+        self.units[name] = unit
+
+    def set_property(self, name: str, value: Any) -> None:
+        """Attach a searchable, non-metric field to the record"""
+        self.properties[name] = value
+
+    def to_emf(self) -> Dict[str, Any]:
+        """Build the Embedded Metric Format document"""
+        record = {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [{
+                    "Namespace": self.namespace,
+                    "Dimensions": [list(self.dimensions.keys())],
+                    "Metrics": [{"Name": name, "Unit": self.units[name]} for name in self.metrics]
+                }]
+            }
+        }
+        record.update(self.properties)
+        record.update(self.dimensions)
+        record.update(self.metrics)
+        return record
+
+    def emit(self, stream=None) -> None:
+        """
+        Write the EMF record as a single JSON line.
+
+        EMF records must be the whole log line, so they go straight to stdout
+        rather than through the logging handler and its prefix.
+        """
+        stream = stream or sys.stdout
+        stream.write(json.dumps(self.to_emf(), default=str) + "\n")
+        stream.flush()
@@ -0,0 +1,165 @@
+"""
+training_metrics.py
+
+Vectorized derived training metrics for cleaned workout data.
+
+Per workout:
+- speed_mph and pace_min_per_mi from distance and duration
+- pace_consistency: Max Pace / Avg Pace, 1.0 for a perfectly even effort
+- training_load: workout minutes
+
+Per rolling window, at each workout's date:
+- acute_load_7d: load over the trailing 7 days
+- chronic_load_28d: average weekly load over the trailing 28 days
+- acwr: acute:chronic workload ratio
+
+The rolling sums come from one cumulative sum over a per-day load array,
+so the cost is linear in rows plus days covered. TrainingMetricsEngine
+keeps the last 28 days of daily load as state, so appended workouts
+update the windows without recomputing the full history.
+
+The metric columns are not stored in RDS: workout_summary keeps its
+fixed columns. They reach the month-partitioned dataset that queries.py
+reads, so the stage only runs when TRAINING_METRICS is set and a
+STORAGE_TYPE is configured for publishing.
+"""
+
+import os
+import logging
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger()
+
+ACUTE_DAYS = 7
+CHRONIC_DAYS = 28
+
+METRIC_COLUMNS = ['speed_mph', 'pace_min_per_mi', 'pace_consistency', 'training_load',
+                  'acute_load_7d', 'chronic_load_28d', 'acwr']
+
+
+def training_metrics_enabled() -> bool:
+    """
+    Return True if TRAINING_METRICS enables the metrics stage and there is a dataset to keep them.
+
+    Without STORAGE_TYPE the columns would be dropped at insert, so the
+    stage is skipped (with a warning) rather than computed for nothing.
+    """
+    if os.getenv("TRAINING_METRICS", "").lower() not in ("1", "true", "yes", "on"):
+        return False
+    if not os.getenv("STORAGE_TYPE"):
+        logger.warning("TRAINING_METRICS is set but STORAGE_TYPE isn't; training metrics are only "
+                       "stored in the partitioned dataset, so the stage is skipped")
+        return False
+    return True
+
+
+def _column(df: pd.DataFrame, name: str) -> np.ndarray:
+    """A column as float64, or all-NaN if the export doesn't have it"""
+    if name not in df.columns:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[name], errors='coerce').to_numpy(dtype='float64')
+
+
+def per_workout_metrics(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Speed, pace, pace consistency and load for each row"""
+    distance = _column(df, 'Distance (mi)')
+    seconds = _column(df, 'Workout Time (seconds)')
+    avg_pace = _column(df, 'Avg Pace (min/mi)')
+    max_pace = _column(df, 'Max Pace (min/mi)')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hours = seconds / 3600.0
+        speed = np.where(hours > 0, distance / hours, np.nan)
+        pace = np.where(distance > 0, (seconds / 60.0) / distance, np.nan)
+        consistency = np.where(avg_pace > 0, max_pace / avg_pace, np.nan)
+    return {
+        'speed_mph': speed,
+        'pace_min_per_mi': pace,
+        'pace_consistency': consistency,
+        'training_load': np.nan_to_num(seconds / 60.0),
+    }
+
+
+class TrainingMetricsEngine:
+    """Adds training metrics to workouts, carrying rolling-window state between batches"""
+
+    def __init__(self, state: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            state: Output of a previous engine's to_state(), or None to start empty
+        """
+        if state:
+            self.last_day = int(state['last_day'])
+            self.recent_loads = np.asarray(state['recent_loads'], dtype='float64')
+        else:
+            self.last_day = None
+            self.recent_loads = np.zeros(CHRONIC_DAYS)
+
+    def to_state(self) -> Dict[str, Any]:
+        """JSON-serializable rolling state: daily loads for the 28 days up to the last workout"""
+        return {'last_day': self.last_day, 'recent_loads': self.recent_loads.tolist()}
+
+    def update(self, df: pd.DataFrame, date_column: str = 'Workout Date') -> pd.DataFrame:
+        """
+        Compute metrics for a batch of workouts not seen before and fold them into the state.
+
+        Rows may arrive in any order, but none may be older than the state's
+        28-day window: their windows would need history the state no longer has.
+
+        Args:
+            df: Cleaned workouts with a datetime date column
+            date_column: Column holding the workout date
+
+        Returns:
+            A copy of df with METRIC_COLUMNS added
+
+        Raises:
+            ValueError: If a row predates the rolling window
+        """
+        result = df.copy()
+        for name, values in per_workout_metrics(df).items():
+            result[name] = values
+        if df.empty:
+            for name in ('acute_load_7d', 'chronic_load_28d', 'acwr'):
+                result[name] = np.array([], dtype='float64')
+            return result
+
+        # Days since the epoch, so state from earlier batches lines up
+        days = pd.to_datetime(df[date_column]).to_numpy(dtype='datetime64[D]').astype('int64')
+        if self.last_day is not None:
+            window_start = self.last_day - CHRONIC_DAYS + 1
+            if days.min() < window_start:
+                raise ValueError("Workouts predate the rolling window; recompute from the full history")
+            origin = window_start
+        else:
+            origin = int(days.min())
+
+        last_day = int(days.max()) if self.last_day is None else max(self.last_day, int(days.max()))
+        span = last_day - origin + 1
+        daily = np.bincount(days - origin, weights=result['training_load'].to_numpy(), minlength=span)
+        if self.last_day is not None:
+            daily[:CHRONIC_DAYS] += self.recent_loads
+
+        # Prefix sums padded with a 28-day lead-in of zeros, so every window is a single subtraction
+        cumulative = np.concatenate([np.zeros(CHRONIC_DAYS + 1), np.cumsum(daily)])
+        index = days - origin + CHRONIC_DAYS + 1
+        acute = cumulative[index] - cumulative[index - ACUTE_DAYS]
+        chronic = (cumulative[index] - cumulative[index - CHRONIC_DAYS]) / (CHRONIC_DAYS / ACUTE_DAYS)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            acwr = np.where(chronic > 0, acute / chronic, np.nan)
+
+        result['acute_load_7d'] = acute
+        result['chronic_load_28d'] = chronic
+        result['acwr'] = acwr
+
+        padded = np.concatenate([np.zeros(CHRONIC_DAYS), daily])
+        self.recent_loads = padded[-CHRONIC_DAYS:]
+        self.last_day = last_day
+        return result
+
+
+def add_training_metrics(df: pd.DataFrame, state: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+    """Compute training metrics for a full, cleaned history (or a batch following `state`)"""
+    return TrainingMetricsEngine(state).update(df)
@@ -13,17 +13,28 @@ Supports both local testing and S3 deployment.
 import json
 import time
 import logging
-from typing import Dict, Any, Tuple, List, Set
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 from datetime import datetime
 import re
 import os
 import pandas as pd
 import boto3
 import json
-# from storage import get_storage_handler, StorageError
-from data_cleaning import clean_data
-import pymysql
+from storage import get_dataset_storage_handler
+from data_cleaning import clean_data_parallel
+from structured_logging import InvocationMetrics, LazyJson, configure_invocation_logging
+from stage_timing import StageTimer, stage_timing_enabled
+from memory_profiling import MemoryProfiler, memory_profiling_enabled, peak_rss_bytes
+from cpu_profiling import profile_invocation
+from db_pool import get_pool
+from rollups import compute_rollup_deltas, get_rollup_store
+from queries import WORKOUT_DATASET
+from training_metrics import add_training_metrics, training_metrics_enabled
+from compression import codec_from_metadata, decompressed
+from spool import DatabaseUnavailable, get_spool
 import boto3
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor, wait
 
 # Configure logging
 logger = logging.getLogger()
@@ -40,26 +51,17 @@ def get_db_credentials():
     }
 
 def get_db_connection():
-    """Establish a database connection using environment variables."""
-    credentials = get_db_credentials()
-
-    if not credentials["host"]:
-        logger.error("❌ No database credentials found in environment variables.")
-        return None
+    """
+    Check out a database connection from the process-wide pool.
 
+    Warm invocations reuse the previous invocation's connection; close()
+    returns it to the pool rather than closing it.
+    """
     try:
-        connection = pymysql.connect(
-            host=credentials["host"],
-            user=credentials["username"],
-            password=credentials["password"],
-            database=credentials["database"],
-            port=credentials["port"],
-            connect_timeout=10
-        )
-        logger.info("✅ Database connection successful.")
-        return connection
+        # The lambda keeps get_db_credentials patchable
+        return get_pool("env", lambda: get_db_credentials()).acquire()
     except Exception as e:
-        logger.error(f"❌ Database connection failed: {e}")
+        logger.error("❌ Database connection failed: %s", e)
         return None
 
 def fetch_existing_workouts():
@@ -73,10 +75,10 @@ def fetch_existing_workouts():
         with connection.cursor() as cursor:
             cursor.execute("SELECT workout_id FROM workout_summary;")
             existing_ids = {row[0] for row in cursor.fetchall()}  # Convert to a set
-        logger.info(f"✅ Retrieved {len(existing_ids)} existing workouts.")
+        logger.info("✅ Retrieved %d existing workouts.", len(existing_ids))
         return existing_ids
     except Exception as e:
-        logger.error(f"❌ Error fetching workouts: {e}")
+        logger.error("❌ Error fetching workouts: %s", e)
         return set()
     finally:
         connection.close()
@@ -85,7 +87,7 @@ def verify_s3_connectivity():
     """Verify S3 connectivity through VPC endpoint"""
     try:
         start_time = time.time()
-        logger.info("Starting S3 connectivity test...")
+        logger.debug("Starting S3 connectivity test...")
 
         # Get VPC endpoint details
         ec2 = boto3.client('ec2')
@@ -102,22 +104,21 @@ def verify_s3_connectivity():
 
         # Log endpoint details
         for endpoint in endpoints:
-            logger.info(f"Endpoint ID: {endpoint['VpcEndpointId']}")
-            logger.info(f"State: {endpoint['State']}")
-            logger.info(f"Route Table IDs: {endpoint['RouteTableIds']}")
+            logger.debug("Endpoint ID: %s, State: %s, Route Table IDs: %s",
+                         endpoint['VpcEndpointId'], endpoint['State'], endpoint['RouteTableIds'])
 
         # Test S3 operation
         try:
-            logger.info("Testing S3 list_buckets operation...")
+            logger.debug("Testing S3 list_buckets operation...")
             self.s3_client.list_buckets()
-            logger.info(f"S3 connectivity test successful! Time: {time.time() - start_time:.2f}s")
+            logger.debug("S3 connectivity test successful! Time: %.2fs", time.time() - start_time)
             return True
         except Exception as e:
-            logger.error(f"S3 operation failed: {str(e)}")
+            logger.error("S3 operation failed: %s", e)
             return False
 
     except Exception as e:
-        logger.error(f"Error verifying S3 connectivity: {str(e)}")
+        logger.error("Error verifying S3 connectivity: %s", e)
         return False
     
 
@@ -157,14 +158,35 @@ class WorkoutDataValidator:
         # Validate Link format (should contain workout ID)
         invalid_links = df[~df['Link'].str.contains(r'/workout/\d+', na=False)]
         if not invalid_links.empty:
-            logger.warning(f"Found {len(invalid_links)} rows with invalid workout links")
-            logger.debug(f"Invalid links: {invalid_links['Link'].tolist()}")
+            logger.warning("Found %d rows with invalid workout links", len(invalid_links))
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Invalid links: %s", invalid_links['Link'].tolist())
+
+INSERT_WORKOUT_SQL = """
+    INSERT INTO workout_summary (
+        workout_id, workout_date, activity_type,
+        kcal_burned, distance_mi, duration_sec
+    ) VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+def workout_row(workout: Dict) -> Tuple:
+    """Map a cleaned workout record to INSERT_WORKOUT_SQL parameters"""
+    return (
+        workout['workout_id'],
+        workout['Workout Date'],
+        workout['Activity Type'],
+        workout['Calories Burned (kcal)'],
+        workout['Distance (mi)'],
+        workout['Workout Time (seconds)']
+    )
 
 class WorkoutProcessor:
     """Processes workout data and identifies new records"""
     
-    def __init__(self):
+    def __init__(self, metrics: InvocationMetrics = None, timer: StageTimer = None):
         """Initialize processor with storage handler"""
+        self.metrics = metrics or InvocationMetrics()
+        self.timer = timer or StageTimer()
         self.s3_client = boto3.client('s3')
         self.rds_client = boto3.client('rds-data')
         self.bucket = os.getenv("S3_BUCKET")
@@ -172,7 +194,7 @@ class WorkoutProcessor:
         if not verify_s3_connectivity():
             logger.warning("⚠️ S3 connectivity check failed - VPC endpoint may not be working")
         else:
-            logger.info("✅ S3 connectivity verified through VPC endpoint")
+            logger.debug("✅ S3 connectivity verified through VPC endpoint")
 
 
 
@@ -181,48 +203,67 @@ class WorkoutProcessor:
         bucket = event['Records'][0]['s3']['bucket']['name']
         key = event['Records'][0]['s3']['object']['key']
 
-        logger.info(f"Attempting to read from bucket: {bucket}, key: {key}")
-
-        logger.info(f"Lambda VPC Config: {os.environ.get('AWS_LAMBDA_VPC_CONFIG', 'Not in VPC')}")
-        logger.info(f"Lambda Subnet IDs: {os.environ.get('AWS_LAMBDA_SUBNET_IDS', 'No subnets')}")            
+        logger.debug("Attempting to read from bucket: %s, key: %s", bucket, key)
+        logger.debug("Lambda VPC Config: %s, Subnet IDs: %s",
+                     os.environ.get('AWS_LAMBDA_VPC_CONFIG', 'Not in VPC'),
+                     os.environ.get('AWS_LAMBDA_SUBNET_IDS', 'No subnets'))
         
         # Test S3 permissions explicitly
         try:
-            self.s3_client.head_object(Bucket=bucket, Key=key)
-            logger.info("Successfully verified S3 object exists")
+            with self.timer.stage("s3_head"):
+                head = self.s3_client.head_object(Bucket=bucket, Key=key)
+            self.metrics.put_metric("BytesRead", head.get('ContentLength', 0), "Bytes")
+            logger.debug("Successfully verified S3 object exists")
         except Exception as e:
-            logger.error(f"S3 permission/access error: {str(e)}")
+            logger.error("S3 permission/access error: %s", e)
             raise
                 
         try:
-            logger.info("Getting object from S3...")
+            logger.debug("Getting object from S3...")
             # Add this logging before the get_object call
-            response = self.s3_client.get_object(Bucket=bucket, Key=key)
+            with self.timer.stage("s3_get"):
+                response = self.s3_client.get_object(Bucket=bucket, Key=key)
+
+            logger.debug("Reading CSV data...")
+            # Compressed uploads are inflated chunk by chunk as the parser reads them
+            compression = codec_from_metadata(response.get('ContentEncoding'), response.get('ContentType'))
+            with self.timer.stage("read_csv"), decompressed(response['Body'], compression) as body:
+                df = pd.read_csv(body)
+            self.metrics.put_metric("RowsRead", len(df))
+            logger.debug("Successfully read CSV with %d rows", len(df))
+            return self.transform_frame(df)
+        except Exception as e:
+            logger.error("Error extracting S3 data: %s", e)
+            raise
 
-            logger.info("Reading CSV data...")
-            df = pd.read_csv(response['Body'])
-            logger.info(f"Successfully read CSV with {len(df)} rows")
-    
-            logger.info("Validating DataFrame...")
+    def transform_frame(self, df: pd.DataFrame) -> List[Dict]:
+        """Validate, clean and enrich a raw export frame into workout records with IDs"""
+        logger.debug("Validating DataFrame...")
+        with self.timer.stage("validate"):
             WorkoutDataValidator.validate_dataframe(df)
-            logger.info("DataFrame validation successful")
-            
-            logger.info("Cleaning workout data...")  # Add logging for cleaning
-            df = clean_data(df)
+        logger.debug("DataFrame validation successful")
+
+        logger.debug("Cleaning workout data...")
+        with self.timer.stage("clean"):
+            df = clean_data_parallel(df, workers=int(os.getenv("CLEAN_WORKERS", 1)))
+
+        # The export is the full history, so one pass yields exact rolling windows. The columns
+        # reach the partitioned dataset via publish_new_workouts; INSERT_WORKOUT_SQL ignores them
+        if training_metrics_enabled():
+            with self.timer.stage("metrics"):
+                df = add_training_metrics(df)
 
-            # Extract workout IDs from Links
-            logger.info("Extracting workout IDs...")
+        # Extract workout IDs from Links
+        logger.debug("Extracting workout IDs...")
+        with self.timer.stage("extract_ids"):
             df['workout_id'] = df['Link'].apply(self.extract_workout_id)
-            
-            records = df.to_dict('records')
-            logger.info(f"Converted DataFrame to {len(records)} records")
-            
-            return records
-        except Exception as e:
-            logger.error(f"Error extracting S3 data: {e}")
-            raise
 
-    def extract_workout_id(self, url: str) -> str:
+        records = df.to_dict('records')
+        logger.debug("Converted DataFrame to %d records", len(records))
+        return records
+
+    @staticmethod
+    def extract_workout_id(url: str) -> str:
         """Extract workout ID from URL"""
         if pd.isna(url):
             return None
@@ -231,42 +272,126 @@ class WorkoutProcessor:
         
     def insert_new_workouts(self, workouts: List[Dict]) -> bool:
         """Insert new workouts into RDS"""
-        logger.info(f"Attempting to Insert {len(workouts)} new workouts into RDS")
+        logger.debug("Attempting to Insert %d new workouts into RDS", len(workouts))
         conn = get_db_connection()
         if not conn:
             return False
         
+        batch_size = int(os.getenv("INSERT_BATCH_SIZE", 1000))
+        rollup_store = get_rollup_store()
         try:
             with conn.cursor() as cursor:
-                for workout in workouts:
-                    cursor.execute("""
-                        INSERT INTO workout_summary (
-                            workout_id, workout_date, activity_type,
-                            kcal_burned, distance_mi, duration_sec
-                        ) VALUES (%s, %s, %s, %s, %s, %s)
-                    """, (
-                        workout['workout_id'],
-                        workout['Workout Date'],
-                        workout['Activity Type'],
-                        workout['Calories Burned (kcal)'],
-                        workout['Distance (mi)'],
-                        workout['Workout Time (seconds)']
-                    ))
+                for offset in range(0, len(workouts), batch_size):
+                    batch = workouts[offset:offset + batch_size]
+                    with self.timer.stage("insert_batch", offset=offset, rows=len(batch)):
+                        cursor.executemany(INSERT_WORKOUT_SQL, [workout_row(w) for w in batch])
+                if rollup_store:
+                    with self.timer.stage("rollup"):
+                        deltas = compute_rollup_deltas(workouts)
+                        # Database rollups commit atomically with the rows they count
+                        if rollup_store.transactional:
+                            rollup_store.apply(deltas, conn, cursor)
             conn.commit()
-            logger.info(f"Successfully inserted {len(workouts)} new workouts")
+            if rollup_store and not rollup_store.transactional:
+                rollup_store.apply(deltas)
+            logger.info("Successfully inserted %d new workouts", len(workouts))
             return True
         except Exception as e:
-            logger.error(f"Error inserting workouts: {e}")
+            logger.error("Error inserting workouts: %s", e)
             return False
         finally:
             conn.close()
 
 
+    def insert_in_chunks(self, workouts: List[Dict],
+                         remaining_ms: Optional[Callable[[], int]] = None) -> Tuple[int, bool]:
+        """
+        Insert workouts in chunks of COMMIT_CHUNK_ROWS, each in its own transaction.
+
+        Before each chunk, `remaining_ms` (e.g. the Lambda context's
+        get_remaining_time_in_millis) must leave CONTINUATION_MARGIN_MS plus
+        the slowest chunk so far; otherwise insertion stops early so the
+        caller can hand the rest to a continuation.
+
+        Returns:
+            (number of workouts committed, False if a chunk failed)
+        """
+        chunk_rows = int(os.getenv("COMMIT_CHUNK_ROWS", 5000))
+        margin_ms = float(os.getenv("CONTINUATION_MARGIN_MS", 10000))
+        committed, slowest_ms = 0, 0.0
+        while committed < len(workouts):
+            if remaining_ms is not None and remaining_ms() < margin_ms + slowest_ms:
+                logger.warning("Stopping after %d of %d workouts: %d ms left in the invocation",
+                               committed, len(workouts), remaining_ms())
+                break
+            chunk = workouts[committed:committed + chunk_rows]
+            started = time.perf_counter()
+            with self.timer.stage("commit_chunk", offset=committed, rows=len(chunk)):
+                if not self.insert_new_workouts(chunk):
+                    return committed, False
+            slowest_ms = max(slowest_ms, (time.perf_counter() - started) * 1000)
+            committed += len(chunk)
+        return committed, True
+
+_sns_client = None
+
+def get_sns_client():
+    """Return the SNS client shared across warm invocations, creating it on first use."""
+    global _sns_client
+    if _sns_client is None:
+        # Short timeouts so a slow endpoint can't hold the sender thread for long
+        _sns_client = boto3.client('sns', config=Config(
+            connect_timeout=2,
+            read_timeout=2,
+            retries={'max_attempts': 2}
+        ))
+    return _sns_client
+
+
+_lambda_client = None
+
+def get_lambda_client():
+    """Return the Lambda client used to invoke continuations, creating it on first use."""
+    global _lambda_client
+    if _lambda_client is None:
+        _lambda_client = boto3.client('lambda')
+    return _lambda_client
+
+
+def continue_ingestion(checkpoint: Dict[str, Any], context: Any) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """
+    Hand an unfinished file to a continuation invocation.
+
+    The checkpoint (bucket, key, record offset) travels in the event
+    {"continuation": checkpoint}. With CONTINUATION_MODE=invoke (the
+    default) the function invokes itself asynchronously with it; with
+    'return', or if the invoke fails, the event is returned to the caller
+    (e.g. a Step Functions loop) to send back. After
+    CONTINUATION_MAX_ATTEMPTS hops the file is given up on.
+
+    Returns:
+        (continuation event or None if the attempt limit was reached, whether it was invoked)
+    """
+    if checkpoint['attempt'] > int(os.getenv("CONTINUATION_MAX_ATTEMPTS", 20)):
+        logger.error("Giving up on %s after %d continuations at record %d",
+                     checkpoint['key'], checkpoint['attempt'] - 1, checkpoint['offset'])
+        return None, False
+    continuation = {"continuation": checkpoint}
+    logger.info("Continuing %s from record %d of %d", checkpoint['key'], checkpoint['offset'], checkpoint['records'])
+    function_arn = getattr(context, 'invoked_function_arn', None)
+    if os.getenv("CONTINUATION_MODE", "invoke") == "invoke" and function_arn:
+        try:
+            get_lambda_client().invoke(FunctionName=function_arn, InvocationType='Event',
+                                       Payload=json.dumps(continuation).encode('utf-8'))
+            return continuation, True
+        except Exception as e:
+            logger.error("Failed to invoke continuation for %s: %s", checkpoint['key'], e)
+    return continuation, False
+
 def send_sns_notification(topic_arn: str, new_records: int, file_key: str) -> None:
     """Send SNS notification about processing results"""
     try:
-        import boto3
-        sns_client = boto3.client('sns')
+        sns_client = get_sns_client()
         message = {
             'file_processed': file_key,
             'new_records': new_records,
@@ -280,79 +405,281 @@ def send_sns_notification(topic_arn: str, new_records: int, file_key: str) -> No
             Subject=f'Workout Processing Complete: {new_records} new records'
         )
     except Exception as e:
-        logger.error(f"Failed to send SNS notification: {str(e)}")
+        logger.error("Failed to send SNS notification: %s", e)
         # Don't raise - notification failure shouldn't fail the whole process
 
 
-def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    """Lambda handler for processing workout files"""
-    logger.info("START OF LAMBDA HANDLER LOGIC")
-    logger.info(f"Received event: {json.dumps(event)}")
-    logger.info(f"Context: {context}")
-    bucket = event['Records'][0]['s3']['bucket']['name']
-    key = event['Records'][0]['s3']['object']['key']
-    logger.info(f"Processing file: s3://{bucket}/{key}")
+class NotificationDispatcher:
+    """Publishes SNS notifications on a background thread so they overlap with the response"""
+
+    def __init__(self):
+        self._executor = None
+        self._pending = []
+
+    def submit(self, topic_arn: str, new_records: int, file_key: str) -> None:
+        """Queue a notification; it is published by the background sender."""
+        if not topic_arn:
+            logger.debug("No SNS topic configured - skipping notification")
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sns-sender')
+        # Build the client here: boto3 client creation isn't thread-safe
+        get_sns_client()
+        self._pending.append(
+            self._executor.submit(send_sns_notification, topic_arn, new_records, file_key)
+        )
+
+    def flush(self, timeout: float) -> bool:
+        """
+        Wait up to `timeout` seconds for queued notifications.
+
+        Returns:
+            bool: True if every queued notification finished in time
+        """
+        if not self._pending:
+            return True
+        done, not_done = wait(self._pending, timeout=timeout)
+        self._pending = []
+        if not_done:
+            logger.warning("⚠️ %d SNS notification(s) still in flight after %ss", len(not_done), timeout)
+            return False
+        return True
+
+
+notification_dispatcher = NotificationDispatcher()
 
+
+def identify_new_workouts(records: List[Dict], existing_ids: Set[str]) -> List[Dict]:
+    """Return the records whose workout_id isn't already stored"""
+    return [row for row in records if row['workout_id'] not in existing_ids]
+
+
+def publish_new_workouts(workouts: List[Dict], metrics: Optional[InvocationMetrics] = None):
+    """
+    Mirror inserted workouts into the storage dataset that queries.py reads,
+    then bump the ingestion version so cached query results are refreshed.
+
+    Only runs when STORAGE_TYPE is configured. Rows are appended as new part
+    files, so concurrent invocations publishing to the same month don't
+    overwrite each other. Failures are logged and counted as the
+    PublishFailures metric, not raised: the workouts are already committed
+    to RDS.
+
+    Returns:
+        The new ingestion version, or None if nothing was published
+    """
+    if not os.getenv("STORAGE_TYPE"):
+        return None
     try:
-        # Validate event
-        if "Records" not in event or not isinstance(event["Records"], list) or len(event["Records"]) == 0:
-            return {
-                "statusCode": 400,
-                "body": json.dumps({
-                    "error": "Event does not contain valid 'Records'"
-                })
-            }
-
-        # Initialize processor
-        logger.info(f"Initializing WorkoutProcessor")
-        processor = WorkoutProcessor()
-
-        # Get existing workout IDs from RDS
-        logger.info(f"Fetching existing workouts from RDS")
+        storage = get_dataset_storage_handler()
+        storage.write_partitioned(WORKOUT_DATASET, pd.DataFrame(workouts), key_columns=['workout_id'])
+        return storage.bump_ingestion_version()
+    except Exception as e:
+        logger.error("Failed to publish %d workouts to storage: %s", len(workouts), e)
+        if metrics is not None:
+            metrics.put_metric("PublishFailures", metrics.metrics.get("PublishFailures", 0) + 1)
+        return None
+
+
+def flush_spool(processor: WorkoutProcessor, spool) -> Dict[str, int]:
+    """
+    Insert spooled batches, now that the database may be reachable again.
+
+    Each batch is deduplicated against the stored IDs first: a retry on
+    another container may have inserted some of its rows meanwhile. While
+    no connection can be made the flush stops without counting an attempt
+    against any batch.
+    """
+    existing_ids = None
+
+    def write(batch: Dict[str, Any], workouts: List[Dict]) -> bool:
+        nonlocal existing_ids
+        connection = get_db_connection()
+        if not connection:
+            raise DatabaseUnavailable("no database connection")
+        connection.close()
+        if existing_ids is None:
+            existing_ids = fetch_existing_workouts()
+        new_workouts = identify_new_workouts(workouts, existing_ids)
+        if new_workouts:
+            if not processor.insert_new_workouts(new_workouts):
+                return False
+            existing_ids.update(w['workout_id'] for w in new_workouts)
+            publish_new_workouts(new_workouts, processor.metrics)
+            notification_dispatcher.submit(os.getenv("SNS_TOPIC_ARN"), len(new_workouts), batch['source'])
+        return True
+
+    return spool.flush(write)
+
+
+def _process_event(event: Dict[str, Any], metrics: InvocationMetrics,
+                   timer: StageTimer, context: Any = None) -> Tuple[int, Dict[str, Any]]:
+    """
+    Run the ingestion pipeline for one S3 event and return (status code, response body).
+
+    Inserts commit in chunks. When the invocation is about to time out,
+    the rest of the file is handed to a continuation event, which resumes
+    at the checkpointed record offset instead of starting over.
+    """
+    spool = get_spool()
+
+    # A scheduled {"action": "flush_spool"} event drains the spool without a file
+    if event.get("action") == "flush_spool":
+        if not spool:
+            return 400, {"error": "Spooling is not enabled"}
+        with timer.stage("spool_flush"):
+            flushed = flush_spool(WorkoutProcessor(metrics, timer), spool)
+        metrics.put_metric("RowsFlushed", flushed['rows'])
+        return 200, {"message": f"Flushed {flushed['rows']} spooled workouts", **flushed}
+
+    checkpoint = event.get("continuation")
+    if checkpoint:
+        event = {'Records': [{'s3': {'bucket': {'name': checkpoint['bucket']},
+                                     'object': {'key': checkpoint['key']}}}]}
+    # Validate event
+    elif "Records" not in event or not isinstance(event["Records"], list) or len(event["Records"]) == 0:
+        return 400, {"error": "Event does not contain valid 'Records'"}
+
+    bucket = event['Records'][0]['s3']['bucket']['name']
+    key = event['Records'][0]['s3']['object']['key']
+    logger.info("Processing file: s3://%s/%s", bucket, key)
+    metrics.set_property("fileKey", key)
+
+    # Initialize processor
+    with timer.stage("init"):
+        processor = WorkoutProcessor(metrics, timer)
+
+    # Write batches earlier invocations spooled while the database was down
+    if spool:
+        spooled = spool.pending(key)
+        with timer.stage("spool_flush"):
+            flushed = flush_spool(processor, spool)
+        metrics.put_metric("RowsFlushed", flushed['rows'])
+        # A retry of a spooled file is answered from the spool, without downloading or parsing it again
+        if spooled:
+            if spool.pending(key):
+                return 503, {"error": "Database unavailable; workouts remain spooled", "file_processed": key}
+            if spool.set_aside(key):
+                return 500, {"error": "Spooled workouts were set aside after repeated insert failures",
+                             "file_processed": key}
+            return 200, {"message": f"Flushed {sum(b['row_count'] for b in spooled)} spooled workouts",
+                         "file_processed": key}
+
+    # Get existing workout IDs from RDS
+    with timer.stage("fetch_ids"):
         existing_workouts = fetch_existing_workouts()
-        logger.info(f"Existing workout IDs: {len(existing_workouts)}")
 
-        # Extract and process data
-        logger.info(f"Extracting data from S3")
+    # Extract and process data
+    with timer.stage("extract"):
         s3_data = processor.extract_s3_data(event)
-        logger.info(f"Extracted {len(s3_data)} records from S3")
-
-        # Identify new workouts
-        new_workouts = [row for row in s3_data if row['workout_id'] not in existing_workouts]
-        logger.info(f"New workouts: {len(new_workouts)}")           
-
-        if not new_workouts:
-            return {
-                "statusCode": 200,
-                "body": json.dumps({
-                    "message": "No new workouts found."
-                })
-            }
-
-        # Insert new workouts
-        if len(new_workouts) > 0:
-            logger.info(f"Inserting new workouts into RDS")
-            success = processor.insert_new_workouts(new_workouts)
-            # Send notification if configured
-            if success:
-                send_sns_notification(os.getenv("SNS_TOPIC_ARN"), len(new_workouts), key)
-            
-        return {
-            "statusCode": 200,
-            "body": json.dumps({
-                "message": f"Successfully processed {len(new_workouts)} new workouts",
-                "file_processed": event["Records"][0]["s3"]["object"]["key"],
-                "new_workout_ids": [w['workout_id'] for w in new_workouts]
-            }, ensure_ascii=False)  # Add ensure_ascii=False for proper encoding
+
+    # Records before the checkpoint were committed by earlier invocations
+    offset = 0
+    if checkpoint:
+        if checkpoint['records'] == len(s3_data):
+            offset = checkpoint['offset']
+        else:
+            logger.warning("%s changed since it was checkpointed; deduplicating the whole file", key)
+
+    # Identify new workouts, remembering where each sits in the file for checkpoints
+    with timer.stage("dedup"):
+        new_positions = [i for i in range(offset, len(s3_data))
+                         if s3_data[i]['workout_id'] not in existing_workouts]
+        new_workouts = [s3_data[i] for i in new_positions]
+    metrics.put_metric("RowsNew", len(new_workouts))
+    logger.info("Found %d new of %d extracted workouts (%d already stored)",
+                len(new_workouts), len(s3_data), len(existing_workouts))
+
+    if not new_workouts:
+        return 200, {"message": "No new workouts found."}
+
+    # Insert new workouts, committing chunk by chunk while there's time left
+    with timer.stage("insert"):
+        committed, success = processor.insert_in_chunks(
+            new_workouts, getattr(context, 'get_remaining_time_in_millis', None))
+    # Send notification if configured
+    if committed:
+        with timer.stage("publish"):
+            publish_new_workouts(new_workouts[:committed], metrics)
+        notification_dispatcher.submit(os.getenv("SNS_TOPIC_ARN"), committed, key)
+    if not success and spool:
+        # Keep the cleaned rows so the retry skips straight to the insert
+        with timer.stage("spool"):
+            spool.append(new_workouts[committed:], key)
+        metrics.put_metric("RowsSpooled", len(new_workouts) - committed)
+        return 202, {"message": f"Database unavailable; spooled {len(new_workouts) - committed} workouts for retry",
+                     "file_processed": key}
+    if not success:
+        # Send {"continuation": checkpoint} to resume once the database is back
+        metrics.put_metric("RowsFailed", len(new_workouts) - committed)
+        return 500, {
+            "error": f"Database insert failed after committing {committed} of {len(new_workouts)} new workouts",
+            "file_processed": key,
+            "checkpoint": {'bucket': bucket, 'key': key, 'offset': new_positions[committed],
+                           'records': len(s3_data), 'attempt': (checkpoint or {}).get('attempt', 0)},
         }
+    if committed < len(new_workouts):
+        metrics.put_metric("RowsDeferred", len(new_workouts) - committed)
+        continuation, invoked = continue_ingestion({
+            'bucket': bucket, 'key': key, 'offset': new_positions[committed], 'records': len(s3_data),
+            'attempt': (checkpoint or {}).get('attempt', 0) + 1}, context)
+        if continuation is None:
+            return 500, {"error": f"Gave up on {key} after repeated continuations", "file_processed": key}
+        return 202, {
+            "message": f"Committed {committed} of {len(new_workouts)} new workouts before the time limit",
+            "file_processed": key,
+            "continuation": continuation,
+            "continuation_invoked": invoked,
+        }
+
+    return 200, {
+        "message": f"Successfully processed {len(new_workouts)} new workouts",
+        "file_processed": key,
+        "new_workout_ids": [w['workout_id'] for w in new_workouts[:committed]]
+    }
+
+
+@profile_invocation
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """Lambda handler for processing workout files"""
+    configure_invocation_logging(logger)
+    logger.debug("Received event: %s", LazyJson(event))
+    logger.debug("Context: %s", context)
+
+    profiler = MemoryProfiler() if memory_profiling_enabled() else None
+    timer = StageTimer(detailed=stage_timing_enabled(), memory=profiler)
+    metrics = InvocationMetrics({"FunctionName": getattr(context, 'function_name', 'workout-processor')})
+    metrics.set_property("requestId", getattr(context, 'aws_request_id', None))
+    if profiler:
+        profiler.start()
+
+    try:
+        status_code, body = _process_event(event, metrics, timer, context)
     except Exception as e:
         error_msg = f"Unexpected error: {str(e)}"
         logger.error(error_msg)
-        return {
-            "statusCode": 500,
-            "body": json.dumps({
-                "error": error_msg
-            }, ensure_ascii=False)
-        }
+        status_code, body = 500, {"error": error_msg}
+
+    # Notifications must not outlive the invocation, but a slow SNS endpoint can't stretch it either
+    with timer.stage("notify"):
+        notification_dispatcher.flush(float(os.getenv("SNS_FLUSH_TIMEOUT", 2)))
+
+    for stage, ms in timer.durations().items():
+        metrics.put_metric(f"{stage.title().replace('_', '')}Duration", ms, "Milliseconds")
+    if profiler:
+        profiler.stop()
+        memory_summary = profiler.summary(metrics.metrics.get("BytesRead"))
+        metrics.put_metric("PeakAllocBytes", max((s['peak_alloc_bytes'] for s in memory_summary.values()), default=0), "Bytes")
+        metrics.put_metric("MaxRssBytes", peak_rss_bytes(), "Bytes")
+        logger.info("Memory profile: %s", LazyJson(memory_summary))
+    metrics.set_property("statusCode", status_code)
+    metrics.emit()
+
+    if timer.detailed:
+        body["timings"] = timer.to_dict()
+        logger.info("Stage timings: %s", LazyJson(body["timings"]))
 
-logger.info("END OF LAMBDA HANDLER LOGIC")
\ No newline at end of file
+    return {
+        "statusCode": status_code,
+        "body": json.dumps(body, ensure_ascii=False)  # Add ensure_ascii=False for proper encoding
+    }
@@ -0,0 +1,55 @@
+"""
+conftest.py
+
+Fixtures for the ingestion benchmarks.
+
+Benchmarks are deselected from the default run (see pytest.ini) and need
+pytest-benchmark. Input sizes come from BENCHMARK_SIZES, a comma-separated
+list of row counts.
+"""
+
+import os
+import pytest
+import numpy as np
+import pandas as pd
+
+pytest.importorskip('pytest_benchmark')
+
+BENCHMARK_SIZES = [int(n) for n in os.getenv('BENCHMARK_SIZES', '1000,10000').split(',')]
+
+# One of each format parse_date understands, plus an unparseable value
+DATE_FORMATS = ['%b. %d, %Y', '%d-%b-%y', '%d-%b-%Y', '%B %d, %Y', '%d-%m-%y', '%Y-%m-%d']
+
+
+def make_export_frame(rows, seed=42):
+    """Build a workout export of `rows` rows with mixed date formats and some rows clean_data drops"""
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 1700, rows), unit='D')
+    formats = rng.integers(0, len(DATE_FORMATS), rows)
+    workout_dates = [d.strftime(DATE_FORMATS[f]) for d, f in zip(dates, formats)]
+    for i in np.flatnonzero(rng.random(rows) < 0.01):
+        workout_dates[i] = 'not a date'
+
+    seconds = rng.integers(600, 7200, rows)
+    seconds[rng.random(rows) < 0.02] = 0
+    distance = np.round(seconds / 600 * rng.uniform(0.8, 1.2, rows), 2)
+    pace = np.round(np.where(distance > 0, seconds / 60 / np.maximum(distance, 0.01), np.nan), 2)
+
+    return pd.DataFrame({
+        'Date Submitted': dates.strftime('%b. %d, %Y'),
+        'Workout Date': workout_dates,
+        'Activity Type': rng.choice(['Run', 'Bike Ride', 'Walk'], rows),
+        'Calories Burned (kcal)': np.round(seconds / 6.0, 1),
+        'Distance (mi)': distance,
+        'Workout Time (seconds)': seconds,
+        'Avg Pace (min/mi)': pace,
+        'Max Pace (min/mi)': np.round(pace * 0.85, 2),
+        'Steps': rng.integers(1000, 20000, rows),
+        'Link': [f'http://www.mapmyfitness.com/workout/{7000000000 + i}' for i in range(rows)],
+    })
+
+
+@pytest.fixture(params=BENCHMARK_SIZES, ids=lambda n: f'{n}_rows')
+def export_frame(request):
+    """A raw export frame at each configured benchmark size."""
+    return make_export_frame(request.param)
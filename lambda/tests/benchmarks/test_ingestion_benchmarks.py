@@ -0,0 +1,101 @@
+"""
+test_ingestion_benchmarks.py
+
+Benchmarks for the ingestion hot paths, at the sizes in BENCHMARK_SIZES.
+
+Run and save results as JSON under .benchmarks/, failing on regressions
+against the last saved run:
+
+    pytest -m benchmark tests/benchmarks --benchmark-autosave \
+        --benchmark-compare --benchmark-compare-fail=mean:15%
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent / 'src'))
+sys.path.append(str(Path(__file__).parent.parent))
+
+import bz2
+import gzip
+
+import boto3
+import pytest
+from moto import mock_s3
+
+from src import workout_processor
+from src.data_cleaning import parse_date, clean_data
+from src.workout_processor import WorkoutDataValidator, WorkoutProcessor, identify_new_workouts
+from src.training_metrics import add_training_metrics
+from local_db import create_local_db
+
+pytestmark = pytest.mark.benchmark
+
+
+@pytest.fixture
+def processor(aws_credentials, monkeypatch):
+    """A WorkoutProcessor that skips the VPC endpoint check."""
+    monkeypatch.setattr(workout_processor, 'verify_s3_connectivity', lambda: True)
+    return WorkoutProcessor()
+
+@pytest.fixture
+def cleaned_records(export_frame, processor):
+    """Cleaned records with workout IDs, as handed to dedup and insert."""
+    df = clean_data(export_frame)
+    df['workout_id'] = df['Link'].apply(processor.extract_workout_id)
+    return df.to_dict('records')
+
+def test_parse_date(benchmark, export_frame):
+    dates = export_frame['Workout Date'].astype(str).tolist()
+    benchmark(lambda: [parse_date(d) for d in dates])
+
+def test_validate_dataframe(benchmark, export_frame):
+    benchmark(WorkoutDataValidator.validate_dataframe, export_frame)
+
+def test_clean_data(benchmark, export_frame):
+    benchmark(clean_data, export_frame)
+
+def test_training_metrics(benchmark, export_frame):
+    cleaned = clean_data(export_frame)
+    benchmark(add_training_metrics, cleaned)
+
+def test_extract_workout_id(benchmark, export_frame, processor):
+    links = export_frame['Link']
+    benchmark(links.apply, processor.extract_workout_id)
+
+def test_identify_new_workouts(benchmark, cleaned_records):
+    # Half the file is already stored, the usual shape of a cumulative export
+    existing_ids = {r['workout_id'] for r in cleaned_records[::2]}
+    result = benchmark(identify_new_workouts, cleaned_records, existing_ids)
+    assert len(result) == len(cleaned_records) // 2
+
+def test_insert_new_workouts(benchmark, cleaned_records, processor, monkeypatch, tmp_path):
+    databases = iter(range(10 ** 6))
+
+    def setup():
+        # Each round inserts into an empty database
+        connect = create_local_db(str(tmp_path / f'bench_{next(databases)}.db'))
+        monkeypatch.setattr(workout_processor, 'get_db_connection', connect)
+        return (cleaned_records,), {}
+
+    assert benchmark.pedantic(processor.insert_new_workouts, setup=setup, rounds=5)
+
+@pytest.mark.parametrize('codec', ['raw', 'gzip', 'bz2', 'zstd'])
+def test_extract_s3_data(benchmark, export_frame, processor, codec):
+    # End to end from the S3 GET through cleaning; compare codecs at the same row count
+    body = export_frame.to_csv(index=False).encode()
+    if codec == 'gzip':
+        body = gzip.compress(body)
+    elif codec == 'bz2':
+        body = bz2.compress(body)
+    elif codec == 'zstd':
+        body = pytest.importorskip('zstandard').ZstdCompressor().compress(body)
+    event = {'Records': [{'s3': {'bucket': {'name': 'bench-bucket'}, 'object': {'key': 'export.csv'}}}]}
+
+    with mock_s3():
+        s3 = boto3.client('s3', region_name='us-east-1')
+        s3.create_bucket(Bucket='bench-bucket')
+        s3.put_object(Bucket='bench-bucket', Key='export.csv', Body=body)
+        benchmark.extra_info['object_bytes'] = len(body)
+        records = benchmark(processor.extract_s3_data, event)
+
+    assert records
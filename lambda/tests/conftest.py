@@ -24,6 +24,28 @@ def sample_workout_data():
         ]
     })
 
+@pytest.fixture
+def sample_export_data():
+    """Create workout data with the full export schema, including rows clean_data drops."""
+    return pd.DataFrame({
+        'Date Submitted': ['Aug. 1, 2024', 'Aug. 2, 2024', 'Aug. 3, 2024', 'Aug. 4, 2024', 'Aug. 5, 2024'],
+        'Workout Date': ['Aug. 1, 2024', '31-Jul-24', 'July 30, 2024', 'not a date', '2024-08-05'],
+        'Activity Type': ['Run', 'Bike Ride', 'Walk', 'Run', 'Run'],
+        'Calories Burned (kcal)': [400.0, 300.0, 150.0, 420.0, 0.0],
+        'Distance (mi)': [5.0, 10.5, 2.0, 5.2, 0.0],
+        'Workout Time (seconds)': [1800, 2700, 1500, 1850, 0],
+        'Avg Pace (min/mi)': [6.0, 4.3, 12.5, 5.9, None],
+        'Max Pace (min/mi)': [5.2, 3.1, 10.0, 5.1, None],
+        'Steps': [5200, None, 4100, 5400, None],
+        'Link': [
+            'http://www.mapmyfitness.com/workout/7434147697',
+            'http://www.mapmyfitness.com/workout/7434147698',
+            'http://www.mapmyfitness.com/workout/7434147699',
+            'http://www.mapmyfitness.com/workout/7434147700',
+            'http://www.mapmyfitness.com/workout/7434147701'
+        ]
+    })
+
 @pytest.fixture
 def aws_credentials():
     """Mocked AWS Credentials for moto."""
@@ -0,0 +1,177 @@
+"""
+load_harness.py
+
+Local end-to-end load test for the Lambda handler.
+
+Uploads synthetic exports to a moto-mocked S3 bucket, then fires N S3
+events at `handler` from concurrent worker threads. Inserts go to the
+SQLite stand-in from local_db.py. Reports throughput (files/s, rows/s)
+and p50/p95/p99 latency per stage, taken from the handler's stage timing
+tree.
+
+    python tests/load_harness.py --events 50 --workers 8 --rows 5000
+
+Workers are threads, because moto's mocks live in this process, so
+CPU-bound stages contend for the GIL. Treat results as relative numbers
+for comparing builds and settings, not as absolute Lambda latencies.
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+sys.path.append(str(Path(__file__).parent.parent / 'scripts'))
+sys.path.append(str(Path(__file__).parent))
+
+import os
+import json
+import time
+import argparse
+import tempfile
+from contextlib import redirect_stdout
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import boto3
+import numpy as np
+from moto import mock_s3
+
+import workout_processor
+from generate_test_data import generate_chunk
+from local_db import create_local_db
+
+BUCKET = 'workout-data'
+PERCENTILES = (50, 95, 99)
+
+
+def _s3_event(key):
+    return {'Records': [{'s3': {'bucket': {'name': BUCKET}, 'object': {'key': key}}}]}
+
+
+def _flatten_timings(nodes, prefix=''):
+    """Sum stage durations per path, e.g. 'extract/read_csv' or 'insert/insert_batch'"""
+    totals = defaultdict(float)
+    for node in nodes:
+        path = f"{prefix}{node['name']}"
+        totals[path] += node.get('ms', 0.0)
+        for child_path, ms in _flatten_timings(node.get('children', []), f"{path}/").items():
+            totals[child_path] += ms
+    return totals
+
+
+def _summarize(samples):
+    """p50/p95/p99 and mean of a list of millisecond samples"""
+    values = np.asarray(samples)
+    summary = {f"p{p}": round(float(np.percentile(values, p)), 3) for p in PERCENTILES}
+    summary['mean'] = round(float(values.mean()), 3)
+    return summary
+
+
+def run_load_test(events=20, workers=4, rows_per_file=2000, distinct_files=None, seed=42, db_path=None):
+    """
+    Replay `events` S3 events against the handler across `workers` threads.
+
+    Args:
+        events: Number of handler invocations
+        workers: Number of concurrent workers
+        rows_per_file: Rows in each synthetic export
+        distinct_files: Number of distinct files uploaded (defaults to `events`);
+            events cycle through them, so later events re-read stored workouts
+        seed: Seed for the synthetic exports
+        db_path: SQLite file for the database stand-in (a temp file by default)
+
+    Returns:
+        dict with throughput, per-stage latency percentiles and failures
+    """
+    distinct_files = distinct_files or events
+    tmp_dir = None
+    if db_path is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(tmp_dir.name, 'load_test.db')
+    connect = create_local_db(db_path)
+
+    env = {
+        'AWS_ACCESS_KEY_ID': 'testing',
+        'AWS_SECRET_ACCESS_KEY': 'testing',
+        'AWS_SECURITY_TOKEN': 'testing',
+        'AWS_SESSION_TOKEN': 'testing',
+        'AWS_DEFAULT_REGION': 'us-east-1',
+        'S3_BUCKET': BUCKET,
+        'STAGE_TIMING': '1',
+        'LOG_LEVEL': 'WARNING',
+    }
+
+    try:
+        with patch.dict(os.environ, env), mock_s3(), \
+                patch.object(workout_processor, 'verify_s3_connectivity', return_value=True), \
+                patch.object(workout_processor, 'get_db_connection', side_effect=connect):
+            s3 = boto3.client('s3')
+            s3.create_bucket(Bucket=BUCKET)
+            keys = []
+            for i in range(distinct_files):
+                rng = np.random.default_rng([seed, i])
+                body = generate_chunk(rng, i * rows_per_file, rows_per_file, '2015-01-01').to_csv(index=False)
+                key = f'uploads/export_{i:05d}.csv'
+                s3.put_object(Bucket=BUCKET, Key=key, Body=body.encode())
+                keys.append(key)
+
+            def invoke(i):
+                start = time.perf_counter()
+                response = workout_processor.handler(_s3_event(keys[i % len(keys)]), None)
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                return response, elapsed_ms
+
+            # The handler's EMF lines would bury the report; the timings carry the same data
+            start = time.perf_counter()
+            with open(os.devnull, 'w') as devnull, redirect_stdout(devnull), \
+                    ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(invoke, range(events)))
+            wall_seconds = time.perf_counter() - start
+    finally:
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+
+    stage_samples = defaultdict(list)
+    failures = []
+    for i, (response, elapsed_ms) in enumerate(results):
+        stage_samples['total'].append(elapsed_ms)
+        body = json.loads(response['body'])
+        if response['statusCode'] != 200:
+            failures.append({'event': i, 'statusCode': response['statusCode'], 'error': body.get('error')})
+        for stage, ms in _flatten_timings(body.get('timings', [])).items():
+            stage_samples[stage].append(ms)
+
+    total_rows = events * rows_per_file
+    return {
+        'events': events,
+        'workers': workers,
+        'rows_per_file': rows_per_file,
+        'wall_seconds': round(wall_seconds, 3),
+        'files_per_second': round(events / wall_seconds, 3),
+        'rows_per_second': round(total_rows / wall_seconds, 1),
+        'failures': failures,
+        'stages_ms': {stage: _summarize(samples) for stage, samples in sorted(stage_samples.items())},
+    }
+
+
+def main(argv=None):
+    """Run the harness from the command line and print the report as JSON."""
+    parser = argparse.ArgumentParser(description='Replay concurrent S3 events against the handler.')
+    parser.add_argument('--events', type=int, default=20, help='Number of S3 events to fire')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent workers')
+    parser.add_argument('--rows', type=int, default=2000, help='Rows per synthetic file')
+    parser.add_argument('--distinct-files', type=int, help='Distinct files to upload (default: one per event)')
+    parser.add_argument('--seed', type=int, default=42, help='Seed for the synthetic exports')
+    parser.add_argument('--output', help='Also write the report to this JSON file')
+    args = parser.parse_args(argv)
+
+    report = run_load_test(args.events, args.workers, args.rows, args.distinct_files, args.seed)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 1 if report['failures'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+local_db.py
+
+SQLite-backed stand-in for the RDS MySQL database.
+
+Exposes the small part of the pymysql connection API the pipeline uses
+(`cursor()` as a context manager, `execute`, `executemany`, `fetchall`,
+`commit`, `rollback`, `close`), translating `%s` placeholders to SQLite's `?`.
+"""
+
+import sys
+import sqlite3
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+
+from rollups import ROLLUP_DDL
+
+WORKOUT_SUMMARY_DDL = """
+    CREATE TABLE IF NOT EXISTS workout_summary (
+        workout_id TEXT PRIMARY KEY,
+        workout_date TEXT,
+        activity_type TEXT,
+        kcal_burned REAL,
+        distance_mi REAL,
+        duration_sec REAL
+    )
+"""
+
+
+class LocalDBCursor:
+    """pymysql-style cursor wrapping a sqlite3 cursor"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._cursor.close()
+        return False
+
+    def execute(self, sql, params=()):
+        return self._cursor.execute(sql.replace('%s', '?'), _adapt(params))
+
+    def executemany(self, sql, seq_of_params):
+        return self._cursor.executemany(sql.replace('%s', '?'), [_adapt(p) for p in seq_of_params])
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+
+class LocalDBConnection:
+    """pymysql-style connection backed by a SQLite database file"""
+
+    # Lets callers such as rollups pick SQLite's SQL variants
+    dialect = 'sqlite'
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.closed = False
+
+    def cursor(self):
+        return LocalDBCursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def ping(self, reconnect=False):
+        self._conn.execute("SELECT 1")
+
+    def close(self):
+        self._conn.close()
+        self.closed = True
+
+
+def _adapt(params):
+    """Convert values SQLite can't bind (pandas timestamps) to strings"""
+    return tuple(str(v) if hasattr(v, 'isoformat') else v for v in params)
+
+
+def create_local_db(path):
+    """
+    Create the workout_summary and workout_rollup schema at `path`.
+
+    Returns:
+        A zero-argument factory returning new connections, usable as a
+        drop-in for `workout_processor.get_db_connection`
+    """
+    conn = sqlite3.connect(path)
+    conn.execute(WORKOUT_SUMMARY_DDL)
+    conn.execute(ROLLUP_DDL['sqlite'])
+    conn.commit()
+    conn.close()
+    return lambda: LocalDBConnection(path)
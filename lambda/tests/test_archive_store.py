@@ -0,0 +1,133 @@
+"""
+test_archive_store.py
+
+Unit tests for the content-addressed archive store and its use by the storage handlers.
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+
+import io
+import hashlib
+import os
+import boto3
+import pytest
+import pandas as pd
+from moto import mock_s3
+
+from src.archive_store import ArchiveStore, LocalBlobStore, S3BlobStore, iter_chunks
+from src.storage import LocalStorageHandler, S3StorageHandler
+
+
+def _history(rows):
+    """CSV bytes of a cumulative history with `rows` rows."""
+    lines = [b'Workout Date,Activity Type,Distance (mi)\n']
+    lines += [f'2024-01-01 {i % 24:02d}:00:00,Running {i},{i % 13}.5\n'.encode() for i in range(rows)]
+    return b''.join(lines)
+
+
+@pytest.fixture
+def store(tmp_path):
+    """An archive store with small chunks so tests produce many of them."""
+    return ArchiveStore(LocalBlobStore(str(tmp_path / 'cas')), min_chunk_size=1024, max_chunk_size=16 * 1024)
+
+
+def test_chunks_reassemble_and_resist_appends():
+    """Test that chunks concatenate to the input and appends leave earlier chunks unchanged."""
+    old = _history(5000)
+    new = _history(6000)
+
+    old_chunks = list(iter_chunks(io.BytesIO(old), 1024, 16 * 1024, mask=63))
+    new_chunks = list(iter_chunks(io.BytesIO(new), 1024, 16 * 1024, mask=63))
+
+    assert b''.join(new_chunks) == new
+    assert max(len(c) for c in new_chunks) <= 16 * 1024
+    assert old_chunks[:-1] == new_chunks[:len(old_chunks) - 1]
+
+
+def test_put_version_only_writes_new_data(store):
+    """Test that archiving a grown history stores only the chunks holding new rows."""
+    first = store.put_version('current/history.csv', io.BytesIO(_history(20000)))
+    second = store.put_version('current/history.csv', io.BytesIO(_history(20500)))
+
+    assert second['new_chunks'] < len(second['chunks']) // 10
+    assert second['new_bytes'] < first['new_bytes'] // 10
+    assert store.read_version_bytes(first['id']) == _history(20000)
+    assert store.read_version_bytes(second['id']) == _history(20500)
+    assert store.list_versions('current/history.csv') == [first['id'], second['id']]
+
+
+def test_keys_sharing_a_basename_keep_separate_histories(store):
+    """Test that versions of a/x.csv, b/x.csv and a/x.parquet never mix or prune each other."""
+    a = store.put_version('a/x.csv', io.BytesIO(_history(3000)))
+    b = store.put_version('b/x.csv', io.BytesIO(_history(3100)))
+    parquet = store.put_version('a/x.parquet', io.BytesIO(_history(3200)))
+
+    assert store.list_versions('a/x.csv') == [a['id']]
+    assert store.list_versions('b/x.csv') == [b['id']]
+    assert store.list_versions('a/x.parquet') == [parquet['id']]
+
+    result = store.compact(keep_last=1, gc_grace_seconds=0)
+
+    assert result['pruned_versions'] == []
+    assert store.read_version_bytes(a['id']) == _history(3000)
+    assert store.read_version_bytes(b['id']) == _history(3100)
+
+
+def test_compact_prunes_versions_and_collects_chunks(store):
+    """Test that retention removes old manifests and their now-unreferenced chunks."""
+    old = store.put_version('current/history.csv', io.BytesIO(b'x,y\n' + b'1,2\n' * 3000))
+    new = store.put_version('current/history.csv', io.BytesIO(_history(3000)))
+
+    dry = store.compact(keep_last=1, gc_grace_seconds=0, dry_run=True)
+    assert dry['pruned_versions'] == [old['id']]
+    assert store.list_versions() == [old['id'], new['id']]
+
+    result = store.compact(keep_last=1, gc_grace_seconds=0)
+    assert result['pruned_versions'] == [old['id']]
+    assert result['deleted_chunks'] == dry['deleted_chunks'] > 0
+    assert store.list_versions() == [new['id']]
+    assert store.read_version_bytes(new['id']) == _history(3000)
+
+
+def test_compact_respects_grace_period(store):
+    """Test that recently written chunks survive even when unreferenced."""
+    old = store.put_version('current/history.csv', io.BytesIO(b'x,y\n' + b'1,2\n' * 3000))
+    store.put_version('current/history.csv', io.BytesIO(_history(3000)))
+
+    result = store.compact(keep_last=1)
+
+    assert result['pruned_versions'] == [old['id']]
+    assert result['deleted_chunks'] == 0
+
+
+def test_local_handler_cas_mode(tmp_path):
+    """Test versioning and reading back through LocalStorageHandler in cas mode."""
+    handler = LocalStorageHandler(str(tmp_path), file_format='csv', archive_mode='cas')
+    df = pd.DataFrame({'workout_id': ['1', '2'], 'activity': ['Running', 'Cycling']})
+    handler.write_file('current/test.csv', df)
+
+    archive_key = handler.version_existing_file('test.csv')
+
+    assert archive_key.startswith(f"archive/cas/manifests/{hashlib.sha256(b'test.csv').hexdigest()}/")
+    assert os.path.exists(tmp_path / archive_key)
+    pd.testing.assert_frame_equal(handler.read_version('test.csv', archive_key).astype(str), df)
+
+
+def test_s3_handler_cas_mode(aws_credentials):
+    """Test that S3 cas versions skip chunks already in the bucket."""
+    with mock_s3():
+        client = boto3.client('s3')
+        client.create_bucket(Bucket='test-bucket')
+        handler = S3StorageHandler('test-bucket', client=client, file_format='csv', archive_mode='cas')
+        handler.archive_store = ArchiveStore(S3BlobStore(client, 'test-bucket', 'archive/cas'),
+                                             min_chunk_size=1024, max_chunk_size=16 * 1024)
+        client.put_object(Bucket='test-bucket', Key='current/history.csv', Body=_history(5000))
+        first_key = handler.version_existing_file('history.csv')
+        client.put_object(Bucket='test-bucket', Key='current/history.csv', Body=_history(5100))
+        second_key = handler.version_existing_file('history.csv')
+
+        assert len(handler.read_version('history.csv', first_key)) == 5000
+        assert len(handler.read_version('history.csv', second_key)) == 5100
+        assert len(handler.archive_store.list_versions('history.csv')) == 2
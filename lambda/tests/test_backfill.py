@@ -0,0 +1,82 @@
+"""
+test_backfill.py
+
+Unit tests for the resumable backfill CLI.
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+sys.path.append(str(Path(__file__).parent.parent / 'scripts'))
+sys.path.append(str(Path(__file__).parent))
+
+import gzip
+import json
+from unittest.mock import patch
+
+import pytest
+
+from backfill import main
+from local_db import create_local_db
+import workout_processor
+
+
+@pytest.fixture
+def exports(tmp_path, sample_export_data):
+    """An export directory with an overlapping pair of files, a gzip file and a malformed one."""
+    directory = tmp_path / 'exports'
+    (directory / '2024').mkdir(parents=True)
+    sample_export_data[:2].to_csv(directory / '2024' / 'a.csv', index=False)
+    sample_export_data.to_csv(directory / '2024' / 'b.csv', index=False)
+    later = sample_export_data.assign(Link=sample_export_data['Link'].str.replace('74341476', '74341477'))
+    (directory / 'c.csv.gz').write_bytes(gzip.compress(later.to_csv(index=False).encode()))
+    (directory / 'bad.csv').write_text('a,b\n1,2\n')
+    (directory / 'notes.txt').write_text('not an export')
+    return directory
+
+
+def _stored_ids(connect):
+    with connect().cursor() as cursor:
+        cursor.execute("SELECT workout_id FROM workout_summary")
+        return {row[0] for row in cursor.fetchall()}
+
+
+def test_backfill_resumes_from_checkpoint(tmp_path, monkeypatch, aws_credentials, exports, capsys):
+    """Test that a rerun skips completed files and only retries failed or changed ones."""
+    monkeypatch.setenv('ROLLUP_STORE', 'off')
+    connect = create_local_db(str(tmp_path / 'workouts.db'))
+    checkpoint = str(tmp_path / 'checkpoint.json')
+    args = ['--local', str(exports), '--checkpoint', checkpoint, '--workers', '2']
+
+    with patch.object(workout_processor, 'verify_s3_connectivity', return_value=True), \
+            patch.object(workout_processor, 'get_db_connection', side_effect=connect):
+        assert main(args) == 1
+        first = json.loads(capsys.readouterr().out)
+        assert main(args) == 1
+        second = json.loads(capsys.readouterr().out)
+        (exports / '2024' / 'a.csv').write_text((exports / '2024' / 'b.csv').read_text())
+        main(args)
+        third = json.loads(capsys.readouterr().out)
+
+    assert (first['files_total'], first['files_done'], first['new_workouts']) == (4, 3, 6)
+    assert list(first['failed']) == ['bad.csv']
+    assert first['rows_per_s'] > 0
+    assert len(_stored_ids(connect)) == 6
+    assert sorted(json.load(open(checkpoint))['completed']) == ['2024/a.csv', '2024/b.csv', 'c.csv.gz']
+
+    assert (second['files_skipped'], second['files_done'], second['new_workouts']) == (3, 0, 0)
+    # The rewritten file is processed again; its rows are already stored
+    assert (third['files_skipped'], third['files_done'], third['new_workouts']) == (2, 1, 0)
+
+
+def test_dry_run_inserts_nothing(tmp_path, monkeypatch, aws_credentials, exports, capsys):
+    """Test that --dry-run counts new workouts without writing them or the checkpoint."""
+    connect = create_local_db(str(tmp_path / 'workouts.db'))
+    checkpoint = tmp_path / 'checkpoint.json'
+
+    with patch.object(workout_processor, 'verify_s3_connectivity', return_value=True), \
+            patch.object(workout_processor, 'get_db_connection', side_effect=connect):
+        main(['--local', str(exports), '--checkpoint', str(checkpoint), '--dry-run'])
+
+    assert json.loads(capsys.readouterr().out)['new_workouts'] == 6
+    assert not _stored_ids(connect) and not checkpoint.exists()
@@ -0,0 +1,87 @@
+"""
+test_batch_ingest.py
+
+Unit tests for micro-batched ingestion of SQS batches of small files.
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+sys.path.append(str(Path(__file__).parent))
+
+import json
+import queue
+from unittest.mock import Mock, patch
+
+import boto3
+from moto import mock_s3
+
+from local_db import create_local_db
+import batch_ingest
+import workout_processor
+
+
+def _s3_record(key, bucket='upload-bucket'):
+    return {'s3': {'bucket': {'name': bucket}, 'object': {'key': key}}}
+
+
+def _sqs_record(message_id, *keys):
+    return {'messageId': message_id, 'body': json.dumps({'Records': [_s3_record(k) for k in keys]})}
+
+
+def test_batch_items_flattens_sqs_messages():
+    """Test that S3 records are unpacked from SQS bodies and unreadable messages fail alone."""
+    event = {'Records': [_sqs_record('m1', 'a.csv', 'b.csv'),
+                         {'messageId': 'm2', 'body': json.dumps({'Event': 's3:TestEvent'})},
+                         {'messageId': 'm3', 'body': 'not json'},
+                         _s3_record('c.csv')]}
+
+    items, failed = batch_ingest.batch_items(event)
+
+    assert [(i['id'], i['key']) for i in items] == [('m1', 'a.csv'), ('m1', 'b.csv'), ('c.csv', 'c.csv')]
+    assert [f['id'] for f in failed] == ['m3']
+
+
+def test_drain_queue():
+    """Test that the local queue stand-in yields at most max_records records."""
+    local_queue = queue.Queue()
+    for key in ('a.csv', 'b.csv', 'c.csv'):
+        local_queue.put(_s3_record(key))
+
+    assert len(batch_ingest.drain_queue(local_queue, max_records=2)['Records']) == 2
+    assert len(batch_ingest.drain_queue(local_queue)['Records']) == 1
+    assert batch_ingest.drain_queue(local_queue) == {'Records': []}
+
+
+def test_batch_writes_once_and_reports_per_file(tmp_path, monkeypatch, aws_credentials, sample_export_data):
+    """Test that a batch dedups across files, commits once and fails only the bad message."""
+    monkeypatch.setenv('ROLLUP_STORE', 'off')
+    connect = create_local_db(str(tmp_path / 'workouts.db'))
+    conn = connect()
+    with conn.cursor() as cursor:
+        cursor.execute("INSERT INTO workout_summary (workout_id) VALUES (%s)", ('7434147697',))
+    conn.commit()
+    get_connection = Mock(side_effect=connect)
+
+    with mock_s3(), patch.object(workout_processor, 'verify_s3_connectivity', return_value=True), \
+            patch.object(workout_processor, 'get_db_connection', get_connection):
+        s3 = boto3.client('s3', region_name='us-east-1')
+        s3.create_bucket(Bucket='upload-bucket')
+        # first.csv and second.csv overlap; bad.csv lacks required columns
+        s3.put_object(Bucket='upload-bucket', Key='first.csv', Body=sample_export_data[:2].to_csv(index=False))
+        s3.put_object(Bucket='upload-bucket', Key='second.csv', Body=sample_export_data.to_csv(index=False))
+        s3.put_object(Bucket='upload-bucket', Key='bad.csv', Body='a,b\n1,2\n')
+        event = {'Records': [_sqs_record('m1', 'first.csv'), _sqs_record('m2', 'second.csv'),
+                             _sqs_record('m3', 'bad.csv')]}
+        response = batch_ingest.batch_handler(event, None)
+
+    body = json.loads(response['body'])
+    assert response['statusCode'] == 207
+    assert response['batchItemFailures'] == [{'itemIdentifier': 'm3'}]
+    assert [(f['file'], f['status'], f.get('new')) for f in body['files']] == [
+        ('first.csv', 'inserted', 1), ('second.csv', 'inserted', 1), ('bad.csv', 'failed', None)]
+    # One connection for the ID fetch and one for the insert, however many files
+    assert get_connection.call_count == 2
+    with connect().cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM workout_summary")
+        assert cursor.fetchone()[0] == 3
@@ -0,0 +1,94 @@
+"""
+test_compression.py
+
+Unit tests for compressed input detection and streaming decompression.
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+
+import io
+import bz2
+import gzip
+from unittest.mock import patch
+
+import boto3
+import pandas as pd
+import pytest
+from moto import mock_s3
+
+from src.compression import codec_from_metadata, decompressed, sniff_codec
+from src.storage import LocalStorageHandler, S3StorageHandler
+import workout_processor
+
+CSV = pd.DataFrame({'workout_id': range(2000), 'activity': 'Run'}).to_csv(index=False).encode()
+
+
+def _compress(codec, data=CSV):
+    if codec == 'gzip':
+        return gzip.compress(data)
+    if codec == 'bz2':
+        return bz2.compress(data)
+    if codec == 'zstd':
+        zstandard = pytest.importorskip('zstandard')
+        return zstandard.ZstdCompressor().compress(data)
+    return data
+
+
+@pytest.mark.parametrize('codec', [None, 'gzip', 'bz2', 'zstd'])
+def test_decompressed_stream(codec):
+    """Test that each codec is detected from its magic bytes and streamed back intact."""
+    blob = _compress(codec)
+    assert sniff_codec(blob[:4]) == codec
+
+    with decompressed(io.BytesIO(blob)) as stream:
+        assert stream.read() == CSV
+
+
+def test_codec_from_metadata():
+    """Test that Content-Encoding wins over Content-Type, and unknown values are ignored."""
+    assert codec_from_metadata('gzip', 'text/csv') == 'gzip'
+    assert codec_from_metadata(None, 'application/x-bzip2') == 'bz2'
+    assert codec_from_metadata('identity', 'text/csv; charset=utf-8') is None
+
+
+def test_mislabelled_input_is_read_by_content(caplog):
+    """Test that a plain object labelled gzip is read as plain CSV."""
+    with decompressed(io.BytesIO(CSV), 'gzip') as stream:
+        assert stream.read() == CSV
+    assert 'labelled gzip' in caplog.text
+
+
+@pytest.mark.parametrize('read_mode', ['buffered', 'mmap'])
+def test_local_handler_reads_compressed_csv(tmp_path, read_mode):
+    """Test that local reads decompress, including in mmap mode."""
+    handler = LocalStorageHandler(str(tmp_path), file_format='csv', read_mode=read_mode)
+    (tmp_path / 'current' / 'upload.csv.gz').write_bytes(gzip.compress(CSV))
+
+    df = handler.read_file('current/upload.csv.gz', columns=['workout_id'])
+    assert df['workout_id'].tolist() == list(range(2000))
+
+
+def test_s3_handler_reads_compressed_csv(aws_credentials):
+    """Test that S3 reads decompress objects uploaded with a Content-Encoding."""
+    with mock_s3():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket='test-bucket')
+        client.put_object(Bucket='test-bucket', Key='current/upload.csv', Body=bz2.compress(CSV),
+                          ContentEncoding='bzip2')
+        df = S3StorageHandler('test-bucket', client=client, file_format='csv').read_file('current/upload.csv')
+
+    assert len(df) == 2000
+
+
+def test_extract_s3_data_from_gzip_upload(aws_credentials, sample_export_data, s3_event):
+    """Test that the handler's extract stage accepts a gzip-compressed export."""
+    with mock_s3(), patch.object(workout_processor, 'verify_s3_connectivity', return_value=True):
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket='test-bucket')
+        client.put_object(Bucket='test-bucket', Key='test.csv',
+                          Body=gzip.compress(sample_export_data.to_csv(index=False).encode()))
+        records = workout_processor.WorkoutProcessor().extract_s3_data(s3_event)
+
+    assert {r['workout_id'] for r in records} == {'7434147697', '7434147698', '7434147699'}
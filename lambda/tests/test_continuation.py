@@ -0,0 +1,129 @@
+"""
+test_continuation.py
+
+Unit tests for chunked commits and timeout continuations.
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+sys.path.append(str(Path(__file__).parent))
+
+import json
+from unittest.mock import Mock, patch
+
+import pandas as pd
+import pytest
+
+from local_db import create_local_db
+import workout_processor
+
+
+class LambdaContext:
+    """Lambda context whose remaining time follows a script, then stays at the last value."""
+
+    invoked_function_arn = 'arn:aws:lambda:us-east-1:123456789012:function:workout-processor'
+    function_name = 'workout-processor'
+    aws_request_id = 'req-1'
+
+    def __init__(self, *remaining):
+        self._remaining = list(remaining)
+
+    def get_remaining_time_in_millis(self):
+        return self._remaining.pop(0) if len(self._remaining) > 1 else self._remaining[0]
+
+
+def _workouts(n):
+    return [{'workout_id': str(i), 'Workout Date': pd.Timestamp('2024-08-01') + pd.Timedelta(days=i),
+             'Activity Type': 'Run', 'Calories Burned (kcal)': 400.0, 'Distance (mi)': 5.0,
+             'Workout Time (seconds)': 1800} for i in range(n)]
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch, aws_credentials):
+    """A SQLite stand-in database, with two-row commit chunks and a one-second margin."""
+    monkeypatch.setenv('ROLLUP_STORE', 'off')
+    monkeypatch.setenv('COMMIT_CHUNK_ROWS', '2')
+    monkeypatch.setenv('CONTINUATION_MARGIN_MS', '1000')
+    connect = create_local_db(str(tmp_path / 'workouts.db'))
+    with patch.object(workout_processor, 'verify_s3_connectivity', return_value=True), \
+            patch.object(workout_processor, 'get_db_connection', side_effect=connect):
+        yield connect
+
+
+def _stored_ids(connect):
+    with connect().cursor() as cursor:
+        cursor.execute("SELECT workout_id FROM workout_summary ORDER BY workout_id")
+        return [row[0] for row in cursor.fetchall()]
+
+
+def test_insert_in_chunks_stops_when_time_runs_low(database):
+    """Test that each chunk commits on its own and no chunk starts inside the margin."""
+    processor = workout_processor.WorkoutProcessor()
+
+    remaining_ms = LambdaContext(60000, 60000, 500).get_remaining_time_in_millis
+    committed, ok = processor.insert_in_chunks(_workouts(5), remaining_ms)
+
+    assert (committed, ok) == (4, True)
+    assert _stored_ids(database) == ['0', '1', '2', '3']
+
+
+def test_timeout_hands_off_to_continuation(database, s3_event):
+    """Test that a continuation resumes at the checkpointed record instead of starting over."""
+    # Record 1 is already stored, so the checkpoint offset is a file position, not a count of new rows
+    conn = database()
+    with conn.cursor() as cursor:
+        cursor.execute("INSERT INTO workout_summary (workout_id) VALUES (%s)", ('1',))
+    conn.commit()
+
+    extract = Mock(return_value=_workouts(6))
+    lambda_client = Mock()
+    with patch.object(workout_processor.WorkoutProcessor, 'extract_s3_data', extract), \
+            patch.object(workout_processor, 'get_lambda_client', return_value=lambda_client):
+        first = workout_processor.handler(s3_event, LambdaContext(60000, 60000, 500))
+        continuation = json.loads(lambda_client.invoke.call_args.kwargs['Payload'])
+        second = workout_processor.handler(continuation, LambdaContext(60000))
+
+    body = json.loads(first['body'])
+    assert first['statusCode'] == 202 and body['continuation_invoked']
+    assert continuation == {'continuation': {'bucket': 'test-bucket', 'key': 'test.csv', 'offset': 5,
+                                             'records': 6, 'attempt': 1}}
+    assert second['statusCode'] == 200
+    assert json.loads(second['body'])['new_workout_ids'] == ['5']
+    assert _stored_ids(database) == ['0', '1', '2', '3', '4', '5']
+
+
+def test_continuation_gives_up_after_max_attempts(database, monkeypatch):
+    """Test that a file making no progress stops hopping after CONTINUATION_MAX_ATTEMPTS."""
+    monkeypatch.setenv('CONTINUATION_MAX_ATTEMPTS', '3')
+    event = {'continuation': {'bucket': 'test-bucket', 'key': 'test.csv', 'offset': 0, 'records': 2, 'attempt': 3}}
+
+    with patch.object(workout_processor.WorkoutProcessor, 'extract_s3_data', Mock(return_value=_workouts(2))), \
+            patch.object(workout_processor, 'get_lambda_client') as get_lambda_client:
+        response = workout_processor.handler(event, LambdaContext(500))
+
+    assert response['statusCode'] == 500
+    get_lambda_client.assert_not_called()
+
+
+def test_failed_chunk_without_spool_is_an_error(database, s3_event):
+    """Test that a chunk failing with the spool off returns 500 and a checkpoint that resumes the file."""
+    real_insert = workout_processor.WorkoutProcessor.insert_new_workouts
+    calls = []
+
+    def flaky_insert(self, workouts):
+        calls.append(len(workouts))
+        return len(calls) != 2 and real_insert(self, workouts)
+
+    extract = Mock(return_value=_workouts(5))
+    with patch.object(workout_processor.WorkoutProcessor, 'extract_s3_data', extract):
+        with patch.object(workout_processor.WorkoutProcessor, 'insert_new_workouts', flaky_insert):
+            failed = workout_processor.handler(s3_event, LambdaContext(60000))
+        body = json.loads(failed['body'])
+        resumed = workout_processor.handler({'continuation': body['checkpoint']}, LambdaContext(60000))
+
+    assert failed['statusCode'] == 500
+    assert body['checkpoint'] == {'bucket': 'test-bucket', 'key': 'test.csv', 'offset': 2, 'records': 5, 'attempt': 0}
+    assert resumed['statusCode'] == 200
+    assert json.loads(resumed['body'])['new_workout_ids'] == ['2', '3', '4']
+    assert _stored_ids(database) == ['0', '1', '2', '3', '4']
@@ -0,0 +1,73 @@
+"""
+test_cpu_profiling.py
+
+Tests for opt-in cProfile capture around the handler.
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+
+import pstats
+import boto3
+from moto import mock_s3
+from src.cpu_profiling import profile_invocation
+
+
+def _busy(n):
+    return sum(i * i for i in range(n))
+
+@profile_invocation
+def sample_handler(event, context):
+    return _busy(event['n'])
+
+
+def test_profile_not_written_when_disabled(monkeypatch, tmp_path, mock_context):
+    """Test that invocations run unprofiled unless CPU_PROFILE is set."""
+    monkeypatch.delenv('CPU_PROFILE', raising=False)
+    monkeypatch.setenv('CPU_PROFILE_OUTPUT', str(tmp_path))
+
+    assert sample_handler({'n': 10}, mock_context) == _busy(10)
+    assert list(tmp_path.iterdir()) == []
+
+def test_profile_written_by_request_id(monkeypatch, tmp_path):
+    """Test that pstats and collapsed-stack files are keyed by request ID."""
+    monkeypatch.setenv('CPU_PROFILE', '1')
+    monkeypatch.setenv('CPU_PROFILE_OUTPUT', str(tmp_path))
+
+    class Context:
+        aws_request_id = 'req-123'
+
+    assert sample_handler({'n': 20000}, Context()) == _busy(20000)
+
+    stats = pstats.Stats(str(tmp_path / 'req-123.prof'))
+    assert any(func[2] == '_busy' for func in stats.stats)
+    folded = (tmp_path / 'req-123.folded').read_text().splitlines()
+    assert any('sample_handler' in line and '_busy' in line for line in folded)
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in folded)
+
+def test_profile_sample_rate_zero(monkeypatch, tmp_path, mock_context):
+    """Test that a zero sample rate profiles nothing."""
+    monkeypatch.setenv('CPU_PROFILE', '1')
+    monkeypatch.setenv('CPU_PROFILE_SAMPLE_RATE', '0')
+    monkeypatch.setenv('CPU_PROFILE_OUTPUT', str(tmp_path))
+
+    sample_handler({'n': 10}, mock_context)
+    assert list(tmp_path.iterdir()) == []
+
+def test_profile_written_to_s3(monkeypatch, aws_credentials):
+    """Test that an s3:// output stores both files under the prefix."""
+    monkeypatch.setenv('CPU_PROFILE', '1')
+    monkeypatch.setenv('CPU_PROFILE_OUTPUT', 's3://profile-bucket/profiles')
+
+    class Context:
+        aws_request_id = 'req-456'
+
+    with mock_s3():
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket='profile-bucket')
+        sample_handler({'n': 100}, Context())
+        keys = [obj['Key'] for obj in s3.list_objects_v2(Bucket='profile-bucket')['Contents']]
+
+    assert any(key.startswith('profiles/') and key.endswith('req-456.prof') for key in keys)
+    assert any(key.endswith('req-456.folded') for key in keys)
@@ -0,0 +1,57 @@
+"""
+test_data_cleaning.py
+
+Tests for the serial and partitioned data cleaning paths.
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+
+import pandas as pd
+from src.data_cleaning import clean_data, clean_data_parallel
+
+
+def test_clean_data_report(sample_export_data):
+    """Test that the cleaning report records why rows were dropped."""
+    report = {}
+    cleaned = clean_data(sample_export_data, report=report)
+
+    assert len(cleaned) == 3
+    assert report['initial_rows'] == 5
+    assert report['rows_dropped_zero_time'] == 1
+    assert report['rows_dropped_invalid_date'] == 1
+    assert report['final_rows'] == 3
+
+def test_parallel_matches_serial(sample_export_data):
+    """Test that partitioned cleaning returns the same rows and counts as the serial path."""
+    df = pd.concat([sample_export_data] * 40, ignore_index=True)
+
+    serial_report, parallel_report = {}, {}
+    serial = clean_data(df, report=serial_report)
+    parallel = clean_data_parallel(df, workers=4, min_rows_per_partition=10, report=parallel_report)
+
+    pd.testing.assert_frame_equal(serial, parallel)
+    assert parallel_report == serial_report
+
+def test_parallel_small_input_falls_back_to_serial(sample_export_data):
+    """Test that inputs smaller than two partitions are cleaned serially."""
+    report = {}
+    cleaned = clean_data_parallel(sample_export_data, workers=4, report=report)
+
+    assert len(cleaned) == 3
+    assert report['final_rows'] == 3
+
+def test_parallel_matches_serial_with_all_invalid_partition(sample_export_data):
+    """Test that a partition whose dates are all invalid is dropped the same way as in the serial path."""
+    # 40 rows with valid dates and workout times, the last 10 (the whole last partition) with invalid dates
+    df = pd.concat([sample_export_data[:3]] * 14, ignore_index=True)[:40]
+    df.loc[30:, 'Workout Date'] = 'not a date'
+
+    serial_report, parallel_report = {}, {}
+    serial = clean_data(df, report=serial_report)
+    parallel = clean_data_parallel(df, workers=4, min_rows_per_partition=10, report=parallel_report)
+
+    assert len(serial) == 30 and serial_report['rows_dropped_invalid_date'] == 10
+    pd.testing.assert_frame_equal(serial, parallel)
+    assert parallel_report == serial_report
@@ -0,0 +1,145 @@
+"""
+test_db_pool.py
+
+Unit tests for the process-wide connection pool and credentials cache.
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+
+import os
+from unittest.mock import Mock, patch
+
+import pymysql
+import pytest
+
+from src.db_pool import ConnectionPool, CredentialsCache
+import db_pool
+import workout_processor
+
+CREDENTIALS = {'host': 'db', 'username': 'u', 'password': 'p', 'database': 'd', 'port': 3306}
+
+
+class FakeConnection:
+    """Stand-in for a pymysql connection."""
+
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+        self.server_status = 0
+
+    def ping(self, reconnect=False):
+        if not self.alive:
+            raise pymysql.err.OperationalError(2006, 'MySQL server has gone away')
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def connect():
+    """A connect() mock that hands out FakeConnections."""
+    return Mock(side_effect=lambda **kwargs: FakeConnection())
+
+
+def make_pool(connect, loader=None, **kwargs):
+    return ConnectionPool(CredentialsCache(loader or Mock(return_value=CREDENTIALS)), connect=connect, **kwargs)
+
+
+def test_warm_checkout_reuses_connection(connect):
+    """Test that a released connection is reused without a new handshake or credentials lookup."""
+    loader = Mock(return_value=CREDENTIALS)
+    pool = make_pool(connect, loader)
+
+    first = pool.acquire()
+    first.close()
+    second = pool.acquire()
+    second.close()
+    second.close()  # a second close is a no-op
+
+    assert second.raw is first.raw
+    assert connect.call_count == 1
+    assert loader.call_count == 1
+    assert pool.stats['reuses'] == 1
+
+
+def test_dead_or_expired_connections_are_replaced(connect):
+    """Test that a failed pre-ping or an exceeded lifetime opens a new connection."""
+    pool = make_pool(connect, ping_interval=0, max_lifetime=3600)
+    conn = pool.acquire()
+    conn.raw.alive = False
+    conn.close()
+
+    replacement = pool.acquire()
+    assert replacement.raw is not conn.raw and conn.raw.closed
+    replacement.close()
+
+    pool.max_lifetime = 0
+    assert pool.acquire().raw is not replacement.raw
+    assert connect.call_count == 3
+
+
+def test_auth_failure_refreshes_credentials():
+    """Test that rejected credentials are reloaded once, e.g. after a rotation."""
+    loader = Mock(side_effect=[dict(CREDENTIALS, password='old'), dict(CREDENTIALS, password='new')])
+
+    def connect(**kwargs):
+        if kwargs['password'] == 'old':
+            raise pymysql.err.OperationalError(1045, 'Access denied')
+        return FakeConnection()
+
+    pool = make_pool(connect, loader)
+    assert isinstance(pool.acquire().raw, FakeConnection)
+    assert loader.call_count == 2
+
+
+def test_credentials_cache_ttl():
+    """Test that credentials are reloaded after the TTL expires."""
+    loader = Mock(return_value=CREDENTIALS)
+    cache = CredentialsCache(loader, ttl=60)
+
+    with patch('src.db_pool.time.monotonic', side_effect=[100.0, 100.0, 130.0, 170.0, 170.0]):
+        cache.get()
+        cache.get()
+        cache.get()
+
+    assert loader.call_count == 2
+
+
+def test_run_retries_on_operational_error(connect):
+    """Test that run() retries a dropped operation on a fresh connection."""
+    pool = make_pool(connect)
+    operation = Mock(side_effect=[pymysql.err.OperationalError(2013, 'Lost connection'), 'ok'])
+
+    assert pool.run(operation) == 'ok'
+    first_conn, second_conn = (call.args[0] for call in operation.call_args_list)
+    assert first_conn.raw.closed and first_conn.raw is not second_conn.raw
+
+
+def test_pool_size_is_bounded(connect):
+    """Test that checkouts beyond the pool size time out."""
+    pool = make_pool(connect, size=1)
+    pool.acquire()
+
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.01)
+
+
+def test_handler_connections_come_from_process_pool(connect):
+    """Test that the handler's get_db_connection reuses one pool across invocations."""
+    # workout_processor imports db_pool flat, so its registry lives in that module
+    db_pool.reset_pools()
+    env = {'DB_HOST': 'db', 'DB_USERNAME': 'u', 'DB_PASSWORD': 'p', 'DB_NAME': 'd'}
+    try:
+        with patch.dict(os.environ, env), patch('pymysql.connect', connect):
+            for _ in range(3):
+                conn = workout_processor.get_db_connection()
+                conn.close()
+        assert connect.call_count == 1
+        assert db_pool.get_pool('env', None).stats['reuses'] == 2
+    finally:
+        db_pool.reset_pools()
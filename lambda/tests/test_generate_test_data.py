@@ -0,0 +1,89 @@
+"""
+test_generate_test_data.py
+
+Unit tests for the synthetic export generator.
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+sys.path.append(str(Path(__file__).parent.parent / 'scripts'))
+
+import argparse
+import gzip
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from generate_test_data import EXPORT_COLUMNS, generate_chunk, parse_size, write_export
+
+
+def test_same_seed_same_output(tmp_path):
+    """Test that a seed reproduces the file byte for byte and another seed doesn't."""
+    paths = [tmp_path / name for name in ('a.csv', 'b.csv', 'c.csv')]
+    write_export(str(paths[0]), rows=2500, chunk_size=1000, seed=7)
+    write_export(str(paths[1]), rows=2500, chunk_size=1000, seed=7)
+    write_export(str(paths[2]), rows=2500, chunk_size=1000, seed=8)
+
+    assert paths[0].read_bytes() == paths[1].read_bytes()
+    assert paths[0].read_bytes() != paths[2].read_bytes()
+
+
+@pytest.mark.parametrize('size, expected', [
+    ('100', 100), ('100B', 100), ('4k', 4096), ('1.5KB', 1536), ('500MB', 500 * 1024 ** 2), ('2GB', 2 * 1024 ** 3),
+])
+def test_parse_size(size, expected):
+    """Test that sizes with and without units parse to bytes."""
+    assert parse_size(size) == expected
+
+
+@pytest.mark.parametrize('size', ['', 'MB', '2TB', '-1GB', 'ten'])
+def test_parse_size_rejects_invalid(size):
+    """Test that malformed sizes raise an argparse error."""
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_size(size)
+
+
+def test_gzip_output(tmp_path):
+    """Test that a .gz path is gzip-compressed, has one header and all rows."""
+    path = tmp_path / 'history.csv.gz'
+    written = write_export(str(path), rows=2500, chunk_size=1000)
+
+    assert path.read_bytes()[:2] == b'\x1f\x8b'
+    with gzip.open(path, 'rt') as f:
+        df = pd.read_csv(f)
+    assert written == len(df) == 2500
+    assert list(df.columns) == EXPORT_COLUMNS
+    assert df['Link'].str.extract(r'/workout/(\d+)')[0].dropna().is_unique
+
+
+def test_target_size_stops_at_compressed_size(tmp_path):
+    """Test that target_size is measured on the compressed file."""
+    path = tmp_path / 'history.csv.gz'
+    written = write_export(str(path), target_size=50 * 1024, chunk_size=500)
+
+    assert path.stat().st_size >= 50 * 1024
+    assert written % 500 == 0
+
+
+def test_invalid_date_and_link_rates():
+    """Test that invalid dates and links appear at roughly the requested rates."""
+    rows = 20000
+    chunk = generate_chunk(np.random.default_rng(1), 0, rows, '2015-01-01',
+                           invalid_date_rate=0.1, invalid_link_rate=0.05)
+
+    invalid_dates = (chunk['Workout Date'] == 'not recorded').mean()
+    invalid_links = ~chunk['Link'].str.contains(r'/workout/\d+$')
+    assert invalid_dates == pytest.approx(0.1, abs=0.01)
+    assert invalid_links.mean() == pytest.approx(0.05, abs=0.01)
+
+
+def test_zero_rates_give_clean_rows():
+    """Test that zero rates produce no invalid dates, links or zero workout times."""
+    chunk = generate_chunk(np.random.default_rng(1), 0, 5000, '2015-01-01',
+                           zero_time_rate=0, invalid_date_rate=0, invalid_link_rate=0)
+
+    assert not (chunk['Workout Date'] == 'not recorded').any()
+    assert chunk['Link'].str.contains(r'/workout/\d+$').all()
+    assert (chunk['Workout Time (seconds)'] > 0).all()
@@ -0,0 +1,23 @@
+"""
+test_load_harness.py
+
+Smoke test for the concurrent end-to-end load harness.
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+from load_harness import run_load_test
+
+
+def test_load_harness_reports_throughput_and_stages(tmp_path):
+    """Test a small concurrent run end to end, including repeat uploads of the same file."""
+    report = run_load_test(events=6, workers=3, rows_per_file=200, distinct_files=3,
+                           db_path=str(tmp_path / 'load.db'))
+
+    assert report['failures'] == []
+    assert report['files_per_second'] > 0
+    assert report['rows_per_second'] > 0
+    for stage in ('total', 'init', 'fetch_ids', 'extract', 'extract/read_csv', 'dedup', 'notify'):
+        assert set(report['stages_ms'][stage]) == {'p50', 'p95', 'p99', 'mean'}
@@ -0,0 +1,52 @@
+"""
+test_memory_profiling.py
+
+Tests for per-stage peak memory profiling.
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+
+from src.memory_profiling import MemoryProfiler
+from src.stage_timing import StageTimer
+
+
+def test_nested_stage_peaks():
+    """Test that a parent stage's peak includes allocations made by its children."""
+    profiler = MemoryProfiler()
+    timer = StageTimer(memory=profiler)
+    profiler.start()
+    try:
+        with timer.stage('extract'):
+            with timer.stage('read_csv'):
+                data = bytearray(8 * 1024 * 1024)
+                del data
+            with timer.stage('clean'):
+                small = bytearray(1024 * 1024)
+                del small
+    finally:
+        profiler.stop()
+
+    # Memory freed during a stage (e.g. by a coverage tracer) lowers its peak by a few hundred bytes
+    slack = 64 * 1024
+    summary = profiler.summary(input_bytes=1024 * 1024)
+    assert summary['read_csv']['peak_alloc_bytes'] >= 8 * 1024 * 1024 - slack
+    assert summary['clean']['peak_alloc_bytes'] < 8 * 1024 * 1024
+    assert summary['extract']['peak_alloc_bytes'] >= summary['read_csv']['peak_alloc_bytes']
+    assert summary['read_csv']['alloc_per_input_byte'] >= 7.9
+    assert summary['extract']['rss_bytes'] > 0
+
+def test_profiler_records_nested_stages_without_detail():
+    """Test that attaching a profiler records nested stages even when STAGE_TIMING is off."""
+    profiler = MemoryProfiler()
+    timer = StageTimer(detailed=False, memory=profiler)
+    profiler.start()
+    try:
+        with timer.stage('extract'):
+            with timer.stage('read_csv'):
+                pass
+    finally:
+        profiler.stop()
+
+    assert set(profiler.summary()) == {'extract', 'read_csv'}
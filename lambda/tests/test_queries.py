@@ -0,0 +1,165 @@
+"""
+test_queries.py
+
+Unit tests for the read-side query API and its versioned result cache.
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+
+import os
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from src.queries import QueryCache, WorkoutQueries
+from src.storage import LocalStorageHandler
+from src.structured_logging import InvocationMetrics
+import workout_processor
+
+
+def _workouts(ids, dates, activities):
+    return pd.DataFrame({
+        'workout_id': ids,
+        'Workout Date': pd.to_datetime(dates),
+        'Activity Type': activities,
+        'Calories Burned (kcal)': [100.0] * len(ids),
+        'Distance (mi)': [2.0] * len(ids),
+        'Workout Time (seconds)': [600] * len(ids),
+    })
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """Local storage holding two months of workouts."""
+    handler = LocalStorageHandler(str(tmp_path), file_format='csv')
+    handler.write_partitioned('workouts', _workouts(
+        ['1', '2', '3', '4'],
+        ['2024-07-10', '2024-07-20', '2024-08-02', '2024-08-03'],
+        ['Run', 'Walk', 'Run', 'Run']), key_columns=['workout_id'])
+    handler.bump_ingestion_version()
+    return handler
+
+
+def test_totals_by_activity(storage):
+    """Test per-activity totals over a date range."""
+    queries = WorkoutQueries(storage, cache=QueryCache())
+
+    totals = queries.totals_by_activity('2024-07-15', '2024-09-01')
+
+    assert totals.to_dict('records') == [
+        {'activity_type': 'Run', 'workouts': 2, 'kcal_burned': 200.0, 'distance_mi': 4.0, 'duration_sec': 1200},
+        {'activity_type': 'Walk', 'workouts': 1, 'kcal_burned': 100.0, 'distance_mi': 2.0, 'duration_sec': 600},
+    ]
+
+
+def test_last_workouts_reads_newest_partitions_only(storage):
+    """Test that last_workouts stops once the newest months hold enough rows."""
+    queries = WorkoutQueries(storage, cache=QueryCache())
+
+    with patch.object(storage, 'read_file', wraps=storage.read_file) as read_file:
+        latest = queries.last_workouts(2)
+
+    assert list(latest['workout_id'].astype(str)) == ['4', '3']
+    assert read_file.call_count == 1
+
+
+def test_last_workouts_reads_every_part_of_a_month(tmp_path):
+    """Test that a later-written part holding older dates doesn't hide a newer workout in the same month."""
+    storage = LocalStorageHandler(str(tmp_path), file_format='csv')
+    storage.write_partitioned('workouts', _workouts(['30'], ['2024-08-30'], ['Run']), key_columns=['workout_id'])
+    storage.write_partitioned('workouts', _workouts(['1', '2', '3', '4', '5'],
+                                                    [f'2024-08-0{d}' for d in range(1, 6)], ['Walk'] * 5),
+                              key_columns=['workout_id'])
+    storage.write_partitioned('workouts', _workouts(['0'], ['2024-07-01'], ['Run']), key_columns=['workout_id'])
+    storage.bump_ingestion_version()
+    queries = WorkoutQueries(storage, cache=QueryCache())
+
+    with patch.object(storage, 'read_file', wraps=storage.read_file) as read_file:
+        latest = queries.last_workouts(3)
+
+    assert list(latest['workout_id'].astype(str)) == ['30', '5', '4']
+    # Both August parts, but not July
+    assert read_file.call_count == 2
+
+
+def test_cache_reused_until_ingestion_version_changes(storage):
+    """Test that cached results are served until the ingestion version is bumped."""
+    cache = QueryCache()
+    queries = WorkoutQueries(storage, cache=cache)
+
+    first = queries.totals_by_activity()
+    first.loc[0, 'workouts'] = -1  # callers can't corrupt the cache
+    again = queries.totals_by_activity()
+    assert cache.hits == 1 and again.loc[0, 'workouts'] == 3
+
+    storage.write_partitioned('workouts', _workouts(['5'], ['2024-08-04'], ['Run']), key_columns=['workout_id'])
+    assert queries.totals_by_activity().loc[0, 'workouts'] == 3  # not yet announced
+
+    assert storage.bump_ingestion_version() == '2'
+    assert queries.totals_by_activity().loc[0, 'workouts'] == 4
+    assert cache.misses == 2
+
+
+def test_cache_is_bounded():
+    """Test LRU eviction."""
+    cache = QueryCache(max_entries=2)
+    for key in ('a', 'b', 'a', 'c'):
+        cache.get_or_compute(key, lambda: key)
+
+    cache.get_or_compute('a', lambda: 'recomputed')
+    cache.get_or_compute('b', lambda: 'recomputed')
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_handler_publish_bumps_version(tmp_path):
+    """Test that publishing inserted workouts makes them visible to queries."""
+    env = {'STORAGE_TYPE': 'local', 'LOCAL_STORAGE_PATH': str(tmp_path), 'STORAGE_FORMAT': 'csv'}
+    with patch.dict(os.environ, env):
+        storage = LocalStorageHandler(str(tmp_path))
+        queries = WorkoutQueries(storage, cache=QueryCache())
+        assert queries.last_workouts(5).empty
+
+        records = _workouts(['9'], ['2024-08-05'], ['Swim']).to_dict('records')
+        assert workout_processor.publish_new_workouts(records) == '1'
+
+        assert list(queries.last_workouts(5)['Activity Type']) == ['Swim']
+
+
+def test_publish_is_skipped_without_storage():
+    """Test that publishing is a no-op when no storage backend is configured."""
+    with patch.dict(os.environ, {}, clear=False):
+        os.environ.pop('STORAGE_TYPE', None)
+        assert workout_processor.publish_new_workouts([{'workout_id': '1'}]) is None
+
+
+def test_queries_reject_rds_storage():
+    """Test that an RDS handler is refused, since its tables aren't partitioned datasets."""
+    from src.storage import RDSStorageHandler
+
+    with pytest.raises(ValueError, match="can't hold the workout dataset"):
+        WorkoutQueries(RDSStorageHandler(), cache=QueryCache())
+
+
+def test_queries_count_republished_workouts_once(storage):
+    """Test that a workout appended again in a later part is counted and listed once."""
+    storage.write_partitioned('workouts', _workouts(['4'], ['2024-08-03'], ['Run']), key_columns=['workout_id'])
+    storage.bump_ingestion_version()
+    queries = WorkoutQueries(storage, cache=QueryCache())
+
+    totals = queries.totals_by_activity()
+    assert totals.set_index('activity_type')['workouts'].to_dict() == {'Run': 3, 'Walk': 1}
+    assert list(queries.last_workouts(3)['workout_id'].astype(str)) == ['4', '3', '2']
+
+
+def test_publish_failure_is_counted(tmp_path):
+    """Test that a failed publish is logged and recorded as a metric instead of raised."""
+    metrics = InvocationMetrics()
+    with patch.dict(os.environ, {'STORAGE_TYPE': 'local', 'LOCAL_STORAGE_PATH': str(tmp_path)}), \
+            patch.object(LocalStorageHandler, 'write_partitioned', side_effect=OSError('disk full')):
+        assert workout_processor.publish_new_workouts([{'workout_id': '1'}], metrics) is None
+        assert workout_processor.publish_new_workouts([{'workout_id': '2'}], metrics) is None
+
+    assert metrics.metrics['PublishFailures'] == 2
@@ -0,0 +1,64 @@
+"""
+test_recommend_memory.py
+
+Unit tests for the Lambda memory size recommender.
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+sys.path.append(str(Path(__file__).parent.parent / 'scripts'))
+
+import pytest
+
+from recommend_memory import MB, MEMORY_TIERS_MB, recommend, recommend_tier
+
+
+def _profile(name, peak_rss_mb, baseline_rss_mb=100, alloc_per_input_byte=5.0):
+    return {'file': name, 'input_bytes': 10 * MB, 'rows': 1000,
+            'baseline_rss_bytes': baseline_rss_mb * MB, 'peak_rss_bytes': peak_rss_mb * MB,
+            'stages': {'extract': {'peak_alloc_bytes': 0, 'rss_bytes': 0,
+                                   'alloc_per_input_byte': alloc_per_input_byte}}}
+
+
+@pytest.mark.parametrize('required_mb, tier', [
+    (1, 128), (128, 128), (128.1, 256), (1000, 1024), (1700, 1769), (10240, 10240),
+])
+def test_recommend_tier_picks_smallest_that_fits(required_mb, tier):
+    """Test that the smallest tier at or above the requirement is chosen."""
+    assert recommend_tier(required_mb) == tier
+
+
+def test_recommend_tier_none_above_largest():
+    """Test that a requirement above every tier has no recommendation."""
+    assert recommend_tier(MEMORY_TIERS_MB[-1] + 1) is None
+
+
+def test_recommend_uses_worst_file_with_headroom():
+    """Test that the worst file's peak RSS times the headroom picks the tier."""
+    result = recommend([_profile('small.csv', 200), _profile('large.csv', 400)], headroom=1.5)
+
+    assert result['worst_file'] == 'large.csv'
+    assert result['required_mb'] == 600
+    assert result['recommended_memory_mb'] == 768
+    assert result['vcpu_share'] == round(768 / 1769, 2)
+
+
+def test_recommend_projects_target_input_size():
+    """Test that a larger target input raises the tier past the observed peak."""
+    profiles = [_profile('a.csv', 200, baseline_rss_mb=100, alloc_per_input_byte=4.0)]
+
+    result = recommend(profiles, headroom=1.5, target_input_bytes=200 * MB)
+
+    # 100 MB baseline + 4 bytes per input byte * 200 MB, with 1.5x headroom
+    assert result['projected_peak_mb'] == 900
+    assert result['required_mb'] == 1350
+    assert result['recommended_memory_mb'] == 1536
+
+
+def test_recommend_nothing_fits():
+    """Test that a requirement beyond the largest tier recommends nothing."""
+    result = recommend([_profile('huge.csv', 8000)], headroom=1.5)
+
+    assert result['recommended_memory_mb'] is None
+    assert result['vcpu_share'] is None
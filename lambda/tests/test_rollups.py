@@ -0,0 +1,139 @@
+"""
+test_rollups.py
+
+Unit tests for incrementally maintained workout rollups.
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+sys.path.append(str(Path(__file__).parent.parent / 'scripts'))
+sys.path.append(str(Path(__file__).parent))
+
+import os
+import sqlite3
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from src.rollups import LocalRollupStore, SQLRollupStore, compute_rollup_deltas, get_rollup_store
+from local_db import create_local_db
+from migrate_rollups import main as migrate
+import workout_processor
+
+
+def _workout(workout_id, date, activity, kcal, miles, seconds):
+    return {'workout_id': workout_id, 'Workout Date': pd.Timestamp(date), 'Activity Type': activity,
+            'Calories Burned (kcal)': kcal, 'Distance (mi)': miles, 'Workout Time (seconds)': seconds}
+
+
+@pytest.fixture
+def workouts():
+    """Workouts spanning a week and a month boundary (2024-07-29 is a Monday)."""
+    return [
+        _workout('1', '2024-07-28 07:00', 'Run', 400.0, 5.0, 1800),
+        _workout('2', '2024-07-29 07:00', 'Run', 420.0, 5.2, 1850),
+        _workout('3', '2024-08-01 18:00', 'Run', 380.0, 4.8, 1750),
+        _workout('4', '2024-08-01 19:00', 'Bike Ride', 300.0, 10.5, 2700),
+    ]
+
+
+def test_compute_rollup_deltas(workouts):
+    """Test that deltas are grouped by period start and activity."""
+    deltas = {(g, start, activity): rest for g, start, activity, *rest in compute_rollup_deltas(workouts)}
+
+    assert deltas[('day', '2024-08-01', 'Run')] == [1, 380.0, 4.8, 1750.0]
+    assert deltas[('week', '2024-07-22', 'Run')] == [1, 400.0, 5.0, 1800.0]
+    assert deltas[('week', '2024-07-29', 'Run')] == [2, 800.0, 10.0, 3600.0]
+    assert deltas[('month', '2024-07-01', 'Run')][0] == 2
+    assert deltas[('month', '2024-08-01', 'Bike Ride')] == [1, 300.0, 10.5, 2700.0]
+    assert compute_rollup_deltas([]) == []
+
+
+def test_sql_store_accumulates_and_rebuilds(tmp_path, workouts):
+    """Test that upserts add to existing rows and match a full rebuild."""
+    connect = create_local_db(str(tmp_path / 'rollups.db'))
+    store = SQLRollupStore()
+    conn = connect()
+    with conn.cursor() as cursor:
+        for w in workouts:
+            cursor.execute("INSERT INTO workout_summary VALUES (%s, %s, %s, %s, %s, %s)",
+                           tuple(w.values()))
+        store.apply(compute_rollup_deltas(workouts[:2]), conn, cursor)
+        store.apply(compute_rollup_deltas(workouts[2:]), conn, cursor)
+    conn.commit()
+
+    incremental = store.query(conn, 'week')
+    assert [r['workout_count'] for r in incremental] == [1, 1, 2]
+    assert store.query(conn, 'month', start='2024-08-01', activity_type='Run')[0]['kcal_burned'] == 380.0
+
+    store.rebuild(conn)
+    assert store.query(conn, 'week') == incremental
+
+
+def test_local_store(tmp_path, workouts):
+    """Test the JSON stand-in store."""
+    store = LocalRollupStore(str(tmp_path / 'rollups.json'))
+    store.apply(compute_rollup_deltas(workouts[:3]))
+    store.apply(compute_rollup_deltas(workouts[3:]))
+
+    months = store.query(None, 'month', start='2024-08-01', end='2024-09-01')
+    assert [(r['activity_type'], r['workout_count']) for r in months] == [('Bike Ride', 1), ('Run', 1)]
+
+
+def test_insert_updates_rollups_in_same_transaction(tmp_path, workouts, aws_credentials):
+    """Test that insert_new_workouts maintains rollups from only the new rows."""
+    connect = create_local_db(str(tmp_path / 'ingest.db'))
+    with patch.dict(os.environ, {'ROLLUP_STORE': 'db'}), \
+            patch.object(workout_processor, 'verify_s3_connectivity', return_value=True), \
+            patch.object(workout_processor, 'get_db_connection', side_effect=connect):
+        processor = workout_processor.WorkoutProcessor()
+        assert processor.insert_new_workouts(workouts[:2])
+        assert processor.insert_new_workouts(workouts[2:])
+        # A failing insert must leave the rollups untouched
+        assert not processor.insert_new_workouts(workouts[:1])
+
+    rows = SQLRollupStore().query(connect(), 'month', activity_type='Run')
+    assert [(r['period_start'], r['workout_count']) for r in rows] == [('2024-07-01', 2), ('2024-08-01', 1)]
+
+
+def _without_ddl(connect):
+    """Connections whose user, like the Lambda's, can't create tables"""
+    def deny_ddl(action, *args):
+        return sqlite3.SQLITE_DENY if action == sqlite3.SQLITE_CREATE_TABLE else sqlite3.SQLITE_OK
+
+    def connection():
+        conn = connect()
+        conn._conn.set_authorizer(deny_ddl)
+        return conn
+    return connection
+
+
+def test_rollups_off_by_default(monkeypatch):
+    """Test that rollups need ROLLUP_STORE to be set."""
+    monkeypatch.delenv('ROLLUP_STORE', raising=False)
+    assert get_rollup_store() is None
+
+
+def test_insert_needs_no_ddl_privilege(tmp_path, workouts, aws_credentials, capsys):
+    """Test that the migration creates and fills the table, and inserts only upsert into it."""
+    path = str(tmp_path / 'ingest.db')
+    connect = create_local_db(path)
+    conn = connect()
+    with conn.cursor() as cursor:
+        cursor.execute("DROP TABLE workout_rollup")
+        cursor.execute("INSERT INTO workout_summary VALUES (%s, %s, %s, %s, %s, %s)", tuple(workouts[0].values()))
+    conn.commit()
+
+    with patch.object(workout_processor, 'get_db_connection', side_effect=connect):
+        assert migrate(['--rebuild']) == 0
+    assert '"rollup_rows": 3' in capsys.readouterr().out
+
+    with patch.dict(os.environ, {'ROLLUP_STORE': 'db'}), \
+            patch.object(workout_processor, 'verify_s3_connectivity', return_value=True), \
+            patch.object(workout_processor, 'get_db_connection', side_effect=_without_ddl(connect)):
+        assert workout_processor.WorkoutProcessor().insert_new_workouts(workouts[1:])
+
+    rows = SQLRollupStore().query(connect(), 'month', activity_type='Run')
+    assert [(r['period_start'], r['workout_count']) for r in rows] == [('2024-07-01', 2), ('2024-08-01', 1)]
@@ -0,0 +1,114 @@
+"""
+test_spool.py
+
+Unit tests for the write-ahead spool used when the database is unavailable.
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+sys.path.append(str(Path(__file__).parent))
+
+import json
+import math
+from unittest.mock import Mock, patch
+
+import pandas as pd
+import pytest
+
+from spool import DatabaseUnavailable, WorkoutSpool
+from local_db import create_local_db
+import workout_processor
+
+
+def _workout(workout_id, date):
+    return {'workout_id': workout_id, 'Workout Date': pd.Timestamp(date), 'Activity Type': 'Run',
+            'Calories Burned (kcal)': 400.0, 'Distance (mi)': 5.0, 'Workout Time (seconds)': 1800,
+            'Avg Pace (min/mi)': float('nan')}
+
+
+@pytest.fixture
+def spool(tmp_path):
+    return WorkoutSpool(str(tmp_path / 'spool.db'), max_attempts=2)
+
+
+def test_batches_roundtrip(spool):
+    """Test that spooled records come back with their timestamps and missing values."""
+    batch_id = spool.append([_workout('1', '2024-08-01 07:00'), _workout('2', '2024-08-02')], source='a.csv')
+
+    records = spool.load(batch_id)
+    assert records[0]['Workout Date'] == pd.Timestamp('2024-08-01 07:00')
+    assert math.isnan(records[1]['Avg Pace (min/mi)'])
+    assert [(b['source'], b['row_count']) for b in spool.pending()] == [('a.csv', 2)]
+
+
+def test_flush_stops_at_first_failure_and_sets_aside_bad_batches(spool):
+    """Test that a failing batch blocks the flush until it exhausts its attempts."""
+    first = spool.append([_workout('1', '2024-08-01')], source='bad.csv')
+    spool.append([_workout('2', '2024-08-02')], source='good.csv')
+    write = Mock(side_effect=lambda batch, records: batch['batch_id'] != first)
+
+    assert spool.flush(write) == {'batches': 0, 'rows': 0, 'remaining': 2, 'set_aside': 0}
+    # The second failure sets the bad batch aside, so the next flush writes the good one
+    assert spool.flush(write)['remaining'] == 1
+    assert spool.flush(write) == {'batches': 1, 'rows': 1, 'remaining': 0, 'set_aside': 1}
+    assert [b['source'] for b in spool.set_aside()] == ['bad.csv']
+
+
+def test_unavailable_database_does_not_count_attempts(spool):
+    """Test that flushes during an outage leave the batch's attempt count alone."""
+    spool.append([_workout('1', '2024-08-01')], source='a.csv')
+
+    for _ in range(5):
+        assert spool.flush(Mock(side_effect=DatabaseUnavailable("down"))) == {
+            'batches': 0, 'rows': 0, 'remaining': 1, 'set_aside': 0}
+
+    assert spool.pending()[0]['attempts'] == 0
+
+
+def test_retry_is_answered_from_spool(tmp_path, monkeypatch, aws_credentials, s3_event):
+    """Test that rows spooled during an outage are inserted by the retry without re-reading the file."""
+    monkeypatch.setenv('WRITE_SPOOL', '1')
+    monkeypatch.setenv('SPOOL_PATH', str(tmp_path / 'spool.db'))
+    monkeypatch.setenv('ROLLUP_STORE', 'off')
+    connect = create_local_db(str(tmp_path / 'workouts.db'))
+    extract = Mock(return_value=[_workout('1', '2024-08-01'), _workout('2', '2024-08-02')])
+
+    with patch.object(workout_processor, 'verify_s3_connectivity', return_value=True), \
+            patch.object(workout_processor.WorkoutProcessor, 'extract_s3_data', extract):
+        with patch.object(workout_processor, 'get_db_connection', return_value=None):
+            outage = workout_processor.handler(s3_event, None)
+        with patch.object(workout_processor, 'get_db_connection', side_effect=connect):
+            retry = workout_processor.handler(s3_event, None)
+
+    assert outage['statusCode'] == 202
+    assert retry['statusCode'] == 200 and 'Flushed 2' in json.loads(retry['body'])['message']
+    assert extract.call_count == 1
+    with connect().cursor() as cursor:
+        cursor.execute("SELECT workout_id FROM workout_summary ORDER BY workout_id")
+        assert [row[0] for row in cursor.fetchall()] == ['1', '2']
+
+
+def test_outage_invocations_keep_spooled_batch(tmp_path, monkeypatch, aws_credentials, s3_event):
+    """Test that invocations during a long outage don't exhaust a spooled batch's attempts."""
+    monkeypatch.setenv('WRITE_SPOOL', '1')
+    monkeypatch.setenv('SPOOL_PATH', str(tmp_path / 'spool.db'))
+    monkeypatch.setenv('SPOOL_MAX_ATTEMPTS', '2')
+    monkeypatch.setenv('ROLLUP_STORE', 'off')
+    connect = create_local_db(str(tmp_path / 'workouts.db'))
+    extract = Mock(return_value=[_workout('1', '2024-08-01'), _workout('2', '2024-08-02')])
+
+    with patch.object(workout_processor, 'verify_s3_connectivity', return_value=True), \
+            patch.object(workout_processor.WorkoutProcessor, 'extract_s3_data', extract):
+        with patch.object(workout_processor, 'get_db_connection', return_value=None):
+            responses = [workout_processor.handler(s3_event, None) for _ in range(4)]
+            drained = workout_processor.handler({'action': 'flush_spool'}, None)
+        with patch.object(workout_processor, 'get_db_connection', side_effect=connect):
+            recovered = workout_processor.handler({'action': 'flush_spool'}, None)
+
+    assert [r['statusCode'] for r in responses] == [202, 503, 503, 503]
+    assert json.loads(drained['body'])['remaining'] == 1
+    assert json.loads(recovered['body'])['rows'] == 2
+    with connect().cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM workout_summary")
+        assert cursor.fetchone()[0] == 2
@@ -0,0 +1,49 @@
+"""
+test_stage_timing.py
+
+Tests for the per-invocation stage timing tree.
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+
+from src.stage_timing import StageTimer, stage_timing_enabled
+
+
+def test_disabled_timer_only_records_top_level():
+    """Test that nested stages are free no-ops when detailed timing is off."""
+    timer = StageTimer()
+    with timer.stage('extract'):
+        nested = timer.stage('s3_get')
+        with nested:
+            pass
+        # The same shared no-op is handed out every time
+        assert timer.stage('read_csv') is nested
+
+    assert [node['name'] for node in timer.to_dict()] == ['extract']
+    assert 'children' not in timer.to_dict()[0]
+    assert set(timer.durations()) == {'extract'}
+
+def test_detailed_timer_builds_tree():
+    """Test that nested stages and their attributes are recorded in order."""
+    timer = StageTimer(detailed=True)
+    with timer.stage('insert'):
+        for offset in (0, 2):
+            with timer.stage('insert_batch', offset=offset, rows=2):
+                pass
+    with timer.stage('notify'):
+        pass
+
+    tree = timer.to_dict()
+    assert [node['name'] for node in tree] == ['insert', 'notify']
+    batches = tree[0]['children']
+    assert [batch['offset'] for batch in batches] == [0, 2]
+    assert all(batch['rows'] == 2 and batch['ms'] >= 0 for batch in batches)
+
+def test_stage_timing_enabled(monkeypatch):
+    """Test the STAGE_TIMING environment switch."""
+    monkeypatch.delenv('STAGE_TIMING', raising=False)
+    assert not stage_timing_enabled()
+    monkeypatch.setenv('STAGE_TIMING', 'true')
+    assert stage_timing_enabled()
@@ -11,16 +11,24 @@ sys.path.append(str(Path(__file__).parent.parent / 'src'))
 import pytest
 import pandas as pd
 import os
+import re
 import shutil
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import Mock, patch
-from botocore.exceptions import ClientError
+import boto3
+from boto3.s3.transfer import TransferConfig
+from moto import mock_s3
+import src.storage as storage_module
 
 from src.storage import (
     StorageHandler,
     LocalStorageHandler,
+    S3StorageHandler,
     RDSStorageHandler,
     StorageError,
+    date_range_filter,
+    get_dataset_storage_handler,
     get_storage_handler
 )
 
@@ -102,72 +110,467 @@ class TestLocalStorageHandler:
         with pytest.raises(StorageError):
             handler.read_file('nonexistent.csv')
 
+    def test_version_survives_overwrite(self, temp_storage_dir, sample_df):
+        """Test that a linked archive keeps its contents when the current file is rewritten."""
+        handler = LocalStorageHandler(temp_storage_dir)
+        handler.write_file('current/test.csv', sample_df)
+
+        archive_key = handler.version_existing_file('test.csv')
+        handler.write_file('current/test.csv', sample_df.iloc[:1])
+
+        assert handler.list_versions('test.csv')[0]['method'] in ('reflink', 'hardlink', 'copy')
+        assert len(handler.read_file(archive_key)) == 2
+        assert len(handler.read_file('current/test.csv')) == 1
+
+    def test_delta_archive_stores_appended_rows(self, temp_storage_dir, sample_df):
+        """Test that delta mode archives only the bytes appended since the last version."""
+        handler = LocalStorageHandler(temp_storage_dir, archive_mode='delta')
+        grown = pd.concat([sample_df, sample_df.assign(workout_id=['9999', '8888'])], ignore_index=True)
+
+        handler.write_file('current/test.csv', sample_df)
+        first_key = handler.version_existing_file('test.csv')
+        handler.write_file('current/test.csv', grown)
+        second_key = handler.version_existing_file('test.csv')
+
+        versions = handler.list_versions('test.csv')
+        assert [v['type'] for v in versions] == ['full', 'delta']
+        assert versions[1]['base'] == first_key
+        delta_size = os.path.getsize(os.path.join(temp_storage_dir, second_key))
+        assert delta_size == versions[1]['size'] - versions[0]['size']
+
+        rebuilt = handler.read_version('test.csv', second_key).astype(str)
+        pd.testing.assert_frame_equal(grown, rebuilt)
+        assert len(handler.read_version('test.csv', first_key)) == 2
+
+    def test_delta_archive_falls_back_to_full(self, temp_storage_dir, sample_df):
+        """Test that a rewritten (not appended) file is archived in full."""
+        handler = LocalStorageHandler(temp_storage_dir, archive_mode='delta')
+
+        handler.write_file('current/test.csv', sample_df)
+        handler.version_existing_file('test.csv')
+        handler.write_file('current/test.csv', sample_df.iloc[::-1])
+        second_key = handler.version_existing_file('test.csv')
+
+        assert [v['type'] for v in handler.list_versions('test.csv')] == ['full', 'full']
+        rebuilt = handler.read_version('test.csv', second_key).astype(str)
+        pd.testing.assert_frame_equal(sample_df.iloc[::-1].reset_index(drop=True), rebuilt)
+
+    def test_mmap_read_matches_buffered(self, temp_storage_dir):
+        """Test that the memory-mapped reader returns the same rows as pandas."""
+        df = pd.DataFrame({'workout_id': range(500), 'activity': ['Run, easy', 'Bike'] * 250,
+                           'miles': [3.1, 10.5] * 250})
+        handler = LocalStorageHandler(temp_storage_dir, file_format='csv', read_mode='mmap')
+        handler.write_file('current/big.csv', df)
+
+        result = handler.read_file('current/big.csv', columns=['workout_id', 'miles'],
+                                   filters=[('miles', '>', 5)])
+        expected = pd.read_csv(os.path.join(temp_storage_dir, 'current/big.csv'), usecols=['workout_id', 'miles'])
+        pd.testing.assert_frame_equal(result, expected[expected['miles'] > 5].reset_index(drop=True))
+
+    def test_mmap_read_matches_buffered_export_columns(self, temp_storage_dir, monkeypatch):
+        """Test that dates, times, blank cells and all-blank columns read the same mapped and buffered."""
+        df = pd.DataFrame({
+            'Workout Date': [f'2024-08-{i % 28 + 1:02d} 07:{i % 60:02d}:00' for i in range(3000)],
+            'Start Time': ['06:30', '18:05', '07:00'] * 1000,
+            'Activity Type': ['Run', None, 'Bike'] * 1000,
+            'Notes': [None] * 3000,
+            'Late Date': [None] * 2000 + ['2024-09-01'] * 1000,
+            'miles': [3.1, None, 10.5] * 1000,
+        })
+        handler = LocalStorageHandler(temp_storage_dir, file_format='csv', read_mode='mmap')
+        handler.write_file('current/export.csv', df)
+        expected = pd.read_csv(os.path.join(temp_storage_dir, 'current/export.csv'))
+
+        pd.testing.assert_frame_equal(handler.read_file('current/export.csv'), expected)
+        # A small type sample leaves 'Late Date' blank in the sample but dated further down
+        monkeypatch.setattr(storage_module, '_TYPE_SAMPLE_BYTES', 4096)
+        pd.testing.assert_frame_equal(handler.read_file('current/export.csv'), expected)
+
+    def test_byte_ranges_partition_rows(self, temp_storage_dir):
+        """Test that byte-range reads cover every row exactly once."""
+        df = pd.DataFrame({'workout_id': range(1000), 'activity': 'Run'})
+        handler = LocalStorageHandler(temp_storage_dir, file_format='csv')
+        handler.write_file('current/big.csv', df)
+
+        ranges = handler.byte_ranges('current/big.csv', 7)
+        parts = [handler.read_file('current/big.csv', columns=['workout_id'], byte_range=r) for r in ranges]
+
+        assert len(ranges) == 7 and all(len(part) for part in parts)
+        assert pd.concat(parts, ignore_index=True)['workout_id'].tolist() == list(range(1000))
+        assert handler.read_file('current/big.csv', byte_range=(1, 2)).empty
+
+    def test_invalid_read_mode(self, temp_storage_dir):
+        """Test that an unknown read mode is rejected."""
+        with pytest.raises(ValueError):
+            LocalStorageHandler(temp_storage_dir, read_mode='direct')
+
 class TestS3StorageHandler:
     """Test suite for S3StorageHandler"""
 
     @pytest.fixture
-    def mock_rds_client(self):
-        """Create a mock RDS client."""
-        with patch('boto3.client') as mock_client:
-            yield mock_client.return_value
-
-    def test_version_existing_file(self, mock_s3_client):
-        """Test versioning of existing S3 files."""
-        handler = RDSStorageHandler('test-bucket')
-        
-        # Mock successful head_object
-        mock_s3_client.head_object.return_value = {}
-        
+    def s3_client(self, aws_credentials):
+        """Create a moto-backed S3 client with a test bucket."""
+        with mock_s3():
+            client = boto3.client('s3')
+            client.create_bucket(Bucket='test-bucket')
+            yield client
+
+    def test_version_existing_file(self, s3_client, sample_df):
+        """Test versioning of existing S3 files with a server-side copy."""
+        handler = S3StorageHandler('test-bucket', client=s3_client)
+        s3_client.put_object(Bucket='test-bucket', Key='current/test.csv',
+                             Body=sample_df.to_csv(index=False).encode())
+
         archive_key = handler.version_existing_file('test.csv')
-        
+
         assert archive_key is not None
         assert archive_key.startswith('archive/test_')
-        assert mock_s3_client.copy_object.called
+        archived = s3_client.get_object(Bucket='test-bucket', Key=archive_key)['Body'].read()
+        assert archived == sample_df.to_csv(index=False).encode()
 
-    def test_version_nonexistent_file(self, mock_s3_client):
+    def test_version_nonexistent_file(self, s3_client):
         """Test versioning when S3 file doesn't exist."""
-        handler = RDSStorageHandler('test-bucket')
-        
-        # Mock 404 response
-        error_response = {'Error': {'Code': '404'}}
-        mock_s3_client.head_object.side_effect = ClientError(error_response, 'HeadObject')
-        
+        handler = S3StorageHandler('test-bucket', client=s3_client)
         archive_key = handler.version_existing_file('nonexistent.csv')
         assert archive_key is None
 
-    def test_read_write_file(self, mock_s3_client, sample_df):
+    def test_read_write_file(self, s3_client, sample_df):
         """Test reading and writing S3 files."""
-        handler = RDSStorageHandler('test-bucket')
-        
-        # Create a proper mock response with BytesIO
-        from io import BytesIO
-        csv_content = BytesIO()
-        sample_df.to_csv(csv_content, index=False, encoding='utf-8')
-        csv_content.seek(0)
-        
-        mock_response = {'Body': csv_content}
-        mock_s3_client.get_object.return_value = mock_response
-        
-        # Write file
-        handler.write_file('test.csv', sample_df)
-        assert mock_s3_client.put_object.called
-        
-        # Read file
-        read_df = handler.read_file('test.csv')
-        assert isinstance(read_df, pd.DataFrame)
+        handler = S3StorageHandler('test-bucket', client=s3_client)
+
+        handler.write_file('current/test.csv', sample_df)
+        read_df = handler.read_file('current/test.csv').astype(str)
 
-    def test_s3_client_error(self, mock_s3_client):
+        pd.testing.assert_frame_equal(sample_df, read_df)
+
+    def test_multipart_write(self, s3_client):
+        """Test that writes above the threshold go through multipart upload."""
+        handler = S3StorageHandler('test-bucket', client=s3_client, transfer_config=TransferConfig(
+            multipart_threshold=5 * 1024 * 1024, multipart_chunksize=5 * 1024 * 1024))
+        large_df = pd.DataFrame({'payload': ['x' * 1000] * 12000})
+
+        handler.write_file('current/large.csv', large_df)
+
+        head = s3_client.head_object(Bucket='test-bucket', Key='current/large.csv')
+        assert '-' in head['ETag']  # multipart ETags carry the part count
+        assert len(handler.read_file('current/large.csv')) == 12000
+
+    def test_s3_client_error(self, s3_client):
         """Test handling of S3 client errors."""
-        handler = RDSStorageHandler('test-bucket')
-        
-        # Mock S3 error
-        mock_s3_client.get_object.side_effect = ClientError(
-            {'Error': {'Code': '500', 'Message': 'Test error'}},
-            'GetObject'
-        )
-        
+        handler = S3StorageHandler('test-bucket', client=s3_client)
+
         with pytest.raises(StorageError):
-            handler.read_file('test.csv')
+            handler.read_file('missing.csv')
+
+class TestParquetStorage:
+    """Test suite for Parquet storage, projection and filter pushdown"""
+
+    @pytest.fixture
+    def workouts_df(self):
+        """A year of daily workouts with a real datetime 'Workout Date'."""
+        dates = pd.date_range('2024-01-01', periods=366, freq='D')
+        return pd.DataFrame({
+            'Workout Date': dates,
+            'Activity Type': ['Running', 'Cycling'] * 183,
+            'Distance (mi)': [float(i % 10) for i in range(366)],
+        })
+
+    def test_read_write_roundtrip(self, temp_storage_dir, workouts_df):
+        """Test that Parquet preserves values and dtypes."""
+        pytest.importorskip('pyarrow')
+        handler = LocalStorageHandler(temp_storage_dir, file_format='parquet')
+
+        handler.write_file('current/workouts.parquet', workouts_df)
+        read_df = handler.read_file('current/workouts.parquet')
+
+        pd.testing.assert_frame_equal(workouts_df, read_df, check_dtype=False)
+        assert pd.api.types.is_datetime64_any_dtype(read_df['Workout Date'])
+
+    def test_column_projection(self, temp_storage_dir, workouts_df):
+        """Test that only the requested columns are loaded."""
+        pytest.importorskip('pyarrow')
+        handler = LocalStorageHandler(temp_storage_dir, file_format='parquet')
+        handler.write_file('current/workouts.parquet', workouts_df)
+
+        read_df = handler.read_file('current/workouts.parquet', columns=['Activity Type'])
+
+        assert list(read_df.columns) == ['Activity Type']
+        assert len(read_df) == 366
+
+    def test_date_filter_skips_row_groups(self, temp_storage_dir, workouts_df):
+        """Test that a date range filter is answered from row group statistics."""
+        pq = pytest.importorskip('pyarrow.parquet')
+        handler = LocalStorageHandler(temp_storage_dir, file_format='parquet')
+        with patch.dict(os.environ, {'PARQUET_ROW_GROUP_SIZE': '31'}):
+            handler.write_file('current/workouts.parquet', workouts_df.sample(frac=1, random_state=0))
+
+        path = os.path.join(temp_storage_dir, 'current', 'workouts.parquet')
+        metadata = pq.ParquetFile(path).metadata
+        august = date_range_filter('2024-08-01', '2024-09-01')
+        matching_groups = [
+            i for i in range(metadata.num_row_groups)
+            if metadata.row_group(i).column(0).statistics.max >= pd.Timestamp('2024-08-01')
+            and metadata.row_group(i).column(0).statistics.min < pd.Timestamp('2024-09-01')
+        ]
+        # Rows were sorted on write, so August spans at most two of the twelve row groups
+        assert metadata.num_row_groups == 12
+        assert len(matching_groups) <= 2
+
+        read_df = handler.read_file('current/workouts.parquet', filters=august)
+        assert len(read_df) == 31
+        assert read_df['Workout Date'].dt.month.eq(8).all()
+
+    def test_csv_filters_match_parquet(self, temp_storage_dir, workouts_df):
+        """Test that CSV applies the same filters in memory."""
+        pytest.importorskip('pyarrow')
+        august = date_range_filter('2024-08-01', '2024-09-01')
+        csv_handler = LocalStorageHandler(temp_storage_dir, file_format='csv')
+        parquet_handler = LocalStorageHandler(temp_storage_dir, file_format='parquet')
+        csv_handler.write_file('current/workouts.csv', workouts_df)
+        parquet_handler.write_file('current/workouts.parquet', workouts_df)
+
+        from_csv = csv_handler.read_file('current/workouts.csv', filters=august)
+        from_parquet = parquet_handler.read_file('current/workouts.parquet', filters=august)
+
+        assert len(from_csv) == len(from_parquet) == 31
+        assert list(from_csv['Activity Type']) == list(from_parquet['Activity Type'])
+
+    def test_csv_filter_on_unprojected_column(self, temp_storage_dir, workouts_df):
+        """Test that a CSV read can filter on a column it doesn't return."""
+        handler = LocalStorageHandler(temp_storage_dir, file_format='csv')
+        handler.write_file('current/workouts.csv', workouts_df)
+
+        read_df = handler.read_file('current/workouts.csv', columns=['Activity Type'],
+                                    filters=date_range_filter('2024-08-01', '2024-09-01'))
+
+        assert list(read_df.columns) == ['Activity Type']
+        assert len(read_df) == 31
+
+    def test_mmap_filter_on_unprojected_column(self, temp_storage_dir, workouts_df):
+        """Test that a memory-mapped read can filter on a column it doesn't return."""
+        handler = LocalStorageHandler(temp_storage_dir, file_format='csv', read_mode='mmap')
+        handler.write_file('current/workouts.csv', workouts_df)
+
+        read_df = handler.read_file('current/workouts.csv', columns=['Activity Type'],
+                                    filters=date_range_filter('2024-08-01', '2024-09-01'))
+
+        assert list(read_df.columns) == ['Activity Type']
+        assert len(read_df) == 31
+
+    def test_s3_parquet_filtered_read(self, aws_credentials, workouts_df):
+        """Test Parquet reads from S3 through ranged GETs."""
+        pytest.importorskip('pyarrow')
+        with mock_s3():
+            client = boto3.client('s3')
+            client.create_bucket(Bucket='test-bucket')
+            handler = S3StorageHandler('test-bucket', client=client, file_format='parquet')
+            handler.write_file('current/workouts.parquet', workouts_df)
+
+            read_df = handler.read_file('current/workouts.parquet', columns=['Workout Date'],
+                                        filters=date_range_filter('2024-12-01'))
+            archive_key = handler.version_existing_file('workouts.parquet')
+
+        assert list(read_df.columns) == ['Workout Date']
+        assert len(read_df) == 31
+        assert archive_key.endswith('.parquet')
+
+class TestPartitionedDataset:
+    """Test suite for the month-partitioned dataset layout"""
+
+    @pytest.fixture
+    def history(self):
+        """Three months of workouts."""
+        return pd.DataFrame({
+            'workout_id': [f'w{i}' for i in range(90)],
+            'Workout Date': pd.date_range('2024-06-01', periods=90, freq='D'),
+            'Distance (mi)': [float(i % 7) for i in range(90)],
+        })
+
+    @pytest.mark.parametrize('file_format', ['csv', 'parquet'])
+    def test_write_and_read_partitions(self, temp_storage_dir, history, file_format):
+        """Test that rows land in month partitions and read back by date range."""
+        if file_format == 'parquet':
+            pytest.importorskip('pyarrow')
+        handler = LocalStorageHandler(temp_storage_dir, file_format=file_format)
+
+        written = handler.write_partitioned('workouts', history, key_columns=['workout_id'])
+
+        assert [key.rsplit('/', 1)[0] for key in written] == [
+            f'current/workouts/year=2024/month={m}' for m in ('06', '07', '08')]
+        assert all(re.search(rf'/part-\d{{20}}-[0-9a-f]{{8}}\.{file_format}$', key) for key in written)
+        july = handler.read_partitions('workouts', '2024-07-01', '2024-08-01')
+        assert len(july) == 31
+        assert len(handler.read_partitions('workouts', '2024-07-15', columns=['workout_id'])) == 46
+        assert len(handler.read_partitions('workouts')) == 90
+
+    def test_write_appends_parts_to_touched_partitions(self, temp_storage_dir, history):
+        """Test that new rows only add parts to their own month and newer rows win on read."""
+        handler = LocalStorageHandler(temp_storage_dir, file_format='csv')
+        handler.write_partitioned('workouts', history, key_columns=['workout_id'])
+        june = handler.list_partitions('workouts', '2024-06-01', '2024-07-01')
+
+        latest = history.tail(5).assign(**{'Distance (mi)': 99.0})
+        new_row = pd.DataFrame({'workout_id': ['w90'], 'Workout Date': [pd.Timestamp('2024-08-30')],
+                                'Distance (mi)': [1.0]})
+        written = handler.write_partitioned('workouts', pd.concat([latest, new_row]), key_columns=['workout_id'])
+
+        assert [key.rsplit('/', 1)[0] for key in written] == ['current/workouts/year=2024/month=08']
+        assert handler.list_partitions('workouts', '2024-06-01', '2024-07-01') == june
+        august = handler.read_partitions('workouts', '2024-08-01', '2024-09-01', key_columns=['workout_id'])
+        assert len(august) == 30
+        assert (august.set_index('workout_id').loc[latest['workout_id'], 'Distance (mi)'] == 99.0).all()
+        projected = handler.read_partitions('workouts', '2024-08-01', columns=['Distance (mi)'],
+                                            key_columns=['workout_id'])
+        assert list(projected.columns) == ['Distance (mi)'] and len(projected) == 30
+
+    def test_concurrent_writers_keep_every_row(self, temp_storage_dir, history):
+        """Test that writers publishing to the same month at once don't overwrite each other."""
+        handler = LocalStorageHandler(temp_storage_dir, file_format='csv')
+        august = history[history['Workout Date'].dt.month == 8]
+        batches = [august.iloc[i::8] for i in range(8)]
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda batch: handler.write_partitioned('workouts', batch, key_columns=['workout_id']),
+                          batches))
+
+        result = handler.read_partitions('workouts', key_columns=['workout_id'])
+        assert sorted(result['workout_id']) == sorted(august['workout_id'])
+
+    def test_compact_partitions(self, temp_storage_dir, history):
+        """Test that compaction merges each month's parts into one file with the newest rows."""
+        handler = LocalStorageHandler(temp_storage_dir, file_format='csv')
+        handler.write_partitioned('workouts', history, key_columns=['workout_id'])
+        handler.write_partitioned('workouts', history.tail(3).assign(**{'Distance (mi)': 99.0}),
+                                  key_columns=['workout_id'])
+
+        compacted = handler.compact_partitions('workouts', key_columns=['workout_id'])
+
+        assert compacted == [handler.partition_key('workouts', 2024, 8)]
+        assert handler.list_partitions('workouts', '2024-08-01') == [handler.partition_key('workouts', 2024, 8)]
+        august = handler.read_partitions('workouts', '2024-08-01')
+        assert len(august) == 29
+        assert (august.tail(3)['Distance (mi)'] == 99.0).all()
+        # A later append lands beside the compacted file
+        handler.write_partitioned('workouts', history.tail(1), key_columns=['workout_id'])
+        assert len(handler.list_partitions('workouts', '2024-08-01')) == 2
+
+    def test_list_partitions_prunes_by_path(self, temp_storage_dir, history):
+        """Test that partition listing filters by month without reading data."""
+        handler = LocalStorageHandler(temp_storage_dir, file_format='csv')
+        handler.write_partitioned('workouts', history)
+
+        months = [key.rsplit('/', 1)[0][-len('year=2024/month=07'):]
+                  for key in handler.list_partitions('workouts', '2024-07-31', '2024-08-02')]
+        assert months == ['year=2024/month=07', 'year=2024/month=08']
+        assert len(handler.list_partitions('workouts', end='2024-07-01')) == 1
+        assert handler.list_partitions('other') == []
+
+    def test_s3_partitions(self, aws_credentials, history):
+        """Test the partitioned layout on S3."""
+        with mock_s3():
+            client = boto3.client('s3')
+            client.create_bucket(Bucket='test-bucket')
+            handler = S3StorageHandler('test-bucket', client=client, file_format='csv')
+
+            handler.write_partitioned('workouts', history, key_columns=['workout_id'])
+            handler.write_partitioned('workouts', history.tail(3), key_columns=['workout_id'])
+
+            assert len(handler.list_partitions('workouts')) == 4
+            assert len(handler.read_partitions('workouts', '2024-08-01', key_columns=['workout_id'])) == 29
+            assert handler.compact_partitions('workouts', key_columns=['workout_id']) == [
+                handler.partition_key('workouts', 2024, 8)]
+            assert len(handler.list_partitions('workouts')) == 3
+            assert len(handler.read_partitions('workouts', '2024-08-01')) == 29
+
+class TestBatchOperations:
+    """Test suite for read_many/write_many/version_many"""
+
+    @staticmethod
+    def _frames(n):
+        return [(f'current/part_{i}.csv', pd.DataFrame({'workout_id': [f'{i}a', f'{i}b'], 'n': [i, i]}))
+                for i in range(n)]
+
+    def test_local_batch_roundtrip(self, temp_storage_dir):
+        """Test ordered results and per-key errors on local storage."""
+        handler = LocalStorageHandler(temp_storage_dir, file_format='csv')
+        items = self._frames(6)
+
+        written = handler.write_many(items, max_workers=3)
+        results = handler.read_many([key for key, _ in items] + ['current/missing.csv'], max_workers=3)
+
+        assert all(r.ok for r in written)
+        assert [r.key for r in results[:-1]] == [key for key, _ in items]
+        assert [int(r.value['n'][0]) for r in results[:-1]] == list(range(6))
+        assert not results[-1].ok and isinstance(results[-1].error, StorageError)
+
+    def test_local_version_many(self, temp_storage_dir):
+        """Test concurrent versioning gives each key its own archive."""
+        handler = LocalStorageHandler(temp_storage_dir, file_format='csv')
+        handler.write_many(self._frames(4))
+
+        results = handler.version_many([f'part_{i}.csv' for i in range(4)] + ['absent.csv'])
+
+        assert all(r.value.startswith(f'archive/part_{i}_') for i, r in enumerate(results[:4]))
+        assert len({r.value for r in results[:4]}) == 4
+        assert results[-1].ok and results[-1].value is None
+
+    def test_s3_version_many_same_filename(self, aws_credentials):
+        """Test that same-named keys versioned in one batch get separate archives."""
+        with mock_s3():
+            client = boto3.client('s3')
+            client.create_bucket(Bucket='test-bucket')
+            handler = S3StorageHandler('test-bucket', client=client, file_format='csv')
+            frames = self._frames(2)
+            handler.write_many([('current/a/x.csv', frames[0][1]), ('current/b/x.csv', frames[1][1])])
+
+            keys = ['a/x.csv', 'b/x.csv', 'a/x.csv']
+            results = handler.version_many(keys)
+            archives = [r.value for r in results]
+
+            assert all(r.ok for r in results)
+            assert archives[0].startswith('archive/a/x_') and archives[1].startswith('archive/b/x_')
+            assert len(set(archives)) == 3
+            for key, archive_key, (_, frame) in zip(keys, archives, [frames[0], frames[1], frames[0]]):
+                pd.testing.assert_frame_equal(handler.read_version(key, archive_key).astype(str), frame.astype(str))
+
+    def test_s3_read_many(self, aws_credentials):
+        """Test batched S3 reads and a missing key."""
+        with mock_s3():
+            client = boto3.client('s3')
+            client.create_bucket(Bucket='test-bucket')
+            handler = S3StorageHandler('test-bucket', client=client, file_format='csv')
+            items = self._frames(5)
+            assert all(r.ok for r in handler.write_many(items))
+
+            results = handler.read_many(['current/missing.csv'] + [key for key, _ in items])
+
+        assert not results[0].ok
+        assert [len(r.value) for r in results[1:]] == [2] * 5
+
+    def test_rds_batch_operations(self, tmp_path):
+        """Test that the RDS handler treats keys as tables and bounds workers by its pool."""
+        sys.path.append(str(Path(__file__).parent))
+        from local_db import LocalDBConnection, create_local_db
+        from src.db_pool import ConnectionPool, CredentialsCache
+
+        db_path = str(tmp_path / 'rds.db')
+        create_local_db(db_path)
+        handler = RDSStorageHandler(secret_name='unused')
+        handler.pool = ConnectionPool(CredentialsCache(lambda: {'host': 'local', 'username': '', 'password': '',
+                                                                 'database': '', 'port': 0}),
+                                      size=2, connect=lambda **kwargs: LocalDBConnection(db_path))
+        rows = pd.DataFrame({'workout_id': ['1', '2'], 'workout_date': ['2024-08-01', '2024-08-02'],
+                             'activity_type': ['Run', 'Walk'], 'kcal_burned': [1.0, 2.0],
+                             'distance_mi': [1.0, 2.0], 'duration_sec': [60.0, 120.0]})
+
+        written = handler.write_many([('workout_summary', rows), ('no such table', rows)])
+        results = handler.read_many(['workout_summary', 'workout_rollup'], max_workers=16)
+
+        assert written[0].ok and not written[1].ok
+        assert list(results[0].value['workout_id']) == ['1', '2']
+        assert results[1].ok and results[1].value.empty
+        assert handler._batch_workers(16) == 2
+        assert handler.version_many(['workout_summary'])[0].value is None
 
 def test_get_storage_handler_local():
     """Test storage handler factory with local configuration."""
@@ -179,10 +582,18 @@ def test_get_storage_handler_s3():
     """Test storage handler factory with S3 configuration."""
     with patch.dict(os.environ, {'STORAGE_TYPE': 's3', 'S3_BUCKET': 'test-bucket'}):
         handler = get_storage_handler()
-        assert isinstance(handler, RDSStorageHandler)
+        assert isinstance(handler, S3StorageHandler)
 
 def test_get_storage_handler_invalid():
     """Test storage handler factory with invalid configuration."""
     with patch.dict(os.environ, {'STORAGE_TYPE': 'invalid'}):
         with pytest.raises(ValueError):
-            get_storage_handler()
\ No newline at end of file
+            get_storage_handler()
+
+def test_dataset_storage_handler_rejects_rds():
+    """Test that RDS is refused as a dataset backend up front, not on the first publish or query."""
+    with patch.dict(os.environ, {'STORAGE_TYPE': 'rds'}):
+        with pytest.raises(ValueError, match="can't hold the workout dataset"):
+            get_dataset_storage_handler()
+    with patch.dict(os.environ, {'STORAGE_TYPE': 'local', 'LOCAL_STORAGE_PATH': '/tmp'}):
+        assert isinstance(get_dataset_storage_handler(), LocalStorageHandler)
@@ -0,0 +1,75 @@
+"""
+test_structured_logging.py
+
+Tests for lazy log formatting, debug sampling and the EMF metrics record.
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+
+import io
+import json
+import logging
+
+import pytest
+
+from src.stage_timing import StageTimer
+from src.structured_logging import InvocationMetrics, LazyJson, configure_invocation_logging
+
+
+def test_lazy_json_not_formatted_when_filtered(caplog):
+    """Test that a filtered-out record never serializes its arguments."""
+    # json.dumps(default=str) falls back to str() for objects it can't encode
+    class Exploding:
+        def __str__(self):
+            raise AssertionError("should not be serialized")
+
+    lazy = LazyJson({'bad': Exploding()})
+    with pytest.raises(AssertionError):
+        str(lazy)
+
+    logger = logging.getLogger('test_lazy')
+    logger.setLevel(logging.INFO)
+    logger.debug("Event: %s", lazy)
+
+    assert not caplog.records
+
+def test_debug_sampling(monkeypatch):
+    """Test that DEBUG_SAMPLE_RATE switches sampled invocations to DEBUG."""
+    logger = logging.getLogger('test_sampling')
+
+    monkeypatch.setenv('DEBUG_SAMPLE_RATE', '1')
+    assert configure_invocation_logging(logger)
+    assert logger.level == logging.DEBUG
+
+    monkeypatch.setenv('DEBUG_SAMPLE_RATE', '0')
+    monkeypatch.setenv('LOG_LEVEL', 'warning')
+    assert not configure_invocation_logging(logger)
+    assert logger.level == logging.WARNING
+
+def test_emf_record():
+    """Test that metrics are emitted as one Embedded Metric Format line."""
+    metrics = InvocationMetrics({'FunctionName': 'workout-processor'})
+    metrics.put_metric('RowsRead', 10)
+    metrics.put_metric('BytesRead', 2048, 'Bytes')
+    metrics.set_property('fileKey', 'test.csv')
+    timer = StageTimer()
+    with timer.stage('extract'):
+        pass
+    for stage, ms in timer.durations().items():
+        metrics.put_metric(f"{stage.title()}Duration", ms, "Milliseconds")
+
+    stream = io.StringIO()
+    metrics.emit(stream)
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 1
+
+    record = json.loads(lines[0])
+    definition = record['_aws']['CloudWatchMetrics'][0]
+    assert definition['Dimensions'] == [['FunctionName']]
+    assert {'Name': 'BytesRead', 'Unit': 'Bytes'} in definition['Metrics']
+    assert {'Name': 'ExtractDuration', 'Unit': 'Milliseconds'} in definition['Metrics']
+    assert record['RowsRead'] == 10
+    assert record['fileKey'] == 'test.csv'
+    assert record['FunctionName'] == 'workout-processor'
@@ -0,0 +1,111 @@
+"""
+test_training_metrics.py
+
+Unit tests for the vectorized training metrics engine.
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data_cleaning import clean_data
+from src.storage import LocalStorageHandler
+from src.training_metrics import METRIC_COLUMNS, TrainingMetricsEngine, add_training_metrics
+import workout_processor
+
+
+def _history(days, seed=0):
+    """One or two workouts a day over `days` days, in shuffled order."""
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp('2024-01-01') + pd.to_timedelta(np.sort(rng.integers(0, days, days * 3 // 2)), unit='D')
+    n = len(dates)
+    return pd.DataFrame({
+        'Workout Date': dates,
+        'Distance (mi)': rng.uniform(1, 10, n),
+        'Workout Time (seconds)': rng.uniform(900, 5400, n),
+        'Avg Pace (min/mi)': rng.uniform(7, 10, n),
+        'Max Pace (min/mi)': rng.uniform(5, 7, n),
+    }).sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def _reference(df):
+    """Straightforward per-row windows, for comparison."""
+    dates = df['Workout Date'].dt.normalize()
+    load = df['Workout Time (seconds)'] / 60
+    acute = [load[(dates > d - pd.Timedelta(days=7)) & (dates <= d)].sum() for d in dates]
+    chronic = [load[(dates > d - pd.Timedelta(days=28)) & (dates <= d)].sum() / 4 for d in dates]
+    return np.array(acute), np.array(chronic)
+
+
+def test_per_workout_metrics(sample_export_data):
+    """Test speed, pace and consistency on cleaned export data."""
+    result = add_training_metrics(clean_data(sample_export_data))
+
+    first = result.iloc[0]
+    assert first['speed_mph'] == pytest.approx(10.0)
+    assert first['pace_min_per_mi'] == pytest.approx(6.0)
+    assert first['pace_consistency'] == pytest.approx(5.2 / 6.0)
+    assert set(METRIC_COLUMNS) <= set(result.columns)
+
+
+def test_rolling_windows_match_reference():
+    """Test the cumulative-sum windows against a direct computation."""
+    df = _history(120)
+
+    result = add_training_metrics(df)
+
+    acute, chronic = _reference(df)
+    np.testing.assert_allclose(result['acute_load_7d'], acute)
+    np.testing.assert_allclose(result['chronic_load_28d'], chronic)
+    np.testing.assert_allclose(result['acwr'], acute / chronic)
+
+
+def test_incremental_update_matches_full_recompute():
+    """Test that appending batches with carried state equals one pass over everything."""
+    df = _history(120, seed=1)
+    full = add_training_metrics(df)
+    cutoff = pd.Timestamp('2024-03-01')
+    older, newer = df[df['Workout Date'] < cutoff], df[df['Workout Date'] >= cutoff]
+
+    engine = TrainingMetricsEngine()
+    engine.update(older)
+    resumed = TrainingMetricsEngine(engine.to_state())
+    incremental = resumed.update(newer)
+
+    pd.testing.assert_frame_equal(incremental, full.loc[newer.index])
+
+
+def test_rows_before_window_are_rejected():
+    """Test that a batch reaching back past the 28-day state is refused."""
+    engine = TrainingMetricsEngine()
+    engine.update(_history(60))
+
+    with pytest.raises(ValueError):
+        engine.update(pd.DataFrame({'Workout Date': [pd.Timestamp('2024-01-02')],
+                                    'Workout Time (seconds)': [600.0]}))
+
+
+def test_metrics_reach_the_published_dataset(tmp_path, monkeypatch, aws_credentials, sample_export_data):
+    """Test that metric columns are published to the dataset, and skipped when there is none."""
+    monkeypatch.setenv('TRAINING_METRICS', '1')
+    monkeypatch.delenv('STORAGE_TYPE', raising=False)
+    with patch.object(workout_processor, 'verify_s3_connectivity', return_value=True):
+        processor = workout_processor.WorkoutProcessor()
+
+    assert not set(METRIC_COLUMNS) & set(processor.transform_frame(sample_export_data.copy())[0])
+
+    monkeypatch.setenv('STORAGE_TYPE', 'local')
+    monkeypatch.setenv('LOCAL_STORAGE_PATH', str(tmp_path))
+    monkeypatch.setenv('STORAGE_FORMAT', 'csv')
+    records = processor.transform_frame(sample_export_data.copy())
+    workout_processor.publish_new_workouts(records)
+
+    published = LocalStorageHandler(str(tmp_path)).read_partitions('workouts')
+    assert set(METRIC_COLUMNS) <= set(published.columns)
+    assert len(published) == 3
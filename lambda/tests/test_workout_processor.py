@@ -124,5 +124,54 @@ def test_handler_error(s3_event, aws_credentials, mock_context, monkeypatch, moc
     assert response['statusCode'] == 400
     assert 'error' in response['body']
 
+def test_notification_dispatcher_publishes_in_background(monkeypatch):
+    """Test that queued notifications are published with the cached client on flush."""
+    from unittest.mock import Mock
+    from src import workout_processor
+
+    mock_sns = Mock()
+    monkeypatch.setattr(workout_processor, 'get_sns_client', lambda: mock_sns)
+
+    dispatcher = workout_processor.NotificationDispatcher()
+    dispatcher.submit('arn:aws:sns:us-east-1:123456789012:topic', 3, 'test.csv')
+
+    assert dispatcher.flush(timeout=5)
+    mock_sns.publish.assert_called_once()
+    assert mock_sns.publish.call_args.kwargs['TopicArn'] == 'arn:aws:sns:us-east-1:123456789012:topic'
+
+def test_notification_dispatcher_flush_is_bounded(monkeypatch):
+    """Test that a slow SNS endpoint can't hold flush past its timeout."""
+    import threading
+    import time
+    from unittest.mock import Mock
+    from src import workout_processor
+
+    release = threading.Event()
+    mock_sns = Mock()
+    mock_sns.publish.side_effect = lambda **kwargs: release.wait(5)
+    monkeypatch.setattr(workout_processor, 'get_sns_client', lambda: mock_sns)
+
+    dispatcher = workout_processor.NotificationDispatcher()
+    dispatcher.submit('arn:aws:sns:us-east-1:123456789012:topic', 1, 'test.csv')
+
+    start = time.monotonic()
+    assert not dispatcher.flush(timeout=0.1)
+    assert time.monotonic() - start < 1
+    release.set()
+
+def test_notification_dispatcher_skips_without_topic(monkeypatch):
+    """Test that nothing is queued when no topic is configured."""
+    from unittest.mock import Mock
+    from src import workout_processor
+
+    mock_sns = Mock()
+    monkeypatch.setattr(workout_processor, 'get_sns_client', lambda: mock_sns)
+
+    dispatcher = workout_processor.NotificationDispatcher()
+    dispatcher.submit(None, 1, 'test.csv')
+
+    assert dispatcher.flush(timeout=1)
+    mock_sns.publish.assert_not_called()
+
 if __name__ == '__main__':
     pytest.main(['-v'])
@@ -89,6 +89,12 @@ resource "aws_iam_role_policy" "lambda_policy" {
           "${aws_s3_bucket.workout_data.arn}/*",
           aws_sns_topic.workout_notifications.arn
         ]
+      },
+      {
+        # Continuation events for files that don't finish within the timeout
+        Effect   = "Allow"
+        Action   = "lambda:InvokeFunction"
+        Resource = aws_lambda_function.workout_processor.arn
       }
     ]
   })